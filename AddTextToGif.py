@@ -1,20 +1,32 @@
 import sys
 import os
+import copy
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QLineEdit, QComboBox, QSpinBox, QCheckBox,
     QColorDialog, QFileDialog, QMessageBox, QFrame, QScrollArea, QSizePolicy,
-    QGroupBox, QFormLayout
+    QGroupBox, QFormLayout, QListWidget, QSlider
 )
-from PyQt6.QtCore import Qt, pyqtSignal, QPoint
-from PyQt6.QtGui import QPixmap, QImage, QCursor, QColor
-from PIL import Image, ImageDraw, ImageFont, ImageSequence
+from PyQt6.QtCore import Qt, pyqtSignal, QPoint, QRect
+from PyQt6.QtGui import QPixmap, QImage, QCursor, QColor, QPainter
+from PIL import Image
+
+from TextOverlay import (
+    make_style, make_track, track_state, text_sprite, draw_tracks,
+    read_gif_info, overlay_tracks
+)
+from KeyframeCrop import InterpolationType, interpolate_keyframes
+from JobRunner import Job
 
 # Custom Widget for Handling Mouse Events
 
 
 class InteractiveLabel(QLabel):
-    """Emits signals for mouse events to handle dragging"""
+    """Emits signals for mouse events to handle dragging.
+
+    The frame is the label pixmap, the text is a separate sprite painted on
+    top so moving it only repaints the old and new sprite areas.
+    """
     mousePressed = pyqtSignal(QPoint)
     mouseMoved = pyqtSignal(QPoint)
     mouseReleased = pyqtSignal(QPoint)
@@ -22,6 +34,31 @@ class InteractiveLabel(QLabel):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setMouseTracking(False)
+        self.sprite = None
+        self.sprite_pos = QPoint(0, 0)
+
+    def sprite_rect(self):
+        if self.sprite is None:
+            return QRect()
+        return QRect(self.sprite_pos, self.sprite.size())
+
+    def set_sprite(self, pixmap, pos):
+        old_rect = self.sprite_rect()
+        self.sprite = pixmap
+        self.sprite_pos = QPoint(*pos)
+        self.update(old_rect.united(self.sprite_rect()))
+
+    def move_sprite(self, pos):
+        old_rect = self.sprite_rect()
+        self.sprite_pos = QPoint(*pos)
+        self.update(old_rect.united(self.sprite_rect()))
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.sprite is not None and event.rect().intersects(self.sprite_rect()):
+            painter = QPainter(self)
+            painter.drawPixmap(self.sprite_pos, self.sprite)
+            painter.end()
 
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton:
@@ -44,11 +81,21 @@ class GifTextEditor(QMainWindow):
         super().__init__()
         self.setWindowTitle("GIF Text Adder")
         self.resize(1100, 700)
+        self.job = None
 
         # State Variables
+        # Only the shown frame is kept for the preview, export streams the file
+        self.input_path = None
         self.gif_image = None
-        self.frames = []
-        self.duration = 100
+        self.preview_frame = None
+        self.frame_count = 0
+        self.current_frame = 0
+
+        # Text tracks, see TextOverlay.make_track. The selected one is the
+        # draggable sprite, the others are drawn into the preview frame
+        self.tracks = []
+        self.track_index = -1
+        self.loading_track = False
 
         self.text_x = 50
         self.text_y = 50
@@ -61,6 +108,9 @@ class GifTextEditor(QMainWindow):
         self.drag_offset_y = 0
         self.dragging = False
         self.current_text_bounds = (0, 0, 0, 0)
+        # Offset and size of the rendered text relative to text_x / text_y
+        self.sprite_offset = (0, 0)
+        self.sprite_size = (0, 0)
 
         self.init_ui()
 
@@ -126,6 +176,40 @@ class GifTextEditor(QMainWindow):
         self.load_btn.clicked.connect(self.load_gif)
         sidebar_layout.addWidget(self.load_btn)
 
+        # Tracks
+        grp_tracks = QGroupBox("Text Tracks")
+        tracks_layout = QVBoxLayout()
+        self.track_list = QListWidget()
+        self.track_list.setFixedHeight(90)
+        self.track_list.currentRowChanged.connect(self.select_track)
+        tracks_layout.addWidget(self.track_list)
+
+        track_btns = QHBoxLayout()
+        self.add_track_btn = QPushButton("+ Add")
+        self.add_track_btn.clicked.connect(self.add_track)
+        self.remove_track_btn = QPushButton("- Remove")
+        self.remove_track_btn.clicked.connect(self.remove_track)
+        track_btns.addWidget(self.add_track_btn)
+        track_btns.addWidget(self.remove_track_btn)
+        tracks_layout.addLayout(track_btns)
+
+        range_form = QFormLayout()
+        range_row = QHBoxLayout()
+        self.start_spin = QSpinBox()
+        self.start_spin.valueChanged.connect(self.update_preview)
+        self.end_spin = QSpinBox()
+        self.end_spin.setMinimum(-1)
+        self.end_spin.setSpecialValueText("End")
+        self.end_spin.valueChanged.connect(self.update_preview)
+        range_row.addWidget(self.start_spin)
+        range_row.addWidget(QLabel("to"))
+        range_row.addWidget(self.end_spin)
+        range_form.addRow("Frames:", range_row)
+        tracks_layout.addLayout(range_form)
+
+        grp_tracks.setLayout(tracks_layout)
+        sidebar_layout.addWidget(grp_tracks)
+
         # Text Content
         grp_text = QGroupBox("Tt Text Content")
         form_text = QFormLayout()
@@ -206,9 +290,62 @@ class GifTextEditor(QMainWindow):
         self.grp_stroke.setLayout(form_stroke)
         sidebar_layout.addWidget(self.grp_stroke)
 
+        # Animation
+        grp_anim = QGroupBox("Animation")
+        form_anim = QFormLayout()
+
+        self.scale_spin = QSpinBox()
+        self.scale_spin.setRange(10, 500)
+        self.scale_spin.setValue(100)
+        self.scale_spin.setSuffix(" %")
+        self.scale_spin.valueChanged.connect(self.on_key_value_changed)
+        form_anim.addRow("Scale:", self.scale_spin)
+
+        self.opacity_spin = QSpinBox()
+        self.opacity_spin.setRange(0, 100)
+        self.opacity_spin.setValue(100)
+        self.opacity_spin.setSuffix(" %")
+        self.opacity_spin.valueChanged.connect(self.on_key_value_changed)
+        form_anim.addRow("Opacity:", self.opacity_spin)
+
+        self.interp_combo = QComboBox()
+        for t in InterpolationType:
+            self.interp_combo.addItem(t.value, t)
+        self.interp_combo.currentIndexChanged.connect(self.update_preview)
+        form_anim.addRow("Easing:", self.interp_combo)
+
+        key_btns = QHBoxLayout()
+        self.add_key_btn = QPushButton("◆ Set Key")
+        self.add_key_btn.clicked.connect(self.add_keyframe)
+        self.remove_key_btn = QPushButton("Delete Key")
+        self.remove_key_btn.clicked.connect(self.remove_keyframe)
+        key_btns.addWidget(self.add_key_btn)
+        key_btns.addWidget(self.remove_key_btn)
+        form_anim.addRow(key_btns)
+
+        self.lbl_keys = QLabel("Keys: -")
+        form_anim.addRow(self.lbl_keys)
+
+        grp_anim.setLayout(form_anim)
+        sidebar_layout.addWidget(grp_anim)
+
         sidebar_layout.addStretch()
 
         # Export
+        self.chk_keep_palette = QCheckBox("Keep original palette")
+        self.chk_keep_palette.setToolTip(
+            "Reuse the GIF's own colors instead of requantizing every frame.\n"
+            "Untouched pixels stay identical, text uses the nearest colors.")
+        sidebar_layout.addWidget(self.chk_keep_palette)
+
+        # Each worker starts its own interpreter, a few cover most of the gain
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, os.cpu_count() or 1)
+        self.workers_spin.setValue(min(4, os.cpu_count() or 1))
+        self.workers_spin.setPrefix("Workers: ")
+        self.workers_spin.setToolTip("Processes encoding frames in parallel on longer GIFs")
+        sidebar_layout.addWidget(self.workers_spin)
+
         self.export_btn = QPushButton("Export GIF")
         self.export_btn.setObjectName("PrimaryBtn")
         self.export_btn.setCursor(Qt.CursorShape.PointingHandCursor)
@@ -235,7 +372,24 @@ class GifTextEditor(QMainWindow):
         self.image_label.mouseReleased.connect(self.on_mouse_up)
 
         self.scroll_area.setWidget(self.image_label)
-        main_layout.addWidget(self.scroll_area)
+
+        # Frame Slider
+        preview_area = QWidget()
+        preview_layout = QVBoxLayout(preview_area)
+        preview_layout.setContentsMargins(0, 0, 0, 10)
+        preview_layout.addWidget(self.scroll_area)
+
+        slider_row = QHBoxLayout()
+        slider_row.setContentsMargins(10, 0, 10, 0)
+        self.frame_slider = QSlider(Qt.Orientation.Horizontal)
+        self.frame_slider.setEnabled(False)
+        self.frame_slider.valueChanged.connect(self.seek_frame)
+        self.lbl_frame = QLabel("Frame: - / -")
+        slider_row.addWidget(self.frame_slider)
+        slider_row.addWidget(self.lbl_frame)
+        preview_layout.addLayout(slider_row)
+
+        main_layout.addWidget(preview_area)
 
     # Helpers
 
@@ -252,56 +406,17 @@ class GifTextEditor(QMainWindow):
         qim = QImage(data, im.width, im.height, QImage.Format.Format_RGBA8888)
         return QPixmap.fromImage(qim)
 
-    def get_font(self, size):
-        font_name = self.font_combo.currentText()
-        # Mapping common names to file names
-        # TODO: Use QFontDatabase or smth
-        font_map = {
-            "Arial": "arial.ttf",
-            "Times New Roman": "times.ttf",
-            "Courier New": "cour.ttf",
-            "Verdana": "verdana.ttf",
-            "Impact": "impact.ttf"
-        }
-
-        filename = font_map.get(font_name, "arial.ttf")
-        try:
-            return ImageFont.truetype(filename, size)
-        except OSError:
-            # Fallback to default if TTF not found
-            try:
-                return ImageFont.load_default()
-            except:
-                return None
-
-    def wrap_text(self, text, font, max_width):
-        if not font:
-            return text
-        draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
-        lines = []
-        for paragraph in text.split('\n'):
-            line = []
-            for word in paragraph.split():
-                # Check width of current line + word
-                test_line = ' '.join(line + [word])
-                bbox = draw.textbbox((0, 0), test_line, font=font)
-                if (bbox[2] - bbox[0]) <= max_width:
-                    line.append(word)
-                else:
-                    if line:
-                        lines.append(' '.join(line))
-                    line = [word]
-            if line:
-                lines.append(' '.join(line))
-        return '\n'.join(lines)
-
-    def get_multiline_text_size(self, text, font):
-        draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
-        try:
-            bbox = draw.multiline_textbbox((0, 0), text, font=font)
-            return (bbox[2] - bbox[0], bbox[3] - bbox[1])
-        except AttributeError:
-            return (0, 0)
+    def current_style(self):
+        return make_style(
+            font=self.font_combo.currentText(),
+            size=self.font_size_spin.value(),
+            color=self.font_color,
+            max_width=self.width_spin.value(),
+            shadow=self.shadow_size_spin.value() if self.grp_shadow.isChecked() else None,
+            shadow_color=self.shadow_color,
+            stroke=self.stroke_size_spin.value() if self.grp_stroke.isChecked() else None,
+            stroke_color=self.stroke_color,
+        )
 
     # Logic
     def load_gif(self):
@@ -311,62 +426,244 @@ class GifTextEditor(QMainWindow):
             return
 
         try:
-            self.gif_image = Image.open(file_name)
+            self.preview_frame, info = read_gif_info(file_name)
+            gif_image = Image.open(file_name)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Cannot open GIF: {e}")
             return
+        if self.gif_image:
+            self.gif_image.close()
+        self.gif_image = gif_image
+        self.input_path = file_name
+        self.frame_count = len(info["frames"])
+        self.current_frame = 0
+
+        last = max(self.frame_count - 1, 0)
+        self.start_spin.setRange(0, last)
+        self.end_spin.setRange(-1, last)
+        self.frame_slider.blockSignals(True)
+        self.frame_slider.setRange(0, last)
+        self.frame_slider.setValue(0)
+        self.frame_slider.blockSignals(False)
+        self.frame_slider.setEnabled(True)
+
+        self.tracks = []
+        self.track_index = -1
+        self.add_track()
+
+        pixmap = self.pil2pixmap(self.preview_frame)
+        self.image_label.setFixedSize(pixmap.size())
+        self.update_frame_label()
 
-        self.frames = []
-        try:
-            for frame in ImageSequence.Iterator(self.gif_image):
-                self.frames.append(frame.copy().convert("RGBA"))
-            self.duration = self.gif_image.info.get("duration", 100)
-        except Exception as e:
-            QMessageBox.critical(
-                self, "Error", f"Error processing frames: {e}")
+    # Tracks
+    def selected_track(self):
+        if 0 <= self.track_index < len(self.tracks):
+            return self.tracks[self.track_index]
+        return None
+
+    def add_track(self):
+        if not self.preview_frame:
             return
+        position = (self.preview_frame.width // 4, self.preview_frame.height // 2)
+        track = make_track(self.text_entry.text(), position, self.current_style(),
+                           start=self.current_frame)
+        self.tracks.append(track)
+        self.refresh_track_list()
+        self.track_list.setCurrentRow(len(self.tracks) - 1)
+
+    def remove_track(self):
+        if self.selected_track() is None:
+            return
+        del self.tracks[self.track_index]
+        self.track_index = -1
+        self.refresh_track_list()
+        self.track_list.setCurrentRow(min(len(self.tracks) - 1, self.track_list.count() - 1))
+        if not self.tracks:
+            self.refresh_base()
+            self.update_preview()
 
-        self.text_x, self.text_y = self.frames[0].width // 4, self.frames[0].height // 2
+    def refresh_track_list(self):
+        self.track_list.blockSignals(True)
+        self.track_list.clear()
+        for i, track in enumerate(self.tracks):
+            end = "end" if track["end"] is None else track["end"]
+            self.track_list.addItem(f"{i + 1}: {track['text'] or '(empty)'} [{track['start']}-{end}]")
+        self.track_list.setCurrentRow(self.track_index)
+        self.track_list.blockSignals(False)
+
+    def select_track(self, row):
+        """Loads the track into the controls, the others go into the base frame"""
+        self.track_index = row
+        track = self.selected_track()
+        if track is None:
+            return
+
+        self.loading_track = True
+        style = track["style"]
+        self.text_entry.setText(track["text"])
+        self.font_combo.setCurrentText(style["font"])
+        self.font_size_spin.setValue(style["size"])
+        self.width_spin.setValue(int(style["max_width"]))
+        self.font_color = style["color"]
+        self.shadow_color = style["shadow_color"]
+        self.stroke_color = style["stroke_color"]
+        self.update_color_button(self.color_btn, self.font_color)
+        self.update_color_button(self.shadow_color_btn, self.shadow_color)
+        self.update_color_button(self.stroke_color_btn, self.stroke_color)
+        self.grp_shadow.setChecked(bool(style["shadow"]))
+        if style["shadow"]:
+            self.shadow_size_spin.setValue(style["shadow"])
+        self.grp_stroke.setChecked(bool(style["stroke"]))
+        if style["stroke"]:
+            self.stroke_size_spin.setValue(style["stroke"])
+        self.start_spin.setValue(track["start"])
+        self.end_spin.setValue(-1 if track["end"] is None else track["end"])
+        self.interp_combo.setCurrentIndex(self.interp_combo.findData(track["interp"]))
+        self.loading_track = False
+
+        self.refresh_base()
         self.update_preview()
 
-    def update_preview(self):
-        if not self.frames:
+    def sync_track(self):
+        """Copies the sidebar controls into the selected track"""
+        track = self.selected_track()
+        if track is None or self.loading_track:
+            return
+        track["text"] = self.text_entry.text()
+        track["style"] = self.current_style()
+        track["start"] = self.start_spin.value()
+        end = self.end_spin.value()
+        track["end"] = None if end < 0 else max(end, track["start"])
+        track["interp"] = self.interp_combo.currentData()
+        item = self.track_list.item(self.track_index)
+        if item:
+            end = "end" if track["end"] is None else track["end"]
+            item.setText(f"{self.track_index + 1}: {track['text'] or '(empty)'} [{track['start']}-{end}]")
+
+    # Keyframes
+    def set_key_values(self, x=None, y=None, scale=None, opacity=None):
+        """Changes the selected track at the current frame.
+
+        A track with a single keyframe is static and that keyframe is edited,
+        otherwise the values are keyed at the current frame.
+        """
+        track = self.selected_track()
+        if track is None:
+            return
+        keyframes = track["keyframes"]
+        state = interpolate_keyframes(keyframes, self.current_frame, track["interp"])
+        values = tuple(old if new is None else new
+                       for old, new in zip(state, (x, y, scale, opacity)))
+        if len(keyframes) == 1:
+            keyframes[next(iter(keyframes))] = values
+        else:
+            keyframes[self.current_frame] = values
+        self.update_key_label()
+
+    def add_keyframe(self):
+        track = self.selected_track()
+        if track is None:
             return
+        track["keyframes"][self.current_frame] = interpolate_keyframes(
+            track["keyframes"], self.current_frame, track["interp"])
+        self.update_key_label()
 
-        preview = self.frames[0].copy()
-        draw = ImageDraw.Draw(preview)
+    def remove_keyframe(self):
+        track = self.selected_track()
+        if track is None:
+            return
+        keyframes = track["keyframes"]
+        if self.current_frame in keyframes and len(keyframes) > 1:
+            del keyframes[self.current_frame]
+            self.update_preview()
 
-        font_size = self.font_size_spin.value()
-        font = self.get_font(font_size)
-        textbox_width = self.width_spin.value()
-        text = self.text_entry.text()
+    def on_key_value_changed(self):
+        if self.loading_track:
+            return
+        self.set_key_values(scale=self.scale_spin.value() / 100,
+                            opacity=self.opacity_spin.value() / 100)
+        self.update_preview()
 
-        wrapped_text = self.wrap_text(text, font, textbox_width)
+    def update_key_label(self):
+        track = self.selected_track()
+        if track is None:
+            self.lbl_keys.setText("Keys: -")
+            return
+        keys = sorted(track["keyframes"])
+        marker = " ◆" if self.current_frame in track["keyframes"] else ""
+        self.lbl_keys.setText("Keys: " + ", ".join(str(k) for k in keys) + marker)
 
-        # Bounds for clicking
-        text_w, text_h = self.get_multiline_text_size(wrapped_text, font)
-        self.current_text_bounds = (
-            self.text_x, self.text_y,
-            self.text_x + text_w, self.text_y + text_h
-        )
+    # Preview
+    def seek_frame(self, index):
+        if not self.gif_image:
+            return
+        self.current_frame = index
+        try:
+            self.gif_image.seek(index)
+            self.preview_frame = self.gif_image.convert("RGBA")
+        except (EOFError, OSError) as e:
+            print(f"Seek Error: {e}")
+            return
+        self.update_frame_label()
+        self.refresh_base()
+        self.update_preview()
 
-        # Draw Shadow
-        if self.grp_shadow.isChecked():
-            offset = self.shadow_size_spin.value()
-            draw.multiline_text((self.text_x + offset, self.text_y + offset),
-                                wrapped_text, font=font, fill=self.shadow_color)
+    def update_frame_label(self):
+        self.lbl_frame.setText(f"Frame: {self.current_frame} / {max(self.frame_count - 1, 0)}")
 
-        # Draw Text/Stroke
-        if self.grp_stroke.isChecked():
-            draw.multiline_text((self.text_x, self.text_y), wrapped_text, font=font,
-                                fill=self.font_color, stroke_width=self.stroke_size_spin.value(), stroke_fill=self.stroke_color)
+    def refresh_base(self):
+        """Current frame with every track but the selected one drawn in"""
+        if not self.preview_frame:
+            return
+        others = [t for i, t in enumerate(self.tracks) if i != self.track_index]
+        if others:
+            base = self.preview_frame.copy()
+            draw_tracks(base, others, self.current_frame)
         else:
-            draw.multiline_text((self.text_x, self.text_y),
-                                wrapped_text, font=font, fill=self.font_color)
+            base = self.preview_frame
+        self.image_label.setPixmap(self.pil2pixmap(base))
 
-        pixmap = self.pil2pixmap(preview)
-        self.image_label.setPixmap(pixmap)
-        self.image_label.setFixedSize(pixmap.size())
+    def update_preview(self):
+        """Renders the selected track sprite again, needed after text or style changes"""
+        if not self.preview_frame:
+            return
+        self.sync_track()
+        track = self.selected_track()
+        state = track_state(track, self.current_frame) if track else None
+
+        rendered = None
+        if state:
+            self.text_x, self.text_y = round(state[0]), round(state[1])
+            self.loading_track = True
+            self.scale_spin.setValue(round(state[2] * 100))
+            self.opacity_spin.setValue(round(state[3] * 100))
+            self.loading_track = False
+            # Keep the sprite grabbable when the track is fully transparent
+            rendered = text_sprite(track["text"], track["style"], state[2],
+                                   max(state[3], 0.2))
+        if rendered:
+            layer, self.sprite_offset = rendered
+            self.sprite_size = layer.size
+            self.image_label.set_sprite(self.pil2pixmap(layer), self.sprite_position())
+        else:
+            self.sprite_size = (0, 0)
+            self.image_label.set_sprite(None, self.sprite_position())
+        self.update_text_bounds()
+        self.update_key_label()
+
+    def move_text(self):
+        """Moves the cached sprite without rendering the text again"""
+        self.image_label.move_sprite(self.sprite_position())
+        self.update_text_bounds()
+
+    def sprite_position(self):
+        return (self.text_x + self.sprite_offset[0], self.text_y + self.sprite_offset[1])
+
+    def update_text_bounds(self):
+        # Bounds for clicking
+        x, y = self.sprite_position()
+        self.current_text_bounds = (
+            x, y, x + self.sprite_size[0], y + self.sprite_size[1])
 
     # Mouse Events
     def on_mouse_down(self, pos):
@@ -384,9 +681,11 @@ class GifTextEditor(QMainWindow):
         if self.dragging:
             self.text_x = pos.x() - self.drag_offset_x
             self.text_y = pos.y() - self.drag_offset_y
-            self.update_preview()
+            self.move_text()
 
     def on_mouse_up(self, pos):
+        if self.dragging:
+            self.set_key_values(x=self.text_x, y=self.text_y)
         self.dragging = False
         self.image_label.setCursor(QCursor(Qt.CursorShape.ArrowCursor))
 
@@ -413,7 +712,11 @@ class GifTextEditor(QMainWindow):
             self.update_preview()
 
     def export_gif(self):
-        if not self.frames:
+        if self.job:
+            self.job.cancel()
+            self.export_btn.setEnabled(False)
+            return
+        if not self.input_path:
             return
         file_path, _ = QFileDialog.getSaveFileName(
             self, "Save GIF", "", "GIF Files (*.gif)")
@@ -422,44 +725,46 @@ class GifTextEditor(QMainWindow):
         if not file_path.lower().endswith(".gif"):
             file_path += ".gif"
 
-        new_frames = []
-        font = self.get_font(self.font_size_spin.value())
-        text = self.wrap_text(self.text_entry.text(),
-                              font, self.width_spin.value())
-
-        self.export_btn.setText("Processing...")
-        self.export_btn.setEnabled(False)
-        QApplication.processEvents()
-
-        try:
-            for frame in self.frames:
-                f = frame.copy().convert("RGBA")
-                d = ImageDraw.Draw(f)
-
-                # Shadow
-                if self.grp_shadow.isChecked():
-                    off = self.shadow_size_spin.value()
-                    d.multiline_text(
-                        (self.text_x + off, self.text_y + off), text, font=font, fill=self.shadow_color)
-
-                # Main
-                if self.grp_stroke.isChecked():
-                    d.multiline_text((self.text_x, self.text_y), text, font=font, fill=self.font_color,
-                                     stroke_width=self.stroke_size_spin.value(), stroke_fill=self.stroke_color)
-                else:
-                    d.multiline_text((self.text_x, self.text_y),
-                                     text, font=font, fill=self.font_color)
-
-                new_frames.append(f)
-
-            new_frames[0].save(file_path, save_all=True, append_images=new_frames[1:],
-                               duration=self.duration, loop=0, disposal=2)
-            QMessageBox.information(self, "Success", f"Saved to {file_path}")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
-        finally:
-            self.export_btn.setText("Export GIF")
-            self.export_btn.setEnabled(True)
+        self.export_btn.setText("Cancel")
+        tracks = copy.deepcopy(self.tracks)
+        input_path = self.input_path
+        keep_palette = self.chk_keep_palette.isChecked()
+        workers = self.workers_spin.value()
+
+        def task(job):
+            def progress(done, total):
+                job.check_cancelled()
+                job.progress(done * 100 // total, "")
+            overlay_tracks(input_path, file_path, tracks, progress=progress,
+                           workers=workers, keep_palette=keep_palette)
+
+        self.job = Job(task)
+        self.job.signals.progress.connect(
+            lambda percent, _: self.export_btn.setText(f"Cancel ({percent}%)"))
+        self.job.signals.finished.connect(lambda _: self.on_export_finished(file_path))
+        self.job.signals.failed.connect(self.on_export_failed)
+        self.job.signals.cancelled.connect(self.reset_export_button)
+        self.job.start()
+
+    def on_export_finished(self, file_path):
+        self.reset_export_button()
+        QMessageBox.information(self, "Success", f"Saved to {file_path}")
+
+    def on_export_failed(self, error):
+        self.reset_export_button()
+        QMessageBox.critical(self, "Error", error)
+
+    def reset_export_button(self):
+        self.job = None
+        self.export_btn.setText("Export GIF")
+        self.export_btn.setEnabled(True)
+
+    def closeEvent(self, event):
+        if self.job:
+            self.job.cancel()
+        if self.gif_image:
+            self.gif_image.close()
+        event.accept()
 
 
 if __name__ == "__main__":
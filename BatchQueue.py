@@ -0,0 +1,456 @@
+import sys
+import os
+import io
+import shlex
+import time
+import queue
+import multiprocessing
+from contextlib import redirect_stderr
+from concurrent.futures import ProcessPoolExecutor
+from PyQt6.QtWidgets import (
+    QApplication, QMainWindow, QWidget, QGridLayout, QVBoxLayout, QHBoxLayout,
+    QLabel, QLineEdit, QPushButton, QComboBox, QSpinBox, QTableWidget,
+    QTableWidgetItem, QHeaderView, QAbstractItemView, QFileDialog, QMessageBox,
+    QProgressBar, QFrame
+)
+from PyQt6.QtCore import QTimer
+
+from GifToolsCLI import build_parser, build_jobs, run_job, init_worker
+
+# Table columns
+COL_FILE, COL_STATUS, COL_ATTEMPTS, COL_TIME = range(4)
+
+# Example options shown for each operation
+OPTION_HINTS = {
+    "resize": "--scale 0.5   or   --target-mb 5",
+    "compress": "--colors 128 --lossy 30",
+    "convert": "--fps 15 --width 480 --format gif",
+    "crop": "--x 0 --y 0 --width 320 --height 240",
+    "keyframe-crop": "--key 0:0,0,320,240 --key 60:80,40,320,240 --width 320 --height 240",
+    "text": "--text \"Hello\" --size 40 --stroke 2",
+    "frames": "--delete 1 2 --reverse",
+    "extract": "--fps 10",
+}
+
+
+class BatchQueue(QMainWindow):
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle("Batch Queue")
+        self.resize(800, 600)
+        self.setAcceptDrops(True)
+
+        self.files = []
+        self.pool = None
+        self.progress_queue = None
+        self.cancel_event = None
+        self.cancelling = False
+        self.failures = []  # (input, error) of jobs out of retries
+        self.jobs = {}  # row -> job tuple
+        self.futures = {}  # future -> row
+        self.running = set()  # rows reported as running
+        self.attempts = {}  # row -> attempts so far
+        self.finished = 0
+        self.failed = 0
+        self.start_time = None
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(200)
+        self.timer.timeout.connect(self.poll_jobs)
+
+        self.init_ui()
+
+    def init_ui(self):
+        # Stylesheet
+        self.setStyleSheet("""
+            QMainWindow {
+                background-color: #1e1e2e;
+            }
+            QWidget {
+                color: #cdd6f4;
+                font-family: 'Segoe UI', sans-serif;
+                font-size: 14px;
+            }
+            QFrame#Card {
+                background-color: #313244;
+                border-radius: 10px;
+                border: 1px solid #45475a;
+            }
+            QLineEdit, QComboBox, QSpinBox {
+                background-color: #181825;
+                border: 1px solid #45475a;
+                border-radius: 5px;
+                padding: 6px;
+                color: #cdd6f4;
+            }
+            QLineEdit:focus {
+                border: 1px solid #89b4fa;
+            }
+            QPushButton {
+                background-color: #45475a;
+                color: #ffffff;
+                border: none;
+                border-radius: 5px;
+                padding: 8px 15px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #585b70;
+            }
+            QPushButton#PrimaryBtn {
+                background-color: #89dceb;
+                color: #1e1e2e;
+                padding: 10px;
+            }
+            QPushButton#PrimaryBtn:disabled {
+                background-color: #45475a;
+                color: #a6adc8;
+            }
+            QTableWidget {
+                background-color: #181825;
+                border: 1px solid #45475a;
+                border-radius: 5px;
+                gridline-color: #313244;
+            }
+            QHeaderView::section {
+                background-color: #313244;
+                color: #bac2de;
+                border: none;
+                padding: 4px;
+            }
+            QProgressBar {
+                background-color: #181825;
+                border: 1px solid #45475a;
+                border-radius: 5px;
+                text-align: center;
+            }
+            QProgressBar::chunk {
+                background-color: #89dceb;
+                border-radius: 5px;
+            }
+        """)
+
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        main_layout = QVBoxLayout(central_widget)
+        main_layout.setSpacing(15)
+        main_layout.setContentsMargins(20, 20, 20, 20)
+
+        # Header
+        header_lbl = QLabel("Batch Queue")
+        header_lbl.setStyleSheet(
+            "font-size: 22px; font-weight: bold; color: #89dceb;")
+        main_layout.addWidget(header_lbl)
+
+        # Job Table
+        self.table = QTableWidget(0, 4)
+        self.table.setHorizontalHeaderLabels(["File", "Status", "Attempts", "Time"])
+        self.table.horizontalHeader().setSectionResizeMode(
+            COL_FILE, QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        main_layout.addWidget(self.table)
+
+        hint = QLabel("Drop files here or use Add Files")
+        hint.setStyleSheet("color: #a6adc8; font-size: 12px;")
+        main_layout.addWidget(hint)
+
+        # Settings Card
+        settings_frame = QFrame()
+        settings_frame.setObjectName("Card")
+        grid = QGridLayout(settings_frame)
+        grid.setContentsMargins(15, 15, 15, 15)
+        grid.setSpacing(10)
+
+        grid.addWidget(QLabel("Operation:"), 0, 0)
+        self.combo_operation = QComboBox()
+        self.combo_operation.addItems(list(OPTION_HINTS))
+        self.combo_operation.currentTextChanged.connect(self.update_hint)
+        grid.addWidget(self.combo_operation, 0, 1)
+
+        self.spin_workers = QSpinBox()
+        self.spin_workers.setPrefix("Workers: ")
+        self.spin_workers.setRange(1, os.cpu_count() or 1)
+        self.spin_workers.setValue(os.cpu_count() or 1)
+        grid.addWidget(self.spin_workers, 0, 2)
+
+        self.spin_retries = QSpinBox()
+        self.spin_retries.setPrefix("Retries: ")
+        self.spin_retries.setRange(0, 5)
+        self.spin_retries.setValue(1)
+        grid.addWidget(self.spin_retries, 0, 3)
+
+        grid.addWidget(QLabel("Options:"), 1, 0)
+        self.entry_options = QLineEdit()
+        grid.addWidget(self.entry_options, 1, 1, 1, 3)
+
+        grid.addWidget(QLabel("Output:"), 2, 0)
+        self.entry_output = QLineEdit()
+        self.entry_output.setPlaceholderText("Next to each input")
+        grid.addWidget(self.entry_output, 2, 1, 1, 2)
+        btn_output = QPushButton("Browse")
+        btn_output.clicked.connect(self.browse_output)
+        grid.addWidget(btn_output, 2, 3)
+
+        grid.setColumnStretch(1, 1)
+        main_layout.addWidget(settings_frame)
+        self.update_hint(self.combo_operation.currentText())
+
+        # Progress
+        self.progress = QProgressBar()
+        main_layout.addWidget(self.progress)
+        self.lbl_status = QLabel("Ready")
+        self.lbl_status.setStyleSheet("color: #a6adc8;")
+        main_layout.addWidget(self.lbl_status)
+
+        # Buttons
+        btn_layout = QHBoxLayout()
+        self.btn_add = QPushButton("Add Files")
+        self.btn_add.clicked.connect(self.browse_files)
+        self.btn_clear = QPushButton("Clear")
+        self.btn_clear.clicked.connect(self.clear_files)
+        self.btn_cancel = QPushButton("Cancel")
+        self.btn_cancel.setEnabled(False)
+        self.btn_cancel.clicked.connect(self.cancel_jobs)
+        self.btn_start = QPushButton("Start")
+        self.btn_start.setObjectName("PrimaryBtn")
+        self.btn_start.clicked.connect(self.start_jobs)
+
+        btn_layout.addWidget(self.btn_add)
+        btn_layout.addWidget(self.btn_clear)
+        btn_layout.addStretch()
+        btn_layout.addWidget(self.btn_cancel)
+        btn_layout.addWidget(self.btn_start)
+        main_layout.addLayout(btn_layout)
+
+    def update_hint(self, operation):
+        self.entry_options.setPlaceholderText(OPTION_HINTS.get(operation, ""))
+
+    # Files
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        self.add_files([url.toLocalFile() for url in event.mimeData().urls()
+                        if url.isLocalFile()])
+
+    def browse_files(self):
+        files, _ = QFileDialog.getOpenFileNames(
+            self, "Select Files", "", "Media Files (*.gif *.mp4 *.mov *.webm *.mkv);;All Files (*)")
+        self.add_files(files)
+
+    def browse_output(self):
+        path = QFileDialog.getExistingDirectory(self, "Select Output Folder")
+        if path:
+            self.entry_output.setText(path)
+
+    def add_files(self, paths):
+        if self.pool:
+            return
+        for path in paths:
+            if os.path.isdir(path):
+                self.add_files(sorted(os.path.join(path, f) for f in os.listdir(path)))
+                continue
+            if path in self.files:
+                continue
+            self.files.append(path)
+            row = self.table.rowCount()
+            self.table.insertRow(row)
+            self.table.setItem(row, COL_FILE, QTableWidgetItem(path))
+            self.table.setItem(row, COL_STATUS, QTableWidgetItem("Pending"))
+            self.table.setItem(row, COL_ATTEMPTS, QTableWidgetItem(""))
+            self.table.setItem(row, COL_TIME, QTableWidgetItem(""))
+        self.lbl_status.setText(f"{len(self.files)} files queued")
+
+    def clear_files(self):
+        if self.pool:
+            return
+        self.files = []
+        self.table.setRowCount(0)
+        self.progress.setValue(0)
+        self.lbl_status.setText("Ready")
+
+    def set_row(self, row, status, seconds=None):
+        self.table.item(row, COL_STATUS).setText(status)
+        self.table.item(row, COL_ATTEMPTS).setText(str(self.attempts.get(row, 0)))
+        if seconds is not None:
+            self.table.item(row, COL_TIME).setText(f"{seconds:.1f}s")
+
+    # Jobs
+    def parse_jobs(self):
+        """Builds the jobs with the CLI parser, returns None on bad options"""
+        argv = [self.combo_operation.currentText(), *self.files]
+        try:
+            argv += shlex.split(self.entry_options.text())
+        except ValueError as e:
+            QMessageBox.critical(self, "Invalid Options", str(e))
+            return None
+        if self.entry_output.text():
+            argv += ["--output-dir", self.entry_output.text()]
+
+        errors = io.StringIO()
+        try:
+            with redirect_stderr(errors):
+                return build_jobs(build_parser().parse_args(argv))
+        except SystemExit as e:
+            message = errors.getvalue().strip().splitlines()
+            QMessageBox.critical(self, "Invalid Options",
+                                 message[-1] if message else str(e))
+            return None
+
+    def start_jobs(self):
+        if not self.files:
+            QMessageBox.warning(self, "Warning", "Add some files first")
+            return
+        jobs = self.parse_jobs()
+        if jobs is None:
+            return
+
+        # Workers report ffmpeg progress through a queue drained by poll_jobs
+        self.progress_queue = multiprocessing.Queue()
+        self.cancel_event = multiprocessing.Event()
+        self.cancelling = False
+        self.failures = []
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.spin_workers.value(), initializer=init_worker,
+            initargs=(self.progress_queue, self.cancel_event))
+        self.jobs = dict(enumerate(jobs))
+        self.futures = {}
+        self.attempts = {}
+        self.running = set()
+        self.finished = 0
+        self.failed = 0
+        self.start_time = time.perf_counter()
+
+        for row in self.jobs:
+            self.submit(row)
+
+        self.progress.setRange(0, len(jobs))
+        self.progress.setValue(0)
+        self.btn_start.setEnabled(False)
+        self.btn_cancel.setEnabled(True)
+        self.btn_add.setEnabled(False)
+        self.btn_clear.setEnabled(False)
+        self.timer.start()
+
+    def submit(self, row):
+        self.attempts[row] = self.attempts.get(row, 0) + 1
+        future = self.pool.submit(run_job, *self.jobs[row])
+        self.futures[future] = row
+        self.set_row(row, "Queued")
+
+    def poll_jobs(self):
+        self.drain_progress()
+        for future, row in list(self.futures.items()):
+            if not future.done():
+                if future.running() and row not in self.running:
+                    self.running.add(row)
+                    self.set_row(row, "Running")
+                continue
+            self.running.discard(row)
+
+            del self.futures[future]
+            if future.cancelled():
+                continue
+            try:
+                _, error, seconds = future.result()
+            except Exception as e:
+                # The worker process died, e.g. out of memory
+                error, seconds = str(e), None
+
+            if error is None:
+                self.finished += 1
+                self.set_row(row, "Done", seconds)
+            elif self.cancelling:
+                self.set_row(row, "Cancelled", seconds)
+            elif self.attempts[row] <= self.spin_retries.value():
+                self.set_row(row, "Retrying", seconds)
+                self.submit(row)
+            else:
+                self.failed += 1
+                self.failures.append((self.jobs[row][1], error))
+                self.set_row(row, "Failed", seconds)
+                self.table.item(row, COL_STATUS).setToolTip(error)
+
+        self.update_progress()
+        if not self.futures:
+            self.stop_pool()
+            self.show_failures()
+
+    def drain_progress(self):
+        rows = {job[1]: row for row, job in self.jobs.items()}
+        latest = {}
+        try:
+            while True:
+                input_file, _, text = self.progress_queue.get_nowait()
+                latest[input_file] = text
+        except queue.Empty:
+            pass
+        for input_file, text in latest.items():
+            row = rows.get(input_file)
+            if row in self.running:
+                self.set_row(row, f"Running {text}")
+
+    def update_progress(self):
+        done = self.finished + self.failed
+        self.progress.setValue(done)
+        elapsed = time.perf_counter() - self.start_time
+        rate = self.finished / elapsed * 60 if elapsed else 0
+        status = (f"{done}/{len(self.jobs)} processed, {self.failed} failed "
+                  f"({rate:.1f} files/min)")
+        if rate and done < len(self.jobs):
+            # Queue drain estimate from the throughput so far
+            remaining = (len(self.jobs) - done) / rate * 60
+            status += f", ETA {int(remaining // 60)}:{int(remaining % 60):02d}"
+        self.lbl_status.setText(status)
+
+    def show_failures(self):
+        if not self.failures:
+            return
+        lines = [f"{os.path.basename(path)}: {error}" for path, error in self.failures[:10]]
+        if len(self.failures) > 10:
+            lines.append(f"... and {len(self.failures) - 10} more")
+        path, error = self.failures[-1]
+        self.lbl_status.setText(f"{self.lbl_status.text()}, last error: {os.path.basename(path)}: {error}")
+        QMessageBox.warning(self, "Failed Jobs",
+                            f"{len(self.failures)} files failed:\n\n" + "\n".join(lines))
+
+    def cancel_jobs(self):
+        # Running jobs kill their ffmpeg and fail, poll_jobs then marks them cancelled
+        self.cancelling = True
+        if self.cancel_event:
+            self.cancel_event.set()
+        for future, row in self.futures.items():
+            if future.cancel():
+                self.set_row(row, "Cancelled")
+        self.lbl_status.setText("Cancelling, waiting for running jobs...")
+
+    def stop_pool(self, wait=False):
+        self.timer.stop()
+        if self.pool:
+            self.pool.shutdown(wait=wait, cancel_futures=True)
+            self.pool = None
+            self.progress_queue = None
+            self.cancel_event = None
+        self.btn_start.setEnabled(True)
+        self.btn_cancel.setEnabled(False)
+        self.btn_add.setEnabled(True)
+        self.btn_clear.setEnabled(True)
+
+    def closeEvent(self, event):
+        if self.pool:
+            # The cancel event kills the ffmpeg of running jobs and stops text
+            # overlays at the next frame. A gifsicle compress can't be stopped,
+            # its worker exits once it is done instead of holding the window.
+            self.cancel_jobs()
+            self.stop_pool()
+        event.accept()
+
+
+if __name__ == "__main__":
+    app = QApplication(sys.argv)
+    window = BatchQueue()
+    window.show()
+    sys.exit(app.exec())
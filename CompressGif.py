@@ -8,11 +8,9 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QIcon, QFont
 
-# Try to import pygifsicle, handle error if missing
-try:
-    from pygifsicle import gifsicle
-except ImportError:
-    gifsicle = None
+import GifOperations
+from GifOperations import gifsicle
+from JobRunner import Job
 
 
 class GifCompressor(QMainWindow):
@@ -20,6 +18,7 @@ class GifCompressor(QMainWindow):
         super().__init__()
         self.setWindowTitle("GIF Compressor")
         self.resize(600, 450)
+        self.job = None
 
         # Check for dependency
         if gifsicle is None:
@@ -289,57 +288,50 @@ class GifCompressor(QMainWindow):
                 self, "File Error", "Please specify where to save the output file")
             return
 
+        if not gifsicle:
+            QMessageBox.critical(
+                self, "Error", "pygifsicle library is not loaded")
+            return
+
         # Update UI
         self.lbl_status.setText("Compressing... Please wait")
         self.btn_compress.setEnabled(False)
         self.btn_compress.setText("Processing...")
-        QApplication.processEvents()  # Force UI update
-
-        # Prepare Options
-        options = {
-            'sources': [input_file],
-            'destination': output_file,
-            'optimize': True,  # Basic optimization always on
-        }
-
-        if self.chk_color.isChecked():
-            options['colors'] = self.spin_color.value()
-
-        if self.chk_lossy.isChecked():
-            # Pass as list of strings for pygifsicle
-            options['options'] = [f'--lossy={self.spin_lossy.value()}']
-
-        # Execute
-        try:
-            if gifsicle:
-                gifsicle(**options)
-
-                # Check if file was actually created/modified
-                if os.path.exists(output_file):
-                    # Calculate savings
-                    orig_size = os.path.getsize(input_file) / 1024
-                    new_size = os.path.getsize(output_file) / 1024
-                    saving = ((orig_size - new_size) / orig_size) * 100
-
-                    msg = (f"Compression Successful!\n\n"
-                           f"Original: {orig_size:.1f} KB\n"
-                           f"New: {new_size:.1f} KB\n"
-                           f"Saved: {saving:.1f}%")
-                    QMessageBox.information(self, "Done", msg)
-                    self.lbl_status.setText(f"Saved {saving:.1f}%")
-                else:
-                    raise Exception("Output file was not created")
-            else:
-                QMessageBox.critical(
-                    self, "Error", "pygifsicle library is not loaded")
-
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"An error occurred:\n{e}")
-            self.lbl_status.setText("Error occurred")
-
-        finally:
-            self.btn_compress.setEnabled(True)
-            self.btn_compress.setText("Start Compression")
+
+        # Execute, gifsicle can't be interrupted so there is no cancel
+        colors = self.spin_color.value() if self.chk_color.isChecked() else None
+        lossy = self.spin_lossy.value() if self.chk_lossy.isChecked() else None
+        self.job = Job(lambda job: GifOperations.compress_gif(
+            input_file, output_file, colors=colors, lossy=lossy))
+        self.job.signals.finished.connect(
+            lambda result: self.on_compress_finished(input_file, output_file, result))
+        self.job.signals.failed.connect(self.on_compress_failed)
+        self.job.start()
+
+    def on_compress_finished(self, input_file, output_file, result):
+        self.reset_compress_button()
+
+        # Calculate savings
+        orig_size = os.path.getsize(input_file) / 1024
+        new_size = os.path.getsize(output_file) / 1024
+        saving = result["saved"]
+
+        msg = (f"Compression Successful!\n\n"
+               f"Original: {orig_size:.1f} KB\n"
+               f"New: {new_size:.1f} KB\n"
+               f"Saved: {saving:.1f}%")
+        QMessageBox.information(self, "Done", msg)
+        self.lbl_status.setText(f"Saved {saving:.1f}%")
+
+    def on_compress_failed(self, error):
+        self.reset_compress_button()
+        QMessageBox.critical(self, "Error", f"An error occurred:\n{error}")
+        self.lbl_status.setText("Error occurred")
+
+    def reset_compress_button(self):
+        self.job = None
+        self.btn_compress.setEnabled(True)
+        self.btn_compress.setText("Start Compression")
 
 
 if __name__ == "__main__":
@@ -1,22 +1,25 @@
 import sys
 import os
-import subprocess
-import tempfile
-import json
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QGridLayout, QLabel, QLineEdit,
     QPushButton, QFileDialog, QMessageBox, QHBoxLayout, QFrame, QVBoxLayout,
-    QSpinBox, QDoubleSpinBox, QSizePolicy, QStyle, QRadioButton
+    QSpinBox, QDoubleSpinBox, QSizePolicy, QStyle, QRadioButton, QCheckBox
 )
 from PyQt6.QtCore import Qt, QSize
 from PyQt6.QtGui import QIcon, QAction
 
+from FFmpegUtils import encode_gif, run_ffmpeg
+from GifOperations import detect_duration
+from JobRunner import Job
+from ProbeCache import probe_cache
+
 
 class VideoToGifConverter(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Video ↔ GIF Converter")
         self.resize(650, 520)
+        self.job = None
         self.init_ui()
 
     def init_ui(self):
@@ -197,6 +200,12 @@ class VideoToGifConverter(QMainWindow):
 
         opt_grid.addLayout(res_container, 1, 1)
 
+        # Palette
+        self.chk_low_memory = QCheckBox("Low memory mode (two-pass encode)")
+        self.chk_low_memory.setToolTip(
+            "Decodes the video twice instead of buffering every frame, for very long clips")
+        opt_grid.addWidget(self.chk_low_memory, 2, 0, 1, 2)
+
         settings_layout.addLayout(opt_grid)
         main_layout.addWidget(settings_frame)
 
@@ -267,30 +276,11 @@ class VideoToGifConverter(QMainWindow):
             self.entry_output.setText(file_path)
 
     def get_video_info(self):
-        """Helper to get video metadata using ffprobe"""
+        """Helper to get video metadata, probed once per file"""
         input_file = self.entry_input.text()
         if not input_file or not os.path.exists(input_file):
             return None
-
-        try:
-            cmd = [
-                "ffprobe", "-v", "error", "-select_streams", "v:0",
-                "-show_entries", "stream=width,height,r_frame_rate",
-                "-of", "json", input_file
-            ]
-            # Hide console window on Windows
-            startupinfo = None
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-
-            result = subprocess.run(
-                cmd, capture_output=True, text=True, check=True, startupinfo=startupinfo)
-            data = json.loads(result.stdout)
-            return data["streams"][0]
-        except Exception as e:
-            print(f"Probe Error: {e}")
-            return None
+        return probe_cache.video_stream(input_file)
 
     def auto_detect_fps(self):
         self.lbl_status.setText("Analyzing video...")
@@ -324,6 +314,12 @@ class VideoToGifConverter(QMainWindow):
             self.lbl_status.setText("Could not detect resolution")
 
     def convert_video(self):
+        if self.job:
+            self.job.cancel()
+            self.btn_convert.setEnabled(False)
+            self.lbl_status.setText("Cancelling...")
+            return
+
         input_file = self.entry_input.text()
         output_file = self.entry_output.text()
         fps = self.spin_fps.value()
@@ -338,73 +334,68 @@ class VideoToGifConverter(QMainWindow):
                 self, "Error", "Please specify an output file")
             return
 
-        self.btn_convert.setEnabled(False)
-        self.btn_convert.setText("Converting...")
-        QApplication.processEvents()
-
-        # Temp file for palette
-        fd, palette_file = tempfile.mkstemp(suffix=".png")
-        os.close(fd)  # Close handle so ffmpeg can use it
-
-        try:
-            # Startup info to hide console
-            startupinfo = None
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-
-            # Generate GIF or MP4 depending on mode
-            if self.btn_mode_to_mp4.isChecked():
-                self.lbl_status.setText("Converting GIF to MP4...")
-                QApplication.processEvents()
-                # Need consistent even size for H.264
-                mp4_cmd = [
-                    "ffmpeg", "-y", "-i", input_file,
-                    "-movflags", "faststart", "-pix_fmt", "yuv420p",
-                    "-vf", f"fps={fps},scale={width}:{height}:flags=lanczos,scale=trunc(iw/2)*2:trunc(ih/2)*2",
-                    output_file
-                ]
-                subprocess.run(mp4_cmd, check=True, startupinfo=startupinfo)
-            else:
-                self.lbl_status.setText("Phase 1/2: Generating Color Palette...")
-                QApplication.processEvents()
-
-                palette_cmd = [
-                    "ffmpeg", "-y", "-i", input_file,
-                    "-vf", f"fps={fps},scale={width}:{height}:flags=lanczos,palettegen",
-                    palette_file
-                ]
-                subprocess.run(palette_cmd, check=True, startupinfo=startupinfo)
-
-                self.lbl_status.setText("Phase 2/2: Encoding GIF...")
-                QApplication.processEvents()
-
-                gif_cmd = [
-                    "ffmpeg", "-y", "-i", input_file, "-i", palette_file,
-                    "-filter_complex", f"fps={fps},scale={width}:{height}:flags=lanczos[x];[x][1:v]paletteuse",
-                    output_file
-                ]
-                subprocess.run(gif_cmd, check=True, startupinfo=startupinfo)
-
-            self.lbl_status.setText("Done!")
-            QMessageBox.information(
-                self, "Success", f"File saved to:\n{output_file}")
-
-        except subprocess.CalledProcessError:
-            self.lbl_status.setText("Error during conversion")
-            QMessageBox.critical(
-                self, "Error", "FFmpeg failed. Check that ffmpeg is installed")
-        except Exception as e:
-            self.lbl_status.setText("Error")
-            QMessageBox.critical(self, "Error", f"An error occurred:\n{e}")
-        finally:
-            if os.path.exists(palette_file):
-                try:
-                    os.remove(palette_file)
-                except:
-                    pass
-            self.btn_convert.setEnabled(True)
-            self.btn_convert.setText("Start Conversion")
+        to_mp4 = self.btn_mode_to_mp4.isChecked()
+        two_pass = self.chk_low_memory.isChecked()
+        self.btn_convert.setText("Cancel")
+        self.lbl_status.setText(
+            "Converting GIF to MP4..." if to_mp4 else "Encoding GIF...")
+
+        self.job = Job(self.run_conversion, to_mp4, input_file, output_file,
+                       fps, width, height, two_pass)
+        self.job.signals.progress.connect(
+            lambda _, message: self.lbl_status.setText(message))
+        self.job.signals.finished.connect(
+            lambda _: self.on_convert_finished(output_file))
+        self.job.signals.failed.connect(self.on_convert_failed)
+        self.job.signals.cancelled.connect(self.on_convert_cancelled)
+        self.job.start()
+
+    def run_conversion(self, job, to_mp4, input_file, output_file, fps, width,
+                       height, two_pass):
+        progress = job.ffmpeg_progress(
+            detect_duration(input_file),
+            "Converting GIF to MP4... " if to_mp4 else "Encoding GIF... ")
+
+        # Generate GIF or MP4 depending on mode
+        if to_mp4:
+            # Need consistent even size for H.264
+            run_ffmpeg([
+                "-i", input_file,
+                "-movflags", "faststart", "-pix_fmt", "yuv420p",
+                "-vf", f"fps={fps},scale={width}:{height}:flags=lanczos,scale=trunc(iw/2)*2:trunc(ih/2)*2",
+                output_file
+            ], cancel_event=job.cancel_event, progress=progress)
+        else:
+            encode_gif(input_file, output_file,
+                       f"fps={fps},scale={width}:{height}:flags=lanczos",
+                       two_pass=two_pass, cancel_event=job.cancel_event,
+                       progress=progress)
+
+    def on_convert_finished(self, output_file):
+        self.reset_convert_button()
+        self.lbl_status.setText("Done!")
+        QMessageBox.information(
+            self, "Success", f"File saved to:\n{output_file}")
+
+    def on_convert_failed(self, error):
+        self.reset_convert_button()
+        self.lbl_status.setText("Error during conversion")
+        QMessageBox.critical(
+            self, "Error", f"FFmpeg failed. Check that ffmpeg is installed\n\n{error}")
+
+    def on_convert_cancelled(self):
+        self.reset_convert_button()
+        self.lbl_status.setText("Cancelled")
+
+    def reset_convert_button(self):
+        self.job = None
+        self.btn_convert.setEnabled(True)
+        self.btn_convert.setText("Start Conversion")
+
+    def closeEvent(self, event):
+        if self.job:
+            self.job.cancel()
+        event.accept()
 
 
 if __name__ == "__main__":
@@ -1,7 +1,6 @@
 import sys
 import os
 import shutil
-import subprocess
 from enum import Enum
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
@@ -12,6 +11,10 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt, QRect, QSize, QPoint, pyqtSignal, QTimer
 from PyQt6.QtGui import QPainter, QColor, QPen, QBrush, QMovie, QIcon, QPalette, QTransform
 
+from FFmpegUtils import encode_gif
+from GifOperations import detect_duration
+from JobRunner import Job
+
 # Constants
 ACCENT_COLOR = QColor("#cba6f7")  # Bootleg Catppuccin
 HANDLE_COLOR = QColor("#ffffff")
@@ -297,6 +300,7 @@ class GifCropper(QMainWindow):
         super().__init__()
         self.setWindowTitle("GIF Cropper")
         self.resize(1280, 850)
+        self.job = None
         self.input_path = None
 
         self.movie = None
@@ -718,6 +722,10 @@ class GifCropper(QMainWindow):
         self.updating_spinboxes = False
 
     def crop_and_save(self):
+        if self.job:
+            self.job.cancel()
+            self.btn_crop_save.setEnabled(False)
+            return
         if not self.input_path:
             return
         rect = self.image_label.selection_rect
@@ -750,44 +758,40 @@ class GifCropper(QMainWindow):
         elif self.rotation == 270:
             transpose_filters.append("transpose=2")
         
-        transpose_str = ",".join(transpose_filters)
-
-        # Palette generation filter
-        if transpose_str:
-            filter_complex = f"{transpose_str},crop={w}:{h}:{x}:{y},split[s0][s1];[s0]palettegen[p];[s1][p]paletteuse"
-        else:
-            filter_complex = f"crop={w}:{h}:{x}:{y},split[s0][s1];[s0]palettegen[p];[s1][p]paletteuse"
-
-        cmd = [
-            "ffmpeg", "-y",
-            "-i", self.input_path,
-            "-filter_complex", filter_complex,
-            save_path
-        ]
-
-        self.btn_crop_save.setText("Processing...")
-        self.btn_crop_save.setEnabled(False)
-        QApplication.processEvents()
-
-        try:
-            startupinfo = None
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-
-            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL,
-                           stderr=subprocess.PIPE, startupinfo=startupinfo)
-            QMessageBox.information(
-                self, "Success", f"GIF Cropped successfully!\nSaved to: {save_path}")
-        except subprocess.CalledProcessError as e:
-            QMessageBox.critical(
-                self, "FFmpeg Error", f"Conversion failed:\n{e.stderr.decode() if e.stderr else 'Unknown error'}")
-        except Exception as e:
-            QMessageBox.critical(
-                self, "Error", f"An unexpected error occurred:\n{e}")
-        finally:
-            self.btn_crop_save.setText("Apply Crop && Save")
-            self.btn_crop_save.setEnabled(True)
+        crop_filters = transpose_filters + [f"crop={w}:{h}:{x}:{y}"]
+
+        self.btn_crop_save.setText("Cancel")
+        input_path = self.input_path
+        self.job = Job(lambda job: encode_gif(
+            input_path, save_path, ",".join(crop_filters),
+            cancel_event=job.cancel_event,
+            progress=job.ffmpeg_progress(detect_duration(input_path))))
+        self.job.signals.progress.connect(
+            lambda _, message: self.btn_crop_save.setText(f"Cancel ({message})"))
+        self.job.signals.finished.connect(lambda _: self.on_crop_finished(save_path))
+        self.job.signals.failed.connect(self.on_crop_failed)
+        self.job.signals.cancelled.connect(self.reset_crop_button)
+        self.job.start()
+
+    def on_crop_finished(self, save_path):
+        self.reset_crop_button()
+        QMessageBox.information(
+            self, "Success", f"GIF Cropped successfully!\nSaved to: {save_path}")
+
+    def on_crop_failed(self, error):
+        self.reset_crop_button()
+        QMessageBox.critical(
+            self, "FFmpeg Error", f"Conversion failed:\n{error or 'Unknown error'}")
+
+    def reset_crop_button(self):
+        self.job = None
+        self.btn_crop_save.setText("Apply Crop && Save")
+        self.btn_crop_save.setEnabled(True)
+
+    def closeEvent(self, event):
+        if self.job:
+            self.job.cancel()
+        event.accept()
 
 
 if __name__ == "__main__":
@@ -2,7 +2,7 @@ import sys
 import os
 import shutil
 import math
-import re
+from bisect import bisect_left, bisect_right
 from enum import Enum
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
@@ -10,12 +10,17 @@ from PyQt6.QtWidgets import (
     QSpinBox, QGroupBox, QFormLayout, QSlider, QStyle, QComboBox,
     QFrame, QStyleOptionSlider, QGridLayout, QProgressDialog
 )
-from PyQt6.QtCore import Qt, QRect, QSize, QPoint, QPointF, pyqtSignal, QRectF, QProcess
+from PyQt6.QtCore import Qt, QRect, QSize, QPoint, QPointF, pyqtSignal, QRectF
 from PyQt6.QtGui import (
     QPainter, QColor, QPen, QBrush, QMovie, QPolygon, 
     QFont, QPalette, QAction, QKeySequence, QShortcut
 )
 
+from FFmpegUtils import describe_progress
+from GifOperations import keyframe_crop_gif, detect_duration
+from JobRunner import Job
+from KeyframeCrop import InterpolationType, compile_keyframes
+
 # Constants
 HANDLE_SIZE = 12
 BORDER_COLOR = QColor("#cba6f7")    # Bootleg Catpuccin
@@ -133,12 +138,6 @@ class ResizeSide(Enum):
     BOTTOM = 7
     BOTTOM_LEFT = 8
 
-class InterpolationType(Enum):
-    LINEAR = "Linear"
-    EASE_IN = "Ease In (Quad)"
-    EASE_OUT = "Ease Out (Quad)"
-    BEZIER = "Smoothstep (Bezier)"
-
 # Slider for Timeline
 class KeyframeSlider(QSlider):
     def __init__(self, orientation, parent=None):
@@ -445,6 +444,7 @@ class GifCropper(QMainWindow):
         self.setWindowTitle("GIF Cropper With Keyframes")
         self.resize(1280, 950)
         self.input_path = None
+        self.job = None
         self.setStyleSheet(DARK_STYLESHEET)
         
         self.movie = None
@@ -456,6 +456,9 @@ class GifCropper(QMainWindow):
         self.target_h = 0
         
         self.keyframes = {} # { frame_index: QRectF }
+        # Compiled on every keyframe edit, see compile_crop_track
+        self.sorted_keyframes = []
+        self.crop_track = []
         self.current_frame = 0
 
         self.init_ui()
@@ -681,7 +684,8 @@ class GifCropper(QMainWindow):
         
         for btn in [self.btn_play, self.btn_pause, self.btn_stop, self.seek_slider]: btn.setEnabled(True)
         self.seek_slider.setRange(0, self.movie.frameCount() - 1); self.seek_slider.setValue(0)
-        self.keyframes = {}; self.seek_slider.set_keyframes([]); self.update_kf_status()
+        self.keyframes = {}; self.compile_crop_track()
+        self.seek_slider.set_keyframes([]); self.update_kf_status()
         
         # Auto set resolution to current image size
         self.spin_out_w.setValue(current_pix.width())
@@ -704,6 +708,7 @@ class GifCropper(QMainWindow):
                     self.btn_lock.blockSignals(False)
                     return
                 self.keyframes.clear()
+                self.compile_crop_track()
                 self.seek_slider.set_keyframes([])
                 self.update_kf_status()
             self.unlock_project()
@@ -740,6 +745,7 @@ class GifCropper(QMainWindow):
             return
         
         self.keyframes[self.current_frame] = rect
+        self.compile_crop_track()
         self.seek_slider.set_keyframes(self.keyframes.keys())
         self.update_kf_status()
         self.refresh_current_frame()
@@ -747,14 +753,16 @@ class GifCropper(QMainWindow):
     def remove_keyframe(self):
         if self.current_frame in self.keyframes:
             del self.keyframes[self.current_frame]
+            self.compile_crop_track()
             self.seek_slider.set_keyframes(self.keyframes.keys())
             self.update_kf_status()
             self.refresh_current_frame()
 
     def jump_prev_kf(self):
         if not self.keyframes: return
-        sorted_frames = sorted(self.keyframes.keys())
-        prev_f = next((f for f in reversed(sorted_frames) if f < self.current_frame), None)
+        sorted_frames = self.sorted_keyframes
+        i = bisect_left(sorted_frames, self.current_frame)
+        prev_f = sorted_frames[i - 1] if i > 0 else None
         if prev_f is not None:
              self.movie.jumpToFrame(prev_f)
              self.pause_movie()
@@ -764,8 +772,9 @@ class GifCropper(QMainWindow):
 
     def jump_next_kf(self):
         if not self.keyframes: return
-        sorted_frames = sorted(self.keyframes.keys())
-        next_f = next((f for f in sorted_frames if f > self.current_frame), None)
+        sorted_frames = self.sorted_keyframes
+        i = bisect_right(sorted_frames, self.current_frame)
+        next_f = sorted_frames[i] if i < len(sorted_frames) else None
         if next_f is not None:
              self.movie.jumpToFrame(next_f)
              self.pause_movie()
@@ -782,10 +791,10 @@ class GifCropper(QMainWindow):
             self.lbl_kf_status.setStyleSheet("QLabel#InfoPanel { border-left: 3px solid #888; }")
             return
 
-        sorted_frames = sorted(self.keyframes.keys())
+        sorted_frames = self.sorted_keyframes
         
         if self.current_frame in self.keyframes:
-            idx = sorted_frames.index(self.current_frame) + 1
+            idx = bisect_left(sorted_frames, self.current_frame) + 1
             rect = self.keyframes[self.current_frame]
             info = (f"KEYFRAME {idx} / {total}\nFrame: {self.current_frame}\n"
                     f"Crop: {int(rect.width())}x{int(rect.height())} @ ({int(rect.x())}, {int(rect.y())})\n"
@@ -793,8 +802,10 @@ class GifCropper(QMainWindow):
             self.lbl_kf_status.setText(info)
             self.lbl_kf_status.setStyleSheet("QLabel#InfoPanel { border-left: 3px solid #a6e3a1; }") 
         else:
-            prev_f = next((f for f in reversed(sorted_frames) if f < self.current_frame), None)
-            next_f = next((f for f in sorted_frames if f > self.current_frame), None)
+            # Not a keyframe, so the frames on both sides of i are the neighbours
+            i = bisect_left(sorted_frames, self.current_frame)
+            prev_f = sorted_frames[i - 1] if i > 0 else None
+            next_f = sorted_frames[i] if i < total else None
             
             status = "Interpolating..."
             color = "#fab387" 
@@ -805,35 +816,29 @@ class GifCropper(QMainWindow):
             self.lbl_kf_status.setStyleSheet(f"QLabel#InfoPanel {{ border-left: 3px solid {color}; }}")
 
     def on_interp_changed(self):
+        self.compile_crop_track()
         self.refresh_current_frame()
         self.update_kf_status()
 
+    def compile_crop_track(self):
+        """Interpolates the crop of every frame once, so frame changes and
+        playback only look up their row"""
+        self.sorted_keyframes = sorted(self.keyframes)
+        if not self.keyframes or not self.movie:
+            self.crop_track = []
+            return
+        keyframes = {frame: (rect.x(), rect.y(), rect.width(), rect.height())
+                     for frame, rect in self.keyframes.items()}
+        frame_count = max(self.movie.frameCount(), self.sorted_keyframes[-1] + 1)
+        self.crop_track = compile_keyframes(
+            keyframes, frame_count, self.combo_interp.currentData()).tolist()
+
     def get_interpolated_rect(self, frame):
         if not self.keyframes: return self.image_label.selection_rect
         if frame in self.keyframes: return self.keyframes[frame]
-
-        sorted_frames = sorted(self.keyframes.keys())
-        if frame < sorted_frames[0]: return self.keyframes[sorted_frames[0]]
-        if frame > sorted_frames[-1]: return self.keyframes[sorted_frames[-1]]
-
-        prev_f = next(f for f in reversed(sorted_frames) if f < frame)
-        next_f = next(f for f in sorted_frames if f > frame)
-        
-        rect_start = self.keyframes[prev_f]
-        rect_end = self.keyframes[next_f]
-
-        t = (frame - prev_f) / (next_f - prev_f)
-        
-        interp = self.combo_interp.currentData()
-        if interp == InterpolationType.EASE_IN: t = t * t
-        elif interp == InterpolationType.EASE_OUT: t = t * (2 - t)
-        elif interp == InterpolationType.BEZIER: t = t * t * (3 - 2 * t)
-
-        x = rect_start.x() + (rect_end.x() - rect_start.x()) * t
-        y = rect_start.y() + (rect_end.y() - rect_start.y()) * t
-        w = rect_start.width() + (rect_end.width() - rect_start.width()) * t
-        h = rect_start.height() + (rect_end.height() - rect_start.height()) * t
-        return QRectF(x, y, w, h)
+        # Frames past the compiled track hold the last keyframe
+        row = self.crop_track[min(frame, len(self.crop_track) - 1)]
+        return QRectF(*row)
 
     def refresh_current_frame(self):
         rect = self.get_interpolated_rect(self.current_frame)
@@ -895,101 +900,64 @@ class GifCropper(QMainWindow):
         if not save_path: return
         if not save_path.lower().endswith(".gif"): save_path += ".gif"
 
-        # Prepare Filter Strings
-        sorted_keys = sorted(self.keyframes.keys())
         total_frames = self.movie.frameCount()
-        
-        def f(val): return f"{val:.2f}"
+        keyframes = {
+            frame: (rect.x(), rect.y(), rect.width(), rect.height())
+            for frame, rect in self.keyframes.items()
+        }
+        input_path = self.input_path
         interp = self.combo_interp.currentData()
-        t_expr = "((n-START_F)/((END_F-START_F)*1.0))"
-        
-        if interp == InterpolationType.LINEAR: anim_t = t_expr
-        elif interp == InterpolationType.EASE_IN: anim_t = f"pow({t_expr},2)"
-        elif interp == InterpolationType.EASE_OUT: anim_t = f"({t_expr} * (2 - {t_expr}))"
-        elif interp == InterpolationType.BEZIER: anim_t = f"({t_expr}*{t_expr}*(3-2*{t_expr}))"
+        tgt_w, tgt_h = self.target_w, self.target_h
 
-        final_x, final_y, final_w, final_h = [], [], [], []
-        
-        k0 = sorted_keys[0]
-        r0 = self.keyframes[k0]
-        final_x.append(f"if(lt(n,{k0}),{f(r0.x())},")
-        final_y.append(f"if(lt(n,{k0}),{f(r0.y())},")
-        final_w.append(f"if(lt(n,{k0}),{f(r0.width())},")
-        final_h.append(f"if(lt(n,{k0}),{f(r0.height())},")
-
-        for i in range(len(sorted_keys) - 1):
-            start_f = sorted_keys[i]
-            end_f = sorted_keys[i+1]
-            r_start = self.keyframes[start_f]
-            r_end = self.keyframes[end_f]
-            seg_t = anim_t.replace("START_F", str(start_f)).replace("END_F", str(end_f))
-            
-            lx = f"({f(r_start.x())}+({f(r_end.x()-r_start.x())})*{seg_t})"
-            ly = f"({f(r_start.y())}+({f(r_end.y()-r_start.y())})*{seg_t})"
-            lw = f"({f(r_start.width())}+({f(r_end.width()-r_start.width())})*{seg_t})"
-            lh = f"({f(r_start.height())}+({f(r_end.height()-r_start.height())})*{seg_t})"
-
-            final_x.append(f"if(lt(n,{end_f}),{lx},")
-            final_y.append(f"if(lt(n,{end_f}),{ly},")
-            final_w.append(f"if(lt(n,{end_f}),{lw},")
-            final_h.append(f"if(lt(n,{end_f}),{lh},")
-
-        r_last = self.keyframes[sorted_keys[-1]]
-        final_x.append(f"{f(r_last.x())}")
-        final_y.append(f"{f(r_last.y())}")
-        final_w.append(f"{f(r_last.width())}")
-        final_h.append(f"{f(r_last.height())}")
-        
-        parens = ")" * (len(sorted_keys))
-        str_x = "".join(final_x) + parens
-        str_y = "".join(final_y) + parens
-        str_w = "".join(final_w) + parens
-        str_h = "".join(final_h) + parens
-
-        tgt_w = self.target_w
-        tgt_h = self.target_h
-        scale_x_expr = f"({tgt_w}*1.0/({str_w}))"
-        scale_y_expr = f"({tgt_h}*1.0/({str_h}))"
-        new_w_expr = f"iw*{scale_x_expr}"
-        new_h_expr = f"ih*{scale_y_expr}"
-        new_crop_x = f"({str_x})*{scale_x_expr}"
-        new_crop_y = f"({str_y})*{scale_y_expr}"
-
-        filter_str = (
-            f"scale=w='{new_w_expr}':h='{new_h_expr}':eval=frame:flags=lanczos,"
-            f"crop=w={tgt_w}:h={tgt_h}:x='{new_crop_x}':y='{new_crop_y}':exact=1,"
-            f"split[s0][s1];[s0]palettegen[p];[s1][p]paletteuse"
-        )
-
-        self.process = QProcess()
         self.progress_dlg = QProgressDialog("Rendering...", "Cancel", 0, total_frames, self)
         self.progress_dlg.setWindowModality(Qt.WindowModality.WindowModal)
         self.progress_dlg.setMinimumDuration(0)
-        
-        self.process.readyReadStandardError.connect(self.handle_render_progress)
-        self.process.finished.connect(lambda: self.handle_render_finished(save_path))
-        self.progress_dlg.canceled.connect(self.process.kill)
 
-        cmd = ["ffmpeg", "-y", "-i", self.input_path, "-filter_complex", filter_str, save_path]
-        
-        self.process.start(cmd[0], cmd[1:])
+        def task(job):
+            total_seconds = detect_duration(input_path)
+
+            def progress(event):
+                # The frame count doubles as the dialog value
+                _, text = describe_progress(event, total_seconds)
+                job.progress(event["frame"], text)
 
-    def handle_render_progress(self):
-        stderr = self.process.readAllStandardError().data().decode()
-        match = re.search(r"frame=\s*(\d+)", stderr)
-        if match:
-            frame = int(match.group(1))
-            self.progress_dlg.setValue(frame)
+            keyframe_crop_gif(input_path, save_path, keyframes, tgt_w, tgt_h,
+                              interp, cancel_event=job.cancel_event,
+                              progress=progress)
+
+        self.job = Job(task)
+        self.job.signals.progress.connect(self.handle_render_progress)
+        self.job.signals.finished.connect(lambda _: self.handle_render_finished(save_path))
+        self.job.signals.failed.connect(self.handle_render_failed)
+        self.job.signals.cancelled.connect(self.handle_render_cancelled)
+        self.progress_dlg.canceled.connect(self.job.cancel)
+        self.job.start()
+
+    def handle_render_progress(self, frame, text):
+        if self.progress_dlg.wasCanceled():
+            return
+        self.progress_dlg.setValue(min(frame, self.progress_dlg.maximum() - 1))
+        self.progress_dlg.setLabelText(f"Rendering... {text}")
 
     def handle_render_finished(self, save_path):
+        self.job = None
         self.progress_dlg.close()
-        if self.process.exitStatus() == QProcess.ExitStatus.NormalExit and self.process.exitCode() == 0:
-             QMessageBox.information(self, "Success", f"Export Complete!\nSaved to: {save_path}")
-        else:
-             if self.progress_dlg.wasCanceled():
-                 QMessageBox.information(self, "Cancelled", "Export cancelled by user")
-             else:
-                 QMessageBox.critical(self, "FFmpeg Error", "Failed to export, check console or log")
+        QMessageBox.information(self, "Success", f"Export Complete!\nSaved to: {save_path}")
+
+    def handle_render_failed(self, error):
+        self.job = None
+        self.progress_dlg.close()
+        QMessageBox.critical(self, "FFmpeg Error", f"Failed to export.\n\n{error}")
+
+    def handle_render_cancelled(self):
+        self.job = None
+        self.progress_dlg.close()
+        QMessageBox.information(self, "Cancelled", "Export cancelled by user")
+
+    def closeEvent(self, event):
+        if self.job:
+            self.job.cancel()
+        event.accept()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -1,16 +1,36 @@
 import sys
 import os
-import shutil
-import subprocess
-import tempfile
+import time
+from PIL import Image
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout,
-    QHBoxLayout, QPushButton, QListWidget, QListWidgetItem,
+    QHBoxLayout, QPushButton, QListView, QCheckBox, QComboBox, QSpinBox,
     QFileDialog, QMessageBox, QLabel, QFrame, QAbstractItemView,
     QStyle, QDoubleSpinBox, QGroupBox, QSizePolicy
 )
-from PyQt6.QtCore import Qt, QSize
-from PyQt6.QtGui import QIcon, QPixmap, QColor, QAction
+from PyQt6.QtCore import Qt, QSize, QItemSelection, QItemSelectionModel, QThreadPool
+from PyQt6.QtGui import QColor, QAction, QKeySequence, QShortcut
+
+from FFmpegUtils import encode_gif
+from FrameAnalysis import duplicate_runs
+from FrameExport import EXPORT_FORMATS, export_frames, export_sprite_sheet
+from FrameHistory import (
+    FrameHistory, DeleteFrames, MoveFrames, ReverseFrames, DuplicateFrames, InsertFrames,
+    CollapseFrames
+)
+from FrameModel import THUMB_SIZE, FrameListModel, FrameListView, source_digest
+from FrameStore import FrameStore, fit_image
+from GifDecoder import decode_frames
+from GifScanner import scan_gif, effective_duration
+from GifWriter import retime_gif
+from JobRunner import Job
+
+# Above this many bytes of raw frames the palette is generated in a separate
+# pass, split would otherwise hold every frame in memory
+MAX_SPLIT_BYTES = 512 * 1024 * 1024
+
+# Frame export choice writing one PNG grid instead of a file per frame
+SPRITE_SHEET = "Sprite Sheet"
 
 class GifEditor(QMainWindow):
     def __init__(self):
@@ -19,7 +39,14 @@ class GifEditor(QMainWindow):
         self.resize(1000, 750)
 
         # State
-        self.temp_dir = None
+        self.store = None
+        self.job = None
+        self.decode_job = None
+        self.close_job = None
+        # Own pool so closing waits for this window's jobs only. A reassembly
+        # waits on the decode job, so each job needs a thread of its own.
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(4)
         
         self.init_ui()
 
@@ -52,13 +79,13 @@ class GifEditor(QMainWindow):
                 left: 10px;
                 padding: 0 5px;
             }
-            /* List Widget (The Filmstrip) */
-            QListWidget {
+            /* List View (The Filmstrip) */
+            QListView {
                 background-color: #181825;
                 border: none;
                 outline: none;
             }
-            QListWidget::item {
+            QListView::item {
                 background-color: #313244;
                 color: #cdd6f4;
                 border-radius: 8px;
@@ -66,11 +93,11 @@ class GifEditor(QMainWindow):
                 padding: 10px;
                 border: 1px solid #45475a;
             }
-            QListWidget::item:selected {
+            QListView::item:selected {
                 background-color: #45475a;
                 border: 1px solid #cba6f7; /* Accent border */
             }
-            QListWidget::item:hover {
+            QListView::item:hover {
                 background-color: #3b3e4f;
             }
             /* Buttons */
@@ -107,7 +134,7 @@ class GifEditor(QMainWindow):
                 color: #1e1e2e;
             }
             /* SpinBox */
-            QDoubleSpinBox {
+            QDoubleSpinBox, QSpinBox, QComboBox {
                 background-color: #181825;
                 border: 1px solid #45475a;
                 border-radius: 4px;
@@ -122,20 +149,24 @@ class GifEditor(QMainWindow):
         main_layout.setContentsMargins(0, 0, 0, 0)
         main_layout.setSpacing(0)
 
-        # LEFT: The List (Filmstrip)
-        self.list_widget = QListWidget()
-        self.list_widget.setViewMode(QListWidget.ViewMode.ListMode)
-        self.list_widget.setIconSize(QSize(120, 80)) # Rectangular thumbnails
-        self.list_widget.setResizeMode(QListWidget.ResizeMode.Adjust)
-        self.list_widget.setSpacing(2)
+        # LEFT: The List (Filmstrip), thumbnails load as rows come into view
+        self.model = FrameListModel(parent=self)
+        self.history = FrameHistory(self.model)
+        self.frame_view = FrameListView()
+        self.frame_view.setModel(self.model)
+        self.frame_view.setViewMode(QListView.ViewMode.ListMode)
+        self.frame_view.setIconSize(QSize(THUMB_SIZE, 80)) # Rectangular thumbnails
+        self.frame_view.setResizeMode(QListView.ResizeMode.Adjust)
+        self.frame_view.setSpacing(2)
+        self.frame_view.setUniformItemSizes(True)
         
         # Drag & Drop
-        self.list_widget.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
-        self.list_widget.setDragDropMode(QAbstractItemView.DragDropMode.InternalMove)
-        self.list_widget.setDefaultDropAction(Qt.DropAction.MoveAction)
-        self.list_widget.setSortingEnabled(False)
+        self.frame_view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.frame_view.setDragDropMode(QAbstractItemView.DragDropMode.InternalMove)
+        self.frame_view.setDefaultDropAction(Qt.DropAction.MoveAction)
+        self.frame_view.rows_dropped.connect(self.move_rows)
 
-        main_layout.addWidget(self.list_widget, stretch=1)
+        main_layout.addWidget(self.frame_view, stretch=1)
 
         # RIGHT: Sidebar Controls
         sidebar = QFrame()
@@ -181,6 +212,35 @@ class GifEditor(QMainWindow):
         self.btn_reverse.clicked.connect(self.reverse_order)
         layout_edit.addWidget(self.btn_reverse)
 
+        self.btn_duplicate = QPushButton("📑 Duplicate Selected")
+        self.btn_duplicate.clicked.connect(self.duplicate_selected)
+        layout_edit.addWidget(self.btn_duplicate)
+
+        # Duplicate detection, near duplicates within the tolerance
+        collapse_layout = QHBoxLayout()
+        self.btn_collapse = QPushButton("🧹 Collapse Duplicates")
+        self.btn_collapse.setToolTip("Merge runs of identical frames into one frame with their summed delay")
+        self.btn_collapse.clicked.connect(self.collapse_duplicates)
+        collapse_layout.addWidget(self.btn_collapse)
+        self.spin_tolerance = QSpinBox()
+        self.spin_tolerance.setRange(0, 16)
+        self.spin_tolerance.setToolTip("Hash bits that may differ, 0 only merges identical frames")
+        collapse_layout.addWidget(self.spin_tolerance)
+        layout_edit.addLayout(collapse_layout)
+
+        history_layout = QHBoxLayout()
+        self.btn_undo = QPushButton("↩️ Undo")
+        self.btn_undo.clicked.connect(self.undo)
+        history_layout.addWidget(self.btn_undo)
+        self.btn_redo = QPushButton("↪️ Redo")
+        self.btn_redo.clicked.connect(self.redo)
+        history_layout.addWidget(self.btn_redo)
+        layout_edit.addLayout(history_layout)
+
+        QShortcut(QKeySequence(QKeySequence.StandardKey.Undo), self, self.undo)
+        QShortcut(QKeySequence(QKeySequence.StandardKey.Redo), self, self.redo)
+        QShortcut(QKeySequence(QKeySequence.StandardKey.Delete), self.frame_view, self.remove_selected)
+
         grp_edit.setLayout(layout_edit)
         sidebar_layout.addWidget(grp_edit)
 
@@ -199,6 +259,24 @@ class GifEditor(QMainWindow):
         fps_layout.addWidget(self.fps_spin)
         layout_export.addLayout(fps_layout)
 
+        self.chk_keep_timings = QCheckBox("Keep source frame timings")
+        self.chk_keep_timings.setToolTip("Frames from the GIF keep their own delay, added frames use the frame rate")
+        self.chk_keep_timings.setChecked(True)
+        layout_export.addWidget(self.chk_keep_timings)
+
+        # Frame Format Row
+        format_layout = QHBoxLayout()
+        format_layout.addWidget(QLabel("Frames as:"))
+        self.combo_format = QComboBox()
+        self.combo_format.addItems([*EXPORT_FORMATS, SPRITE_SHEET])
+        self.combo_format.currentTextChanged.connect(self.on_format_changed)
+        format_layout.addWidget(self.combo_format)
+        self.spin_level = QSpinBox()
+        self.spin_level.setToolTip("PNG compression level, WebP/JPEG quality")
+        format_layout.addWidget(self.spin_level)
+        layout_export.addLayout(format_layout)
+        self.on_format_changed(self.combo_format.currentText())
+
         self.btn_export_frames = QPushButton("💾 Export All Frames")
         self.btn_export_frames.clicked.connect(self.export_all_frames)
         layout_export.addWidget(self.btn_export_frames)
@@ -218,141 +296,194 @@ class GifEditor(QMainWindow):
         self.btn_reassemble.setCursor(Qt.CursorShape.PointingHandCursor)
         self.btn_reassemble.clicked.connect(self.reassemble_gif)
         sidebar_layout.addWidget(self.btn_reassemble)
+        self.update_history_buttons()
 
         main_layout.addWidget(sidebar)
 
     # Logic
 
     def update_frame_count(self):
-        count = self.list_widget.count()
+        count = self.model.rowCount()
         self.lbl_count.setText(f"{count} Frames")
 
-    def detect_fps(self, gif_path):
-        try:
-            cmd = [
-                "ffprobe", "-v", "error", "-select_streams", "v:0",
-                "-show_entries", "stream=r_frame_rate",
-                "-of", "default=noprint_wrappers=1:nokey=1",
-                gif_path
-            ]
-            startupinfo = None
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-
-            result = subprocess.run(
-                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                text=True, check=True, startupinfo=startupinfo
-            )
-
-            fps_str = result.stdout.strip()
-            if '/' in fps_str:
-                num, den = map(float, fps_str.split('/'))
-                if den != 0: return num / den
-            return float(fps_str)
-        except:
-            return None
+    def detect_fps(self, info):
+        total_ms = sum(effective_duration(f["duration"]) for f in info["frames"])
+        return len(info["frames"]) * 1000.0 / total_ms if total_ms else None
 
     def open_gif(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Select GIF", "", "GIF Files (*.gif)")
         if not file_path: return
 
-        if self.temp_dir: shutil.rmtree(self.temp_dir, ignore_errors=True)
-        self.temp_dir = tempfile.mkdtemp(prefix="qt_gif_editor_")
-
-        # Detect FPS
-        detected_fps = self.detect_fps(file_path)
-        if detected_fps: self.fps_spin.setValue(detected_fps)
-
-        # Extract
-        extract_pattern = os.path.join(self.temp_dir, "frame_%04d.png")
-        cmd = ["ffmpeg", "-i", file_path, extract_pattern]
-
-        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        # Only the block structure is read here, no pixel data
         try:
-            startupinfo = None
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=startupinfo)
-        except subprocess.CalledProcessError as e:
-            QApplication.restoreOverrideCursor()
-            QMessageBox.critical(self, "Error", f"FFmpeg failed to extract frames.\n{e}")
+            info = scan_gif(file_path)
+            digest = source_digest(file_path)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Error", f"Failed to read GIF.\n{e}")
+            return
+        if not info["frames"]:
+            QMessageBox.critical(self, "Error", "The GIF has no frames.")
             return
 
-        # Populate List
-        self.list_widget.clear()
-        files = sorted([f for f in os.listdir(self.temp_dir) if f.startswith("frame_") and f.endswith(".png")])
+        # Detect FPS
+        detected_fps = self.detect_fps(info)
+        if detected_fps: self.fps_spin.setValue(detected_fps)
 
-        for f in files:
-            full_path = os.path.join(self.temp_dir, f)
-            self.add_frame_item(full_path)
-        
-        QApplication.restoreOverrideCursor()
+        # Rows show up right away, frames are decoded into their slots in the
+        # background, the ones thumbnails ask for first
+        if self.decode_job: self.decode_job.cancel()
+        store = FrameStore()
+        frame_ids = store.reserve((info["width"], info["height"]),
+                                  [effective_duration(f["duration"]) for f in info["frames"]])
+        self.model.set_frames(store, [(frame_id, (digest, i), f"Frame {i + 1}")
+                                      for i, frame_id in enumerate(frame_ids)])
+        if self.store:
+            # Removing a large store file takes a while, keep it off the UI thread
+            self.close_job = Job(lambda job, old_store: old_store.close(), self.store).start(self.pool)
+        self.store = store
+        self.history.clear()
+        self.update_frame_count()
+        self.update_history_buttons()
+
+        self.decode_job = Job(self.run_decode, file_path, info, store, frame_ids)
+        self.decode_job.signals.progress.connect(self.on_decode_progress)
+        self.decode_job.signals.finished.connect(
+            lambda decoded: self.on_decode_finished(store, len(frame_ids) - decoded))
+        self.decode_job.signals.failed.connect(lambda error: self.on_decode_finished(store, error=error))
+        self.decode_job.signals.cancelled.connect(lambda: self.on_decode_finished(store))
+        self.decode_job.start(self.pool)
+
+    def run_decode(self, job, file_path, info, store, frame_ids):
+        """Decodes the frames into their reserved slots, returns how many
+        could be decoded"""
+        last_report = 0
+
+        def progress(done, total):
+            # The first rows right away so thumbnails show, then a few times a second
+            nonlocal last_report
+            now = time.monotonic()
+            if done <= 16 or now - last_report > 0.1:
+                last_report = now
+                job.progress(done * 100 // total, f"{done}/{total}")
+        return decode_frames(file_path, info, store, frame_ids, job.cancel_event, progress)
+
+    def on_decode_progress(self, percent, message):
+        self.lbl_count.setText(f"{self.model.rowCount()} Frames ({percent}%)")
+        self.model.frames_ready()
+
+    def on_decode_finished(self, store, missing=0, error=None):
+        if store is not self.store: return  # Replaced by another GIF
+        self.decode_job = None
+        self.model.frames_ready()
         self.update_frame_count()
+        if error:
+            QMessageBox.critical(self, "Error", f"Failed to decode frames.\n{error}")
+        elif missing:
+            QMessageBox.warning(self, "Warning", f"{missing} frames could not be decoded and were left transparent.")
+
+    def on_job_progress(self, percent, message):
+        self.btn_reassemble.setText(f"Cancel ({message})")
+
+    def set_busy(self, busy):
+        """Locks the frame list while a background job uses the frame store"""
+        if not busy:
+            self.job = None
+        self.btn_open.setEnabled(not busy)
+        self.btn_add_frame.setEnabled(not busy)
+        self.btn_collapse.setEnabled(not busy)
+        self.btn_export_frames.setEnabled(not busy)
+        self.btn_export_selected.setEnabled(not busy)
+        self.frame_view.setEnabled(not busy)
+        self.btn_reassemble.setText("Cancel" if busy else "Reassemble to GIF")
+        if busy:
+            QApplication.setOverrideCursor(Qt.CursorShape.BusyCursor)
+        else:
+            QApplication.restoreOverrideCursor()
 
-    def add_frame_item(self, path):
-        item = QListWidgetItem()
-        pixmap = QPixmap(path)
-        
-        # Scale pixmap for the icon to save memory on large lists
-        icon_pix = pixmap.scaled(120, 120, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-        item.setIcon(QIcon(icon_pix))
-        
-        # Text details
-        filename = os.path.basename(path)
-        dims = f"{pixmap.width()}x{pixmap.height()}"
-        item.setText(f"{filename}\nDimensions: {dims}")
-        
-        item.setData(Qt.ItemDataRole.UserRole, path)
-        self.list_widget.addItem(item)
+    def selected_rows(self):
+        return sorted(index.row() for index in self.frame_view.selectionModel().selectedIndexes())
 
     def add_frame(self):
-        if not self.temp_dir: self.temp_dir = tempfile.mkdtemp(prefix="qt_gif_editor_")
-
         file_path, _ = QFileDialog.getOpenFileName(self, "Select Image", "", "Images (*.png *.jpg *.jpeg *.bmp *.gif)")
         if not file_path: return
 
-        new_index = self.list_widget.count() + 1
-        new_filename = f"frame_added_{new_index:04d}.png"
-        dest_path = os.path.join(self.temp_dir, new_filename)
+        if not self.store:
+            self.store = FrameStore()
+            self.model.set_frames(self.store, [])
 
-        # Normalize to PNG
-        cmd = ["ffmpeg", "-y", "-i", file_path, dest_path]
+        # Decoded into the store, sizes differing from the first frame are fitted on export
         try:
-            startupinfo = None
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=startupinfo)
-            self.add_frame_item(dest_path)
-            self.update_frame_count()
-        except subprocess.CalledProcessError:
-            QMessageBox.critical(self, "Error", "Failed to process image.")
+            with Image.open(file_path) as image:
+                frame_id = self.store.add_image(image)
+            digest = source_digest(file_path)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Failed to process image.\n{e}")
+            return
+        self.model.thumb_store.touch(digest)
+        frame = {"id": frame_id, "key": (digest, 0), "name": os.path.basename(file_path)}
+        self.run_command(InsertFrames(self.model.rowCount(), [frame]))
+
+    # Edits, each one is a command on the row list with one model reset
+    def run_command(self, command):
+        self.history.run(command)
+        self.after_edit(command)
+
+    def after_edit(self, command):
+        if command is None: return
+        self.select_rows(command.selection)
+        self.update_frame_count()
+        self.update_history_buttons()
+
+    def select_rows(self, rows):
+        """Selects rows, one selection range per contiguous block"""
+        selection = QItemSelection()
+        start = None
+        for i, row in enumerate(rows):
+            if start is None: start = row
+            if i + 1 == len(rows) or rows[i + 1] != row + 1:
+                selection.select(self.model.index(start), self.model.index(row))
+                start = None
+        self.frame_view.selectionModel().select(
+            selection, QItemSelectionModel.SelectionFlag.ClearAndSelect)
+        if rows:
+            self.frame_view.selectionModel().setCurrentIndex(
+                self.model.index(rows[0]), QItemSelectionModel.SelectionFlag.NoUpdate)
+            self.frame_view.scrollTo(self.model.index(rows[0]))
+
+    def update_history_buttons(self):
+        self.btn_undo.setEnabled(bool(self.history.undo_stack))
+        self.btn_redo.setEnabled(bool(self.history.redo_stack))
 
     def remove_selected(self):
-        selected_items = self.list_widget.selectedItems()
-        if not selected_items: return
-        
-        # Loop backwards to avoid index shifting issues
-        for item in selected_items:
-            row = self.list_widget.row(item)
-            self.list_widget.takeItem(row)
-        self.update_frame_count()
+        rows = self.selected_rows()
+        if not rows: return
+        self.run_command(DeleteFrames(rows))
 
     def reverse_order(self):
-        count = self.list_widget.count()
-        if count < 2: return
-        
-        items = []
-        for i in range(count):
-            items.append(self.list_widget.takeItem(0))
-            
-        for item in reversed(items):
-            self.list_widget.addItem(item)
+        if self.model.rowCount() < 2: return
+        self.run_command(ReverseFrames())
+
+    def duplicate_selected(self):
+        rows = self.selected_rows()
+        if not rows: return
+        self.run_command(DuplicateFrames(rows))
+
+    def move_rows(self, rows, dest):
+        command = MoveFrames(rows, dest)
+        if command.is_noop(): return
+        self.run_command(command)
+
+    def undo(self):
+        self.after_edit(self.history.undo())
+
+    def redo(self):
+        self.after_edit(self.history.redo())
 
     def reassemble_gif(self):
-        if self.list_widget.count() == 0:
+        if self.job:
+            self.job.cancel()
+            return
+        if self.model.rowCount() == 0:
             QMessageBox.warning(self, "Warning", "No frames to assemble.")
             return
 
@@ -361,96 +492,177 @@ class GifEditor(QMainWindow):
         if not save_path.lower().endswith(".gif"): save_path += ".gif"
 
         fps = self.fps_spin.value()
-        assemble_dir = tempfile.mkdtemp(prefix="gif_assemble_")
+        frame_ids = self.model.frame_ids()
+        # Collapsed frames keep their summed delay even without source timings
+        timings = [self.model.duration(row, self.chk_keep_timings.isChecked())
+                   for row in range(len(frame_ids))]
+        durations = None
+        if any(duration is not None for duration in timings):
+            durations = [duration or 1000 / fps for duration in timings]
+
+        self.set_busy(True)
+        self.job = Job(self.run_reassemble, self.store, frame_ids, fps, durations, save_path)
+        self.job.signals.progress.connect(self.on_job_progress)
+        self.job.signals.finished.connect(lambda warning: self.on_reassemble_finished(save_path, warning))
+        self.job.signals.failed.connect(self.on_reassemble_failed)
+        self.job.signals.cancelled.connect(lambda: self.set_busy(False))
+        self.job.start(self.pool)
+
+    def run_reassemble(self, job, store, frame_ids, fps, durations, save_path):
+        """Streams the frames in list order to ffmpeg as rawvideo, durations
+        (ms per frame) replace the constant frame rate afterwards. Returns a
+        warning when they could not be applied."""
+        size = store.size(frame_ids[0])
+
+        def frames():
+            for frame_id in frame_ids:
+                job.check_cancelled()
+                if store.size(frame_id) == size:
+                    yield store.frame(frame_id)
+                else:
+                    yield fit_image(store.image(frame_id), size).tobytes()
+
+        two_pass = len(frame_ids) * size[0] * size[1] * 4 > MAX_SPLIT_BYTES
+        encode_gif("pipe:0", save_path, two_pass=two_pass, stdin=frames,
+                   input_args=["-f", "rawvideo", "-pix_fmt", "rgba",
+                               "-s", f"{size[0]}x{size[1]}", "-framerate", str(fps)],
+                   output_args=["-loop", "0"], cancel_event=job.cancel_event,
+                   progress=job.ffmpeg_progress(len(frame_ids) / fps))
+        if durations and not retime_gif(save_path, durations):
+            return ("The frame timings could not be applied because ffmpeg wrote a different "
+                    f"number of frames, the GIF plays at a constant {fps:g} fps.")
+        return None
+
+    def on_reassemble_finished(self, save_path, warning=None):
+        self.set_busy(False)
+        if warning:
+            QMessageBox.warning(self, "Warning", f"GIF saved to: {save_path}\n\n{warning}")
+            return
+        QMessageBox.information(self, "Success", f"GIF Assembled Successfully!\nSaved to: {save_path}")
 
-        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
-        try:
-            # Copy frames in visual order to new temp dir
-            for i in range(self.list_widget.count()):
-                item = self.list_widget.item(i)
-                original_path = item.data(Qt.ItemDataRole.UserRole)
-                if not os.path.exists(original_path): continue
-                
-                # Naming must be sequential for ffmpeg glob/sequence
-                new_name = f"frame_{i:04d}.png"
-                shutil.copy(original_path, os.path.join(assemble_dir, new_name))
-
-            # Generate Palette first for better quality
-            palette_path = os.path.join(assemble_dir, "palette.png")
-            
-            startupinfo = None
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-
-            # Palette Gen
-            cmd_pal = [
-                "ffmpeg", "-y", "-framerate", str(fps),
-                "-i", os.path.join(assemble_dir, "frame_%04d.png"),
-                "-vf", "palettegen", palette_path
-            ]
-            subprocess.run(cmd_pal, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=startupinfo)
-
-            # Gif Gen
-            cmd_gif = [
-                "ffmpeg", "-y", "-framerate", str(fps),
-                "-i", os.path.join(assemble_dir, "frame_%04d.png"),
-                "-i", palette_path,
-                "-lavfi", "paletteuse", "-loop", "0",
-                save_path
-            ]
-            subprocess.run(cmd_gif, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=startupinfo)
-            
-            QApplication.restoreOverrideCursor()
-            QMessageBox.information(self, "Success", f"GIF Assembled Successfully!\nSaved to: {save_path}")
+    def on_reassemble_failed(self, error):
+        self.set_busy(False)
+        QMessageBox.critical(self, "Error", f"Failed to reassemble GIF.\n{error}")
 
-        except Exception as e:
-            QApplication.restoreOverrideCursor()
-            QMessageBox.critical(self, "Error", f"Failed to reassemble GIF.\n{e}")
-        finally:
-            shutil.rmtree(assemble_dir, ignore_errors=True)
+    def on_format_changed(self, fmt):
+        _, _, level_range, default_level = EXPORT_FORMATS.get(fmt, EXPORT_FORMATS["PNG"])
+        self.spin_level.setEnabled(level_range is not None)
+        if level_range:
+            self.spin_level.setRange(*level_range)
+            self.spin_level.setValue(default_level)
 
     def export_all_frames(self):
-        if self.list_widget.count() == 0: return
-        dest_dir = QFileDialog.getExistingDirectory(self, "Select Export Directory")
-        if not dest_dir: return
-
-        count = 0
-        for i in range(self.list_widget.count()):
-            item = self.list_widget.item(i)
-            original_path = item.data(Qt.ItemDataRole.UserRole)
-            filename = f"export_frame_{i:04d}.png"
-            shutil.copy(original_path, os.path.join(dest_dir, filename))
-            count += 1
-        
-        QMessageBox.information(self, "Success", f"Exported {count} frames.")
+        if self.model.rowCount() == 0: return
+        self.export_frames(self.model.frame_ids(), "export_frame")
 
     def export_selected_frames(self):
-        selected_items = self.list_widget.selectedItems()
-        if not selected_items:
+        rows = self.selected_rows()
+        if not rows:
             QMessageBox.warning(self, "Selection Required", "Please select at least one frame to export.")
             return
+        # Selected rows in their visual order
+        self.export_frames([self.model.frame_id(row) for row in rows], "selected_frame")
+
+    def export_frames(self, frame_ids, prefix):
+        fmt = self.combo_format.currentText()
+        if fmt == SPRITE_SHEET:
+            dest, _ = QFileDialog.getSaveFileName(self, "Save Sprite Sheet", "", "PNG Files (*.png)")
+            if not dest: return
+            if not dest.lower().endswith(".png"): dest += ".png"
+        else:
+            dest = QFileDialog.getExistingDirectory(self, "Select Export Directory")
+            if not dest: return
+
+        self.set_busy(True)
+        self.job = Job(self.run_export, self.store, frame_ids, dest, fmt,
+                       self.spin_level.value(), prefix)
+        self.job.signals.progress.connect(self.on_job_progress)
+        self.job.signals.finished.connect(self.on_export_finished)
+        self.job.signals.failed.connect(self.on_export_failed)
+        self.job.signals.cancelled.connect(lambda: self.set_busy(False))
+        self.job.start(self.pool)
+
+    def frames_progress(self, job):
+        """progress(done, total) for frame jobs, reports each percent once"""
+        percent = -1
+
+        def progress(done, total):
+            nonlocal percent
+            if done * 100 // total != percent:
+                percent = done * 100 // total
+                job.progress(percent, f"{done}/{total} frames")
+        return progress
+
+    def run_export(self, job, store, frame_ids, dest, fmt, level, prefix):
+        """Writes the frames on a thread pool, waits for frames still decoding"""
+        progress = self.frames_progress(job)
+        if fmt == SPRITE_SHEET:
+            return export_sprite_sheet(store, frame_ids, dest, level,
+                                       cancel_event=job.cancel_event, progress=progress)
+        return export_frames(store, frame_ids, dest, fmt, level, prefix,
+                             cancel_event=job.cancel_event, progress=progress)
+
+    def on_export_finished(self, count):
+        self.set_busy(False)
+        QMessageBox.information(self, "Success", f"Exported {count} frames.")
 
-        dest_dir = QFileDialog.getExistingDirectory(self, "Select Export Directory")
-        if not dest_dir: return
+    def on_export_failed(self, error):
+        self.set_busy(False)
+        QMessageBox.critical(self, "Error", f"Failed to export frames.\n{error}")
+
+    def collapse_duplicates(self):
+        if self.job or self.model.rowCount() < 2: return
+        frame_ids = self.model.frame_ids()
+
+        self.set_busy(True)
+        self.job = Job(self.run_find_duplicates, self.store, frame_ids, self.spin_tolerance.value())
+        self.job.signals.progress.connect(self.on_job_progress)
+        self.job.signals.finished.connect(lambda runs: self.on_duplicates_found(frame_ids, runs))
+        self.job.signals.failed.connect(self.on_duplicates_failed)
+        self.job.signals.cancelled.connect(lambda: self.set_busy(False))
+        self.job.start(self.pool)
+
+    def run_find_duplicates(self, job, store, frame_ids, max_distance):
+        return duplicate_runs(store, frame_ids, max_distance,
+                              cancel_event=job.cancel_event, progress=self.frames_progress(job))
+
+    def on_duplicates_found(self, frame_ids, runs):
+        self.set_busy(False)
+        if self.model.frame_ids() != frame_ids:
+            QMessageBox.warning(self, "Warning", "The frames changed during the search, try again.")
+            return
+        if not runs:
+            QMessageBox.information(self, "No Duplicates", "No duplicate frames found.")
+            return
 
-        # Sort selected items by their visual index in the list
-        selected_items.sort(key=lambda x: self.list_widget.row(x))
+        # Show the frames that would go
+        duplicates = [row for start, end in runs for row in range(start + 1, end)]
+        self.select_rows(duplicates)
+        answer = QMessageBox.question(
+            self, "Collapse Duplicates",
+            f"Found {len(duplicates)} duplicate frames in {len(runs)} groups.\n"
+            "Collapse each group into one frame with their summed delay?")
+        if answer != QMessageBox.StandardButton.Yes: return
 
-        count = 0
-        for i, item in enumerate(selected_items):
-            original_path = item.data(Qt.ItemDataRole.UserRole)
-            if original_path and os.path.exists(original_path):
-                # Naming them sequentially based on selection order
-                filename = f"selected_frame_{i:04d}.png"
-                shutil.copy(original_path, os.path.join(dest_dir, filename))
-                count += 1
-        
-        QMessageBox.information(self, "Success", f"Exported {count} selected frames.")
+        fps = self.fps_spin.value()
+        keep_timings = self.chk_keep_timings.isChecked()
+        durations = [round(sum(self.model.duration(row, keep_timings) or 1000 / fps
+                               for row in range(start, end)))
+                     for start, end in runs]
+        self.run_command(CollapseFrames(runs, durations))
+
+    def on_duplicates_failed(self, error):
+        self.set_busy(False)
+        QMessageBox.critical(self, "Error", f"Failed to compare frames.\n{error}")
 
     def closeEvent(self, event):
-        if self.temp_dir and os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir, ignore_errors=True)
+        for job in (self.job, self.decode_job):
+            if job: job.cancel()
+        self.model.shutdown()
+        # Wakes a reassembly still waiting for frames
+        if self.store:
+            self.store.close()
+        self.pool.waitForDone(5000)
         event.accept()
 
 def main():
@@ -0,0 +1,216 @@
+import os
+import subprocess
+import tempfile
+import threading
+
+PALETTE_GRAPH = "split[s0][s1];[s0]palettegen[p];[s1][p]paletteuse"
+
+
+class FFmpegCancelled(Exception):
+    """Raised when a running ffmpeg process was cancelled"""
+
+
+def get_startupinfo():
+    """Hides the console window ffmpeg would open on Windows"""
+    startupinfo = None
+    if os.name == 'nt':
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    return startupinfo
+
+
+def parse_progress(block):
+    """Turns one -progress key=value block into an event dict.
+
+    Keys: frame, fps, speed (x realtime), out_time (s), bitrate (kbit/s),
+    total_size (bytes) and done. Values ffmpeg reports as N/A are None.
+    """
+    def number(key, unit=""):
+        try:
+            return float(block.get(key, "").strip().removesuffix(unit))
+        except ValueError:
+            return None
+
+    out_time_us = number("out_time_us")
+    return {
+        "frame": int(number("frame") or 0),
+        "fps": number("fps"),
+        "speed": number("speed", "x"),
+        "out_time": out_time_us / 1000000 if out_time_us is not None else None,
+        "bitrate": number("bitrate", "kbits/s"),
+        "total_size": int(number("total_size") or 0),
+        "done": block.get("progress") == "end",
+    }
+
+
+def describe_progress(event, total_seconds=None):
+    """Returns (percent, text) for a progress event.
+
+    percent is -1 when total_seconds is unknown, the text then only holds the
+    frame count and speed.
+    """
+    speed = event["speed"]
+    out_time = event["out_time"] or 0
+    parts = []
+    percent = -1
+    if total_seconds:
+        percent = min(100, int(out_time * 100 / total_seconds))
+        parts.append(f"{percent}%")
+    else:
+        parts.append(f"frame {event['frame']}")
+    if speed:
+        parts.append(f"{speed:.2f}x")
+        if total_seconds:
+            remaining = max(0, total_seconds - out_time) / speed
+            parts.append(f"ETA {int(remaining // 60)}:{int(remaining % 60):02d}")
+    return percent, ", ".join(parts)
+
+
+def _read_progress(stream, progress):
+    block = {}
+    for line in stream:
+        key, _, value = line.decode(errors="replace").strip().partition("=")
+        block[key] = value
+        if key == "progress":
+            try:
+                progress(parse_progress(block))
+            except Exception as e:
+                # Keep draining stdout, a stalled pipe would block ffmpeg
+                print(f"Progress callback error: {e}")
+            block = {}
+
+
+def _write_stdin(stream, chunks, errors):
+    try:
+        for chunk in chunks:
+            stream.write(chunk)
+    except OSError:
+        pass  # ffmpeg exited, its return code tells why
+    except Exception as e:
+        errors.append(e)
+    finally:
+        try:
+            stream.close()
+        except OSError:
+            pass
+
+
+def _read_stdout(stream, consumer, errors):
+    try:
+        consumer(stream)
+    except Exception as e:
+        errors.append(e)
+    finally:
+        # Drain the rest so ffmpeg does not block before it is killed
+        while stream.read(65536):
+            pass
+
+
+def run_ffmpeg(args, cancel_event=None, progress=None, stdin=None, stdout=None):
+    """Runs ffmpeg with the given arguments, raises CalledProcessError on failure.
+
+    When cancel_event (a threading.Event) gets set the process is killed and
+    FFmpegCancelled is raised. progress(event) receives the parse_progress()
+    events of -progress, roughly twice a second, on a reader thread.
+
+    stdin is an iterable of bytes fed to pipe:0, stdout(stream) reads what
+    ffmpeg writes to pipe:1 and can't be combined with progress. Both run on
+    threads, an exception raised by either kills ffmpeg and is re-raised.
+    """
+    if progress is not None and stdout is not None:
+        raise ValueError("progress and stdout both need pipe:1")
+    cmd = ["ffmpeg", "-y", "-nostats", *args]
+    if progress is not None:
+        cmd[3:3] = ["-progress", "pipe:1"]
+    piped = progress is not None or stdout is not None
+    process = subprocess.Popen(
+        cmd, startupinfo=get_startupinfo(),
+        stdin=subprocess.PIPE if stdin is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE if piped else subprocess.DEVNULL,
+        stderr=subprocess.PIPE)
+
+    # Pipes are served on threads so the loop below can poll for cancel
+    stderr_chunks = []
+    errors = []
+    readers = [threading.Thread(
+        target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)]
+    if progress is not None:
+        readers.append(threading.Thread(
+            target=_read_progress, args=(process.stdout, progress), daemon=True))
+    if stdout is not None:
+        readers.append(threading.Thread(
+            target=_read_stdout, args=(process.stdout, stdout, errors), daemon=True))
+    if stdin is not None:
+        readers.append(threading.Thread(
+            target=_write_stdin, args=(process.stdin, stdin, errors), daemon=True))
+    for reader in readers:
+        reader.start()
+
+    try:
+        while True:
+            try:
+                process.wait(timeout=0.1)
+                break
+            except subprocess.TimeoutExpired:
+                if errors or (cancel_event is not None and cancel_event.is_set()):
+                    process.kill()
+                    process.wait()
+                    break
+    finally:
+        for reader in readers:
+            reader.join()
+
+    if errors:
+        raise errors[0]
+    if cancel_event is not None and cancel_event.is_set() and process.returncode != 0:
+        raise FFmpegCancelled()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(
+            process.returncode, cmd, stderr=b"".join(stderr_chunks))
+
+
+def encode_gif(input_file, output_file, filters="", two_pass=False,
+               input_args=(), output_args=(), cancel_event=None, progress=None,
+               stdin=None):
+    """Encodes a GIF with a generated palette.
+
+    filters is the filter chain applied before palette generation. By default
+    palettegen and paletteuse share one process through split, so the input
+    is decoded once. split queues every frame until the palette is ready, so
+    two_pass trades a second decode for flat memory use on long clips.
+    progress is passed to run_ffmpeg for the pass writing the GIF.
+
+    For piped input set input_file to "pipe:0", stdin() returns the chunks
+    to feed and is called again for the second pass.
+    """
+    chain = f"{filters}," if filters else ""
+
+    if not two_pass:
+        run_ffmpeg([*input_args, "-i", input_file,
+                    "-filter_complex", chain + PALETTE_GRAPH,
+                    *output_args, output_file], cancel_event=cancel_event,
+                   progress=progress, stdin=stdin() if stdin else None)
+        return
+
+    if filters:
+        use_graph = f"[0:v]{filters}[x];[x][1:v]paletteuse"
+    else:
+        use_graph = "[0:v][1:v]paletteuse"
+
+    fd, palette_file = tempfile.mkstemp(suffix=".png")
+    os.close(fd)
+    try:
+        # Pass 1: Palette
+        run_ffmpeg([*input_args, "-i", input_file,
+                    "-vf", chain + "palettegen", palette_file],
+                   cancel_event=cancel_event, stdin=stdin() if stdin else None)
+
+        # Pass 2: GIF
+        run_ffmpeg([*input_args, "-i", input_file, "-i", palette_file,
+                    "-filter_complex", use_graph, *output_args, output_file],
+                   cancel_event=cancel_event, progress=progress,
+                   stdin=stdin() if stdin else None)
+    finally:
+        if os.path.exists(palette_file):
+            os.remove(palette_file)
+
@@ -0,0 +1,85 @@
+import numpy as np
+from PIL import Image
+
+from FFmpegUtils import FFmpegCancelled
+
+# Duplicate frame detection for EditGifFrames. Pillow shrinks each frame to a
+# small thumbnail, NumPy hashes them a batch at a time: a difference hash
+# (dHash) records whether brightness rises between neighbours on a 9x8 grid,
+# 64 bits that survive dithering and compression noise but not real changes.
+
+HASH_WIDTH, HASH_HEIGHT = 9, 8
+# Thumbnail side per hash cell, averaged down to the grid
+CELL_SIZE = 4
+BATCH_SIZE = 256
+# Largest mean brightness difference (0-255) between the thumbnails of near
+# duplicates, the hash alone misses small moving parts on a static background
+MAX_THUMB_DIFF = 1.0
+LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def thumbnail(store, frame_id):
+    size = (HASH_WIDTH * CELL_SIZE, HASH_HEIGHT * CELL_SIZE)
+    return np.asarray(store.image(frame_id).resize(size, Image.Resampling.BOX))
+
+
+def dhash(thumbs):
+    """64 bit hashes and gray thumbnails of a (n, h, w, 4) RGBA thumbnail stack"""
+    rgba = thumbs.astype(np.float32)
+    # Transparent pixels count as dark
+    gray = (rgba[..., :3] @ LUMA) * (rgba[..., 3] / 255)
+    grid = gray.reshape(len(gray), HASH_HEIGHT, CELL_SIZE, HASH_WIDTH, CELL_SIZE).mean(axis=(2, 4))
+    bits = (grid[:, :, 1:] > grid[:, :, :-1]).reshape(len(gray), -1)
+    hashes = np.packbits(bits, axis=1, bitorder="little").view("<u8").ravel()
+    return hashes, gray.round().astype(np.uint8)
+
+
+def hash_frames(store, frame_ids, cancel_event=None, progress=None):
+    """{frame_id: (hash, gray thumbnail)}, each distinct id hashed once.
+    Waits for frames still decoding, progress(done, total) per batch."""
+    unique = list(dict.fromkeys(frame_ids))
+    result = {}
+    for start in range(0, len(unique), BATCH_SIZE):
+        batch = unique[start:start + BATCH_SIZE]
+        thumbs = []
+        for frame_id in batch:
+            if cancel_event is not None and cancel_event.is_set():
+                raise FFmpegCancelled()
+            thumbs.append(thumbnail(store, frame_id))
+        hashes, grays = dhash(np.stack(thumbs))
+        result.update(zip(batch, zip(hashes.tolist(), grays)))
+        if progress:
+            progress(start + len(batch), len(unique))
+    return result
+
+
+def duplicate_runs(store, frame_ids, max_distance=0, cancel_event=None, progress=None):
+    """Runs of consecutive frames that match the first frame of their run, as
+    (start, end) positions in frame_ids with end exclusive, two frames or more.
+
+    max_distance is how many hash bits may differ, at 0 the frames must also
+    be byte identical.
+    """
+    hashes = hash_frames(store, frame_ids, cancel_event, progress)
+
+    def same(first, other):
+        if first == other:
+            return True
+        (hash_a, gray_a), (hash_b, gray_b) = hashes[first], hashes[other]
+        if bin(hash_a ^ hash_b).count("1") > max_distance:
+            return False
+        if np.abs(gray_a.astype(np.int16) - gray_b).mean() > MAX_THUMB_DIFF:
+            return False
+        if max_distance:
+            return True
+        return store.size(first) == store.size(other) and store.frame(first) == store.frame(other)
+
+    runs = []
+    start = 0
+    for row in range(1, len(frame_ids) + 1):
+        if row < len(frame_ids) and same(frame_ids[start], frame_ids[row]):
+            continue
+        if row - start > 1:
+            runs.append((start, row))
+        start = row
+    return runs
@@ -0,0 +1,189 @@
+import os
+import json
+import math
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from PIL import Image
+
+from FFmpegUtils import FFmpegCancelled
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Bulk frame export for EditGifFrames. Frames are encoded on a thread pool,
+# Pillow releases the GIL while compressing. Files that would come out byte
+# identical to one that already exists are linked instead of encoded again.
+
+# name: (extension, Pillow format, level range, default level), the level is
+# the PNG compress level or the WebP/JPEG quality
+EXPORT_FORMATS = {
+    "PNG": ("png", "PNG", (0, 9), 6),
+    "WebP": ("webp", "WEBP", (0, 100), 80),
+    "JPEG": ("jpg", "JPEG", (1, 95), 90),
+    "Raw RGBA": ("rgba", None, None, None),
+}
+
+# Largest sprite sheet, in pixels, before an export is refused
+MAX_SHEET_PIXELS = 16384 * 16384
+
+# Linux ioctl cloning a file's extents, copy on write file systems only
+FICLONE = 0x40049409
+
+
+def reflink(source, dest):
+    """Shares the data blocks of source with a new dest file"""
+    if fcntl is None:
+        raise OSError("Reflinks are not supported on this platform")
+    try:
+        with open(source, "rb") as src, open(dest, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    except OSError:
+        try:
+            os.remove(dest)
+        except OSError:
+            pass
+        raise
+
+
+def link_file(source, dest, hardlink=True):
+    """Hardlink, reflink or copy, whichever works first.
+
+    Hardlinks share later edits between both names, pass hardlink=False for
+    sources that are not our own outputs.
+    """
+    if os.path.lexists(dest):
+        os.remove(dest)
+    if hardlink:
+        try:
+            os.link(source, dest)
+            return
+        except OSError:
+            pass
+    try:
+        reflink(source, dest)
+        return
+    except OSError:
+        pass
+    shutil.copyfile(source, dest)
+
+
+def save_options(pil_format, level):
+    if pil_format == "PNG":
+        return {"compress_level": level}
+    return {"quality": level}
+
+
+def export_frame(store, frame_id, path, fmt, level):
+    """Writes one frame, an unchanged source file in the same format is linked"""
+    _, pil_format, _, _ = EXPORT_FORMATS[fmt]
+    if pil_format is None:
+        store.copy_to(frame_id, path)
+        return
+    source = store.source(frame_id)
+    if source and source["format"] == pil_format:
+        link_file(source["path"], path, hardlink=False)
+        return
+    image = store.image(frame_id)
+    if pil_format == "JPEG":
+        image = image.convert("RGB")
+    image.save(path, pil_format, **save_options(pil_format, level))
+
+
+def export_frames(store, frame_ids, dest_dir, fmt="PNG", level=None,
+                  prefix="frame", workers=None, cancel_event=None,
+                  progress=None):
+    """Writes frame_ids as prefix_0000.ext, ... into dest_dir.
+
+    Raw RGBA files are named prefix_0000_WxH.rgba. A frame listed more than
+    once is written once and hardlinked. progress(done, total) is called
+    from the calling thread, returns the number of files written.
+    """
+    extension, pil_format, _, default_level = EXPORT_FORMATS[fmt]
+    level = default_level if level is None else level
+    os.makedirs(dest_dir, exist_ok=True)
+
+    first_paths = {}
+    unique, repeats = [], []
+    for i, frame_id in enumerate(frame_ids):
+        name = f"{prefix}_{i:04d}"
+        if pil_format is None:
+            w, h = store.size(frame_id)
+            name += f"_{w}x{h}"
+        path = os.path.join(dest_dir, f"{name}.{extension}")
+        if frame_id in first_paths:
+            repeats.append((first_paths[frame_id], path))
+        else:
+            first_paths[frame_id] = path
+            unique.append((frame_id, path))
+
+    def run(frame_id, path):
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        export_frame(store, frame_id, path, fmt, level)
+
+    done = 0
+    total = len(frame_ids)
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        futures = [pool.submit(run, frame_id, path) for frame_id, path in unique]
+        try:
+            for future in as_completed(futures):
+                future.result()
+                done += 1
+                if progress:
+                    progress(done, total)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    if cancel_event is not None and cancel_event.is_set():
+        raise FFmpegCancelled()
+
+    for first_path, path in repeats:
+        link_file(first_path, path)
+        done += 1
+        if progress:
+            progress(done, total)
+    return done
+
+
+def export_sprite_sheet(store, frame_ids, path, level=6, columns=None,
+                        cancel_event=None, progress=None):
+    """Places the frames on one PNG grid and describes the cells in a JSON
+    atlas next to it (same name, .json). Cells take the largest frame size,
+    smaller frames sit in their top left corner.
+    """
+    sizes = [store.size(frame_id) for frame_id in frame_ids]
+    cell_w = max(w for w, _ in sizes)
+    cell_h = max(h for _, h in sizes)
+    columns = columns or math.ceil(math.sqrt(len(frame_ids)))
+    rows = math.ceil(len(frame_ids) / columns)
+    sheet_size = (columns * cell_w, rows * cell_h)
+    if sheet_size[0] * sheet_size[1] > MAX_SHEET_PIXELS:
+        raise ValueError(f"Sprite sheet would be {sheet_size[0]}x{sheet_size[1]}, "
+                         "export fewer frames")
+
+    sheet = Image.new("RGBA", sheet_size)
+    cells = []
+    total = len(frame_ids) + 1
+    for i, frame_id in enumerate(frame_ids):
+        if cancel_event is not None and cancel_event.is_set():
+            raise FFmpegCancelled()
+        x, y = (i % columns) * cell_w, (i // columns) * cell_h
+        sheet.paste(store.image(frame_id), (x, y))
+        w, h = sizes[i]
+        cells.append({"x": x, "y": y, "w": w, "h": h,
+                      "duration": store.duration(frame_id)})
+        if progress:
+            progress(i + 1, total)
+
+    sheet.save(path, "PNG", compress_level=level)
+    atlas = {"image": os.path.basename(path), "size": list(sheet_size),
+             "columns": columns, "frames": cells}
+    with open(os.path.splitext(path)[0] + ".json", "w", encoding="utf-8") as f:
+        json.dump(atlas, f, indent=1)
+    if progress:
+        progress(total, total)
+    return len(frame_ids)
@@ -0,0 +1,192 @@
+# Frame list edits for EditGifFrames as undoable commands. A command turns
+# the model's row list (dicts referencing FrameStore ids) into a new one in a
+# single pass and keeps just enough to turn it back, pixel data is never
+# touched. After apply() or revert(), selection holds the rows to select.
+
+UNDO_LIMIT = 200
+
+
+def merge_rows(frames, rows, inserted):
+    """frames with inserted[i] placed so it ends up at rows[i], rows ascending"""
+    placed = dict(zip(rows, inserted))
+    rest = iter(frames)
+    return [placed[row] if row in placed else next(rest)
+            for row in range(len(frames) + len(placed))]
+
+
+class DeleteFrames:
+    name = "Delete"
+
+    def __init__(self, rows):
+        self.rows = sorted(set(rows))
+        self.removed = []
+        self.selection = []
+
+    def apply(self, frames):
+        dropped = set(self.rows)
+        self.removed = [frames[row] for row in self.rows]
+        self.selection = []
+        return [frame for row, frame in enumerate(frames) if row not in dropped]
+
+    def revert(self, frames):
+        self.selection = self.rows
+        return merge_rows(frames, self.rows, self.removed)
+
+
+class MoveFrames:
+    """Moves rows, in their order, in front of row dest (counted before the move)"""
+    name = "Move"
+
+    def __init__(self, rows, dest):
+        self.rows = sorted(set(rows))
+        self.dest = dest
+        self.position = None
+        self.selection = []
+
+    def apply(self, frames):
+        moved = set(self.rows)
+        block = [frames[row] for row in self.rows]
+        rest = [frame for row, frame in enumerate(frames) if row not in moved]
+        self.position = self.dest - sum(1 for row in self.rows if row < self.dest)
+        self.selection = list(range(self.position, self.position + len(block)))
+        return rest[:self.position] + block + rest[self.position:]
+
+    def revert(self, frames):
+        end = self.position + len(self.rows)
+        self.selection = self.rows
+        return merge_rows(frames[:self.position] + frames[end:], self.rows,
+                          frames[self.position:end])
+
+    def is_noop(self):
+        """True when the rows are one block that would stay where it is"""
+        contiguous = self.rows[-1] - self.rows[0] + 1 == len(self.rows)
+        return contiguous and self.rows[0] <= self.dest <= self.rows[-1] + 1
+
+
+class ReverseFrames:
+    name = "Reverse"
+
+    def __init__(self):
+        self.selection = []
+
+    def apply(self, frames):
+        return frames[::-1]
+
+    revert = apply
+
+
+class DuplicateFrames:
+    """Inserts a copy of each row right after it"""
+    name = "Duplicate"
+
+    def __init__(self, rows):
+        self.rows = sorted(set(rows))
+        self.copies = []
+        self.selection = []
+
+    def apply(self, frames):
+        selected = set(self.rows)
+        result = []
+        self.copies = []
+        for row, frame in enumerate(frames):
+            result.append(frame)
+            if row in selected:
+                self.copies.append(len(result))
+                result.append(dict(frame))
+        self.selection = self.copies
+        return result
+
+    def revert(self, frames):
+        copies = set(self.copies)
+        self.selection = self.rows
+        return [frame for row, frame in enumerate(frames) if row not in copies]
+
+
+class InsertFrames:
+    name = "Insert"
+
+    def __init__(self, row, frames):
+        self.row = row
+        self.frames = list(frames)
+        self.selection = []
+
+    def apply(self, frames):
+        self.selection = list(range(self.row, self.row + len(self.frames)))
+        return frames[:self.row] + self.frames + frames[self.row:]
+
+    def revert(self, frames):
+        self.selection = []
+        return frames[:self.row] + frames[self.row + len(self.frames):]
+
+
+class CollapseFrames:
+    """Keeps the first row of each (start, end) run, end exclusive, with the
+    run's summed delay from durations (ms, one per run)"""
+    name = "Collapse"
+
+    def __init__(self, runs, durations):
+        self.runs = runs
+        self.durations = durations
+        self.firsts = []
+        self.rows = []
+        self.removed = []
+        self.selection = []
+
+    def apply(self, frames):
+        self.firsts = [frames[start] for start, _ in self.runs]
+        kept = {start: dict(frames[start], duration=duration)
+                for (start, _), duration in zip(self.runs, self.durations)}
+        self.rows = [row for start, end in self.runs for row in range(start + 1, end)]
+        self.removed = [frames[row] for row in self.rows]
+        dropped = set(self.rows)
+        self.selection = []
+        removed_before = 0
+        for start, end in self.runs:
+            self.selection.append(start - removed_before)
+            removed_before += end - start - 1
+        return [kept.get(row, frame) for row, frame in enumerate(frames) if row not in dropped]
+
+    def revert(self, frames):
+        result = merge_rows(frames, self.rows, self.removed)
+        for (start, _), frame in zip(self.runs, self.firsts):
+            result[start] = frame
+        self.selection = self.rows
+        return result
+
+
+class FrameHistory:
+    """Undo and redo stacks for the commands run on a FrameListModel, every
+    step replaces the rows with one model reset"""
+
+    def __init__(self, model, limit=UNDO_LIMIT):
+        self.model = model
+        self.limit = limit
+        self.undo_stack = []
+        self.redo_stack = []
+
+    def run(self, command):
+        self.model.set_rows(command.apply(self.model.frames))
+        self.undo_stack.append(command)
+        del self.undo_stack[:-self.limit]
+        self.redo_stack.clear()
+        return command
+
+    def undo(self):
+        if not self.undo_stack:
+            return None
+        command = self.undo_stack.pop()
+        self.model.set_rows(command.revert(self.model.frames))
+        self.redo_stack.append(command)
+        return command
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        command = self.redo_stack.pop()
+        self.model.set_rows(command.apply(self.model.frames))
+        self.undo_stack.append(command)
+        return command
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
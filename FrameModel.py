@@ -0,0 +1,281 @@
+import os
+import hashlib
+from collections import OrderedDict
+from PyQt6.QtCore import (
+    Qt, QAbstractListModel, QModelIndex, QObject, QRunnable,
+    QStandardPaths, QThreadPool, pyqtSignal
+)
+from PyQt6.QtGui import QColor, QImage, QPixmap
+from PyQt6.QtWidgets import QListView
+
+# Frame list for EditGifFrames. Rows only hold FrameStore ids, thumbnails are
+# scaled on a background pool when the view first asks for them, kept in a
+# small LRU of pixmaps and written to a thumbnail store on disk so reopening
+# the same GIF skips the scaling.
+
+THUMB_SIZE = 120
+MAX_THUMBNAILS = 512
+# Sources (GIFs or added images) kept in the thumbnail store
+MAX_STORED_SOURCES = 64
+THUMB_STORE_DIR = os.environ.get("GIFTOOLS_THUMB_CACHE") or os.path.join(
+    QStandardPaths.writableLocation(QStandardPaths.StandardLocation.GenericCacheLocation),
+    "giftools", "thumbnails")
+
+
+def source_digest(path):
+    """Identifies a source file by path, size and modification time, cheap
+    enough for the UI thread since no file contents are read"""
+    stat = os.stat(path)
+    identity = f"{os.path.abspath(path)}\0{stat.st_size}\0{stat.st_mtime_ns}"
+    return hashlib.sha1(identity.encode("utf-8", "surrogateescape")).hexdigest()
+
+
+class ThumbnailStore:
+    """Thumbnails on disk, one directory per source digest"""
+
+    def __init__(self, directory=THUMB_STORE_DIR, max_sources=MAX_STORED_SOURCES):
+        self.directory = directory
+        self.max_sources = max_sources
+
+    def path(self, key):
+        digest, frame = key
+        return os.path.join(self.directory, digest, f"{frame:05d}_{THUMB_SIZE}.png")
+
+    def load(self, key):
+        image = QImage(self.path(key))
+        return None if image.isNull() else image
+
+    def save(self, key, image):
+        path = self.path(key)
+        temp_file = path + f".{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if image.save(temp_file, "PNG"):
+                os.replace(temp_file, path)
+        except OSError as e:
+            print(f"Thumbnail not saved: {e}")
+
+    def touch(self, digest):
+        """Marks a source as used and drops the least recently used ones"""
+        try:
+            os.makedirs(os.path.join(self.directory, digest), exist_ok=True)
+            os.utime(os.path.join(self.directory, digest))
+            sources = sorted(os.scandir(self.directory),
+                             key=lambda e: e.stat().st_mtime, reverse=True)
+        except OSError as e:
+            print(f"Thumbnail store unavailable: {e}")
+            return
+        for entry in sources[self.max_sources:]:
+            for name in os.listdir(entry.path):
+                try:
+                    os.remove(os.path.join(entry.path, name))
+                except OSError:
+                    pass
+            try:
+                os.rmdir(entry.path)
+            except OSError:
+                pass
+
+
+class ThumbnailSignals(QObject):
+    loaded = pyqtSignal(object, QImage)
+
+
+class ThumbnailLoader(QRunnable):
+    """Reads one thumbnail from the thumbnail store or scales the stored frame.
+
+    Emits a null image when the frame is not decoded yet, after asking the
+    decoder for it.
+    """
+
+    def __init__(self, key, frame_store, frame_id, thumb_store):
+        super().__init__()
+        self.key = key
+        self.frame_store = frame_store
+        self.frame_id = frame_id
+        self.thumb_store = thumb_store
+        self.signals = ThumbnailSignals()
+
+    def run(self):
+        image = self.thumb_store.load(self.key)
+        if image is None and not self.frame_store.is_ready(self.frame_id):
+            self.frame_store.request(self.frame_id)
+            image = QImage()
+        elif image is None:
+            try:
+                data = self.frame_store.frame(self.frame_id)
+            except ValueError as e:
+                print(f"Thumbnail Error: {e}")  # Store closed
+                return
+            w, h = self.frame_store.size(self.frame_id)
+            image = QImage(data, w, h, w * 4, QImage.Format.Format_RGBA8888).scaled(
+                THUMB_SIZE, THUMB_SIZE, Qt.AspectRatioMode.KeepAspectRatio,
+                Qt.TransformationMode.SmoothTransformation)
+            self.thumb_store.save(self.key, image)
+        self.signals.loaded.emit(self.key, image)
+
+
+class FrameListModel(QAbstractListModel):
+    """Frames as rows of {"id", "key", "name"}, id is the FrameStore id and
+    key (source digest, frame) names the thumbnail. An optional "duration"
+    (ms) overrides the stored delay of that row."""
+
+    def __init__(self, thumb_store=None, max_thumbnails=MAX_THUMBNAILS, parent=None):
+        super().__init__(parent)
+        self.frames = []
+        self.frame_store = None
+        self.thumb_store = thumb_store or ThumbnailStore()
+        self.max_thumbnails = max_thumbnails
+        self.thumbnails = OrderedDict()
+        self.pending = set()
+        # Thumbnails asked for before their frame was decoded
+        self.waiting = set()
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(os.cpu_count() or 1)
+        # Newer requests get a higher priority so the rows in view load first
+        self.serial = 0
+        self.placeholder = QPixmap(THUMB_SIZE, THUMB_SIZE * 2 // 3)
+        self.placeholder.fill(QColor("#181825"))
+
+    # Rows
+    def set_frames(self, frame_store, frames):
+        """Replaces all rows, frames is [(id, key, name)] from frame_store.
+
+        Waits for running thumbnails so the previous store can be closed.
+        """
+        self.pool.clear()
+        self.pool.waitForDone()
+        self.pending.clear()
+        self.waiting.clear()
+        self.beginResetModel()
+        self.frame_store = frame_store
+        self.frames = [{"id": frame_id, "key": key, "name": name}
+                       for frame_id, key, name in frames]
+        self.endResetModel()
+        for digest in {key[0] for _, key, _ in frames}:
+            self.thumb_store.touch(digest)
+
+    def set_rows(self, frames):
+        """Replaces the rows with an edited list of the same row dicts, one
+        reset however much changed (see FrameHistory)"""
+        self.beginResetModel()
+        self.frames = frames
+        self.endResetModel()
+
+    def frame_id(self, row):
+        return self.frames[row]["id"]
+
+    def frame_ids(self):
+        return [frame["id"] for frame in self.frames]
+
+    def duration(self, row, source=True):
+        """Delay of a row in ms, the stored source delay only if source is
+        True, None when the frame rate applies"""
+        frame = self.frames[row]
+        if frame.get("duration") is not None:
+            return frame["duration"]
+        return self.frame_store.duration(frame["id"]) if source else None
+
+    # Qt model interface
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.frames)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        frame = self.frames[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            w, h = self.frame_store.size(frame["id"])
+            duration = self.duration(index.row())
+            delay = f"{duration} ms" if duration is not None else "Frame rate"
+            return f"{frame['name']}\nDimensions: {w}x{h}\nDelay: {delay}"
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self.thumbnail(frame)
+        if role == Qt.ItemDataRole.UserRole:
+            return frame["id"]
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.ItemIsDropEnabled
+        return (Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+                | Qt.ItemFlag.ItemIsDragEnabled)
+
+    def supportedDropActions(self):
+        return Qt.DropAction.MoveAction
+
+    def dropMimeData(self, data, action, row, column, parent):
+        # Drops are handled by FrameListView as one move
+        return False
+
+    # Thumbnails
+    def thumbnail(self, frame):
+        key = frame["key"]
+        pixmap = self.thumbnails.get(key)
+        if pixmap is not None:
+            self.thumbnails.move_to_end(key)
+            return pixmap
+        if key not in self.pending:
+            self.pending.add(key)
+            loader = ThumbnailLoader(key, self.frame_store, frame["id"], self.thumb_store)
+            loader.signals.loaded.connect(self.on_thumbnail_loaded)
+            self.serial += 1
+            self.pool.start(loader, self.serial)
+        return self.placeholder
+
+    def on_thumbnail_loaded(self, key, image):
+        if key not in self.pending:
+            return
+        self.pending.discard(key)
+        if image.isNull():
+            self.waiting.add(key)
+            return
+        self.thumbnails[key] = QPixmap.fromImage(image)
+        while len(self.thumbnails) > self.max_thumbnails:
+            self.thumbnails.popitem(last=False)
+        for row, frame in enumerate(self.frames):
+            if frame["key"] == key:
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+    def frames_ready(self):
+        """Asks the view again for waiting thumbnails whose frame got decoded"""
+        if not self.waiting:
+            return
+        for row, frame in enumerate(self.frames):
+            if frame["key"] in self.waiting and self.frame_store.is_ready(frame["id"]):
+                self.waiting.discard(frame["key"])
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+    def shutdown(self):
+        """Drops queued thumbnails and waits for the running ones"""
+        self.pool.clear()
+        self.pending.clear()
+        self.pool.waitForDone(2000)
+
+
+class FrameListView(QListView):
+    """Turns an internal drag and drop into a single rows_dropped(rows, dest)
+    instead of one moveRows per selected row"""
+    rows_dropped = pyqtSignal(list, int)
+
+    def dropEvent(self, event):
+        if event.source() is not self:
+            event.ignore()
+            return
+        pos = event.position().toPoint()
+        index = self.indexAt(pos)
+        if not index.isValid():
+            dest = self.model().rowCount()
+        elif pos.y() < self.visualRect(index).center().y():
+            dest = index.row()
+        else:
+            dest = index.row() + 1
+        rows = sorted(index.row() for index in self.selectionModel().selectedIndexes())
+        # Accepting first tells QListView the data was moved, so the drag
+        # doesn't remove the source rows afterwards
+        event.accept()
+        super().dropEvent(event)
+        if rows:
+            self.rows_dropped.emit(rows, dest)
@@ -0,0 +1,206 @@
+import os
+import mmap
+import tempfile
+import threading
+
+from PIL import Image
+
+
+class FrameStore:
+    """Decoded RGBA frames kept once in a memory-mapped temp file.
+
+    Frames are appended and never rewritten, the frame editor reorders and
+    deletes by id so edits don't touch pixel data. frame(id) returns the raw
+    RGBA bytes, ready to be piped to ffmpeg as rawvideo. Safe to read from
+    several threads while another one appends.
+
+    reserve() lays out slots for frames decoded later, each at a fixed offset
+    so any frame is found without walking the others. fill() stores a slot,
+    frame() waits for slots that are not filled yet and asks the decoder for
+    them through request().
+    """
+
+    def __init__(self):
+        fd, self.path = tempfile.mkstemp(prefix="gif_frames_", suffix=".rgba")
+        self.file = os.fdopen(fd, "w+b")
+        self.frames = []
+        self.end = 0
+        self.map = None
+        self.closed = False
+        # Unfilled slots someone is waiting for, newest last
+        self.requests = []
+        self.lock = threading.Lock()
+        self.filled = threading.Condition(self.lock)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def add(self, data, size, duration=None, source=None):
+        """Appends raw RGBA bytes of size (w, h), returns the frame id.
+
+        duration is the source delay in ms, None for frames without one.
+        source describes the file the frame came from unchanged, see
+        add_image().
+        """
+        with self.lock:
+            self.file.seek(self.end)
+            self.file.write(data)
+            self.file.flush()
+            self.frames.append({"offset": self.end, "size": tuple(size),
+                                "duration": duration, "ready": True,
+                                "source": source})
+            self.end += len(data)
+            return len(self.frames) - 1
+
+    def reserve(self, size, durations):
+        """Adds one empty slot of size (w, h) per duration, returns their ids"""
+        frame_bytes = size[0] * size[1] * 4
+        with self.lock:
+            first = len(self.frames)
+            for duration in durations:
+                self.frames.append({"offset": self.end, "size": tuple(size),
+                                    "duration": duration, "ready": False,
+                                    "source": None})
+                self.end += frame_bytes
+            # Sparse on most file systems, unfilled slots read as transparent
+            self.file.truncate(self.end)
+            return range(first, len(self.frames))
+
+    def fill(self, frame_id, data=None):
+        """Writes a reserved slot, data None leaves it transparent"""
+        with self.lock:
+            if self.closed:
+                raise ValueError("Frame store is closed")
+            info = self.frames[frame_id]
+            if data is not None:
+                self.file.seek(info["offset"])
+                self.file.write(data)
+                self.file.flush()
+            info["ready"] = True
+            self.filled.notify_all()
+
+    def is_ready(self, frame_id):
+        return self.frames[frame_id]["ready"]
+
+    def request(self, frame_id):
+        """Asks whoever fills the slots for this frame before the others"""
+        with self.lock:
+            if not self.frames[frame_id]["ready"]:
+                self.requests.append(frame_id)
+
+    def next_request(self):
+        """The most recently requested frame still unfilled, None if there is none"""
+        with self.lock:
+            while self.requests:
+                frame_id = self.requests.pop()
+                if not self.frames[frame_id]["ready"]:
+                    return frame_id
+            return None
+
+    def add_image(self, image, duration=None):
+        """Adds a Pillow image, one opened from a file remembers that file's
+        path, format and stat so exports can reuse it while it is unchanged"""
+        source = None
+        if getattr(image, "filename", None) and image.format:
+            stat = os.stat(image.filename)
+            source = {"path": image.filename, "format": image.format,
+                      "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+        rgba = image.convert("RGBA")
+        return self.add(rgba.tobytes(), rgba.size, duration, source)
+
+    def wait_ready(self, frame_id):
+        """Blocks until the frame is filled, call with the lock held"""
+        info = self.frames[frame_id]
+        if not info["ready"]:
+            self.requests.append(frame_id)
+        while not info["ready"] and not self.closed:
+            self.filled.wait()
+        if self.closed:
+            raise ValueError("Frame store is closed")
+        return info
+
+    def frame(self, frame_id):
+        with self.lock:
+            info = self.wait_ready(frame_id)
+            w, h = info["size"]
+            end = info["offset"] + w * h * 4
+            if self.map is None or len(self.map) < end:
+                # Remap after appends, readers still holding the old map keep it alive
+                self.file.flush()
+                self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            return self.map[info["offset"]:end]
+
+    def copy_to(self, frame_id, path):
+        """Writes the raw RGBA bytes of a frame to path, copied inside the
+        kernel where the platform and file systems allow it"""
+        with self.lock:
+            info = self.wait_ready(frame_id)
+        w, h = info["size"]
+        offset, remaining = info["offset"], w * h * 4
+        if hasattr(os, "copy_file_range"):
+            try:
+                with open(self.path, "rb") as src, open(path, "wb") as dst:
+                    while remaining:
+                        copied = os.copy_file_range(src.fileno(), dst.fileno(),
+                                                    remaining, offset_src=offset)
+                        if not copied:
+                            break
+                        offset += copied
+                        remaining -= copied
+                if not remaining:
+                    return
+            except OSError:
+                pass
+        with open(path, "wb") as f:
+            f.write(self.frame(frame_id))
+
+    def source(self, frame_id):
+        """The unchanged file behind a frame, None if there is none or it
+        changed since it was added"""
+        source = self.frames[frame_id]["source"]
+        if source is None:
+            return None
+        try:
+            stat = os.stat(source["path"])
+        except OSError:
+            return None
+        if (stat.st_mtime_ns, stat.st_size) != (source["mtime_ns"], source["size"]):
+            return None
+        return source
+
+    def image(self, frame_id):
+        return Image.frombytes("RGBA", self.size(frame_id), self.frame(frame_id))
+
+    def size(self, frame_id):
+        return self.frames[frame_id]["size"]
+
+    def duration(self, frame_id):
+        return self.frames[frame_id]["duration"]
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.filled.notify_all()
+            if self.map is not None:
+                self.map.close()
+                self.map = None
+            self.file.close()
+        try:
+            os.remove(self.path)
+        except OSError as e:
+            print(f"Frame store not removed: {e}")
+
+
+def fit_image(image, size):
+    """Shrinks image to fit size if needed, keeping its aspect, centered on
+    transparency"""
+    if image.size == tuple(size):
+        return image
+    fitted = image.copy()
+    fitted.thumbnail(size, Image.Resampling.LANCZOS)
+    canvas = Image.new("RGBA", size, (0, 0, 0, 0))
+    canvas.paste(fitted, ((size[0] - fitted.width) // 2,
+                          (size[1] - fitted.height) // 2))
+    return canvas
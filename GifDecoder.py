@@ -0,0 +1,299 @@
+import io
+import mmap
+import struct
+import bisect
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+from FFmpegUtils import FFmpegCancelled
+
+# Frame decoding for EditGifFrames straight from the offsets scan_gif()
+# records. Each frame's LZW data is decoded on its own, wrapped in a minimal
+# GIF for Pillow, and drawn over the canvas left by the frame before it the
+# way Pillow's sequential decode does, so frames come out byte identical to
+# frame.convert("RGBA"). A frame can only be drawn once the canvas under it
+# is known: it is rebuilt from the nearest frame before it that the decoder
+# just drew, that is already in the FrameStore, or that covers the canvas.
+# The canvas is a NumPy array of RGBA pixels as uint32, colors come from
+# lookup tables Pillow converts from each frame's color table.
+
+# Color tables kept as lookup tables, GIFs with a local table per frame
+# rarely repeat one
+MAX_LUTS = 64
+
+
+def _palette_needed(palette):
+    # Pillow decodes frames whose color table maps every index i to gray i
+    # as grayscale, those go through the sequential decode
+    return any(palette[i] != i // 3 for i in range(len(palette)))
+
+
+def _pixel(rgba):
+    return np.frombuffer(bytes(rgba), dtype=np.uint32)[0]
+
+
+class GifDecoder:
+    """Draws the frames of a scanned GIF (see scan_gif()), position is the
+    frame next() draws and canvas the pixels it is drawn over"""
+
+    def __init__(self, path, info):
+        self.frames = info["frames"]
+        self.size = (info["width"], info["height"])
+        self.background = info["background"]
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Pillow keeps a disposal method until a later frame sets another one
+        self.disposal = []
+        disposal = 0
+        for frame in self.frames:
+            disposal = frame["disposal"] or disposal
+            self.disposal.append(disposal)
+        # Frames after the first are drawn in RGBA when the first frame has
+        # transparency, otherwise in RGB and always opaque
+        self.alpha = self.frames[0]["transparency"] is not None
+        self.supported = all(self.fits(frame) for frame in self.frames)
+        # Frames that can be drawn without the canvas under them
+        self.starts = [0] + [index for index in range(1, len(self.frames))
+                             if self.covers(index) or self.clears(index - 1)]
+        self.luts = {}
+        self.position = None
+        self.canvas = None
+
+    def close(self):
+        self.data.close()
+
+    def fits(self, frame):
+        x, y, w, h = frame["bbox"]
+        return (frame["palette"] is not None and _palette_needed(frame["palette"])
+                and w and h and x + w <= self.size[0] and y + h <= self.size[1])
+
+    def full(self, index):
+        return self.frames[index]["bbox"] == (0, 0) + self.size
+
+    def covers(self, index):
+        """True when the frame hides everything under it and disposing it
+        doesn't bring the canvas under it back"""
+        return (self.full(index) and self.frames[index]["transparency"] is None
+                and self.disposal[index] != 3)
+
+    def clears(self, index):
+        """True when disposing the frame leaves a blank canvas"""
+        return index > 0 and self.full(index) and self.disposal[index] == 2
+
+    def resumable(self, index):
+        """True when the canvas after the frame follows from its pixels alone"""
+        return index > 0 and self.disposal[index] != 3
+
+    def seek(self, index, data=None):
+        """Draws frame index next, data is the stored RGBA frame before it
+        when the canvas under index is not otherwise known"""
+        if data is not None:
+            canvas = np.frombuffer(data, dtype=np.uint32).reshape(self.size[::-1]).copy()
+            self.canvas = self.dispose(index - 1, canvas)
+        elif index > 0 and not self.covers(index):
+            self.canvas = self.dispose(index - 1, self.blank())
+        else:
+            self.canvas = None
+        self.position = index
+
+    def blank(self):
+        return np.zeros(self.size[::-1], dtype=np.uint32)
+
+    def indices(self, index):
+        """Color indices of the frame's rectangle as a (h, w) array, pixels
+        the image data doesn't reach are transparent"""
+        frame = self.frames[index]
+        x, y, w, h = frame["bbox"]
+        offset = frame["offset"]
+        flags = self.data[offset + 9]
+        start = offset + 10
+        if flags & 0x80:
+            start += 3 * (2 << (flags & 0x07))
+        end = frame["end"] or len(self.data)
+        gce = b""
+        if frame["transparency"] is not None:
+            gce = struct.pack("<4BHBB", 0x21, 0xF9, 4, 1, 0, frame["transparency"], 0)
+        # Same rectangle at the origin of a canvas its size, no color tables
+        wrapped = (b"GIF89a" + struct.pack("<HHBBB", w, h, 0, 0, 0) + gce
+                   + struct.pack("<BHHHHB", 0x2C, 0, 0, w, h, flags & 0x40)
+                   + self.data[start:end] + b";")
+        with Image.open(io.BytesIO(wrapped)) as image:
+            image.load()
+            return np.asarray(image)
+
+    def lut(self, index, transparency=None):
+        """RGBA pixel of each color index of the frame, as Pillow converts it"""
+        palette = self.frames[index]["palette"]
+        key = (palette, transparency)
+        lut = self.luts.get(key)
+        if lut is None:
+            colors = Image.frombytes("P", (256, 1), bytes(range(256)))
+            colors.putpalette(palette)
+            if transparency is not None:
+                colors.info["transparency"] = transparency
+            lut = np.frombuffer(colors.convert("RGBA").tobytes(), dtype=np.uint32)
+            if len(self.luts) >= MAX_LUTS:
+                self.luts.clear()
+            self.luts[key] = lut
+        return lut
+
+    def rgb(self, index, color):
+        palette = self.frames[index]["palette"]
+        if color * 3 + 3 > len(palette):
+            color = 0
+        return tuple(palette[color * 3:color * 3 + 3])
+
+    def dispose(self, index, canvas, saved=None):
+        """The canvas after frame index was shown, canvas holding the frame
+        and saved the rectangle under it for disposal 3. The first frame's
+        canvas holds color indices."""
+        frame = self.frames[index]
+        x, y, w, h = frame["bbox"]
+        rect = canvas[y:y + h, x:x + w]
+        transparency = frame["transparency"]
+        if index == 0:
+            color = transparency if transparency is not None else self.background
+            if self.disposal[0] == 2 or self.disposal[0] == 3 and transparency is not None:
+                rect[...] = color
+            return self.lut(0, transparency).take(canvas)
+        if self.disposal[index] == 2:
+            if transparency is not None:
+                rect[...] = _pixel(self.rgb(index, transparency) + ((0,) if self.alpha else (255,)))
+            else:
+                rect[...] = _pixel(self.rgb(index, self.background) + (255,))
+        elif self.disposal[index] == 3:
+            rect[...] = saved
+        return canvas
+
+    def next(self):
+        """Draws the frame at position and moves on, returns (index, RGBA bytes)"""
+        index = self.position
+        frame = self.frames[index]
+        x, y, w, h = frame["bbox"]
+        transparency = frame["transparency"]
+        saved = None
+        if index == 0:
+            canvas = np.full(self.size[::-1], transparency or 0, dtype=np.uint8)
+            canvas[y:y + h, x:x + w] = self.indices(0)
+            data = self.lut(0, transparency).take(canvas).tobytes()
+        else:
+            indices = self.indices(index)
+            canvas = self.canvas if self.canvas is not None else self.blank()
+            rect = canvas[y:y + h, x:x + w]
+            if self.disposal[index] == 3:
+                saved = rect.copy()
+            colors = self.lut(index).take(indices)
+            if transparency is None:
+                rect[...] = colors
+            else:
+                np.copyto(rect, colors, where=indices != transparency)
+            data = canvas.tobytes()
+        self.position = index + 1
+        self.canvas = None
+        if self.position < len(self.frames):
+            self.canvas = self.dispose(index, canvas, saved)
+        return index, data
+
+
+def decode_sequential(path, store, frame_ids, cancel_event=None, progress=None):
+    """Decodes the frames in order with Pillow into their slots, for GIFs
+    GifDecoder doesn't draw. Returns how many could be decoded."""
+    decoded = 0
+    try:
+        with Image.open(path) as image:
+            for frame in ImageSequence.Iterator(image):
+                if decoded == len(frame_ids):
+                    break
+                if cancel_event is not None and cancel_event.is_set():
+                    raise FFmpegCancelled()
+                rgba = frame.convert("RGBA")
+                size = store.size(frame_ids[decoded])
+                if rgba.size != size:
+                    # Pillow grows the canvas for frames reaching past it
+                    rgba = rgba.crop((0, 0) + size)
+                store.fill(frame_ids[decoded], rgba.tobytes())
+                decoded += 1
+                if progress:
+                    progress(decoded, len(frame_ids))
+    except OSError as e:
+        print(f"Decode Error: {e}")
+    return decoded
+
+
+def decode_frames(path, info, store, frame_ids, cancel_event=None, progress=None):
+    """Decodes the frames of a scanned GIF into their reserved FrameStore
+    slots, frame_ids[i] being frame i. Frames asked for through
+    store.request() are decoded first, the rest in order. Returns how many
+    could be decoded, frames after one that could not are left transparent.
+    """
+    decoder = GifDecoder(path, info)
+    try:
+        if not decoder.supported:
+            decoded = decode_sequential(path, store, frame_ids, cancel_event, progress)
+            for frame_id in frame_ids[decoded:]:
+                store.fill(frame_id)
+            return decoded
+
+        total = len(frame_ids)
+        done = 0
+        missing = 0
+        first = 0  # Frames before it are all filled
+
+        def target():
+            nonlocal first
+            frame_id = store.next_request()
+            if frame_id is not None and frame_id in frame_ids:
+                return frame_ids.index(frame_id)
+            position = decoder.position
+            if position is not None and position < total and not store.is_ready(frame_ids[position]):
+                return position
+            while first < total and store.is_ready(frame_ids[first]):
+                first += 1
+            return first if first < total else None
+
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                raise FFmpegCancelled()
+            index = target()
+            if index is None:
+                break
+
+            # Latest known canvas at or before index: the decoder's own, a
+            # frame drawn without the canvas under it, or a stored frame
+            position = decoder.position
+            if position is None or position > index:
+                position = -1
+            start = decoder.starts[bisect.bisect_right(decoder.starts, index) - 1]
+            for before in range(index - 1, max(position, start) - 1, -1):
+                if store.is_ready(frame_ids[before]) and decoder.resumable(before):
+                    decoder.seek(before + 1, store.frame(frame_ids[before]))
+                    break
+            else:
+                if start > position:
+                    decoder.seek(start)
+
+            while decoder.position <= index:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise FFmpegCancelled()
+                position = decoder.position
+                try:
+                    _, data = decoder.next()
+                except (OSError, ValueError, SyntaxError) as e:
+                    print(f"Decode Error: frame {position + 1}: {e}")
+                    # Later frames are drawn over this one, leave them all
+                    # transparent like a sequential decode stopping here
+                    for frame_id in frame_ids[position:]:
+                        if not store.is_ready(frame_id):
+                            store.fill(frame_id)
+                            missing += 1
+                    decoder.position = None
+                    break
+                if not store.is_ready(frame_ids[position]):
+                    store.fill(frame_ids[position], data)
+                    done += 1
+                    if progress:
+                        progress(done + missing, total)
+        return total - missing
+    finally:
+        decoder.close()
@@ -0,0 +1,200 @@
+import os
+
+from FFmpegUtils import FFmpegCancelled, run_ffmpeg, encode_gif
+from GifScanner import scan_gif, effective_duration
+from KeyframeCrop import InterpolationType, build_crop_filter
+from ProbeCache import probe_cache
+from TargetSizeSolver import TargetSizeSolver
+from TextOverlay import make_style, make_track, overlay_tracks
+
+# Qt free versions of every tool, shared by the CLI and the batch queue. Each
+# operation takes an input and an output path and returns a dict describing
+# the result, errors are raised. ffmpeg based operations take a cancel_event
+# (threading.Event) that kills the running process when set, and a progress
+# callback receiving FFmpegUtils.parse_progress() events. The text overlay
+# checks its cancel_event after every frame, gifsicle can't be stopped once
+# it runs.
+
+try:
+    from pygifsicle import gifsicle
+except ImportError:
+    gifsicle = None
+
+
+def detect_fps(path, default=30.0):
+    """Frame rate of a GIF or video, read from the GIF delays when possible"""
+    if path.lower().endswith(".gif"):
+        try:
+            frames = scan_gif(path)["frames"]
+            total_ms = sum(effective_duration(f["duration"]) for f in frames)
+            if frames and total_ms:
+                return len(frames) * 1000.0 / total_ms
+        except (OSError, ValueError):
+            pass
+    return probe_cache.fps(path) or default
+
+
+def detect_duration(path):
+    """Length in seconds of a GIF or video, None if unknown"""
+    if path.lower().endswith(".gif"):
+        try:
+            frames = scan_gif(path)["frames"]
+            return sum(effective_duration(f["duration"]) for f in frames) / 1000.0
+        except (OSError, ValueError):
+            pass
+    return probe_cache.duration(path)
+
+
+def resize_gif(input_file, output_file, fps=None, scale=None, width=None,
+               height=None, target_mb=None, exact=False, workers=1,
+               two_pass=False, status=None, cancel_event=None, progress=None):
+    """Resizes by factor, by resolution or to a target file size.
+
+    status(message) receives the target size search progress, progress
+    is only used for the single encode of the other modes.
+    """
+    fps = fps or round(detect_fps(input_file))
+
+    def encode(source, output, fps, scale_filter, cancel_event=None,
+               progress=None):
+        encode_gif(source, output, f"fps={fps},{scale_filter}",
+                   two_pass=two_pass, cancel_event=cancel_event,
+                   progress=progress)
+
+    if target_mb:
+        solver = TargetSizeSolver(input_file, fps, target_mb, status=status,
+                                  cancel_event=cancel_event)
+        if exact:
+            return solver.search(output_file, encode, workers=workers)
+        return solver.solve(output_file, encode)
+
+    if width or height:
+        scale_filter = f"scale={width or -1}:{height or -1}:flags=lanczos"
+    else:
+        factor = scale or 1.0
+        scale_filter = f"scale=iw*{factor}:ih*{factor}:flags=lanczos"
+    encode(input_file, output_file, fps, scale_filter, cancel_event, progress)
+    return {"fps": fps}
+
+
+def compress_gif(input_file, output_file, colors=None, lossy=None,
+                 cancel_event=None):
+    """Runs gifsicle optimization, optionally reducing colors and lossy"""
+    if gifsicle is None:
+        raise RuntimeError("pygifsicle is not installed")
+    if cancel_event is not None and cancel_event.is_set():
+        raise FFmpegCancelled()
+
+    options = {
+        'sources': [input_file],
+        'destination': output_file,
+        'optimize': True,
+    }
+    if colors:
+        options['colors'] = colors
+    if lossy:
+        options['options'] = [f'--lossy={lossy}']
+    gifsicle(**options)
+
+    if not os.path.exists(output_file):
+        raise RuntimeError("Output file was not created")
+    orig_size = os.path.getsize(input_file)
+    new_size = os.path.getsize(output_file)
+    return {"saved": (orig_size - new_size) / orig_size * 100}
+
+
+def convert_video(input_file, output_file, fps=None, width=None, height=None,
+                  two_pass=False, cancel_event=None, progress=None):
+    """Converts between video and GIF, direction picked by the output extension"""
+    filters = []
+    if fps:
+        filters.append(f"fps={fps}")
+    if width or height:
+        filters.append(f"scale={width or -1}:{height or -1}:flags=lanczos")
+
+    if output_file.lower().endswith(".gif"):
+        encode_gif(input_file, output_file, ",".join(filters),
+                   two_pass=two_pass, cancel_event=cancel_event,
+                   progress=progress)
+    else:
+        # Need consistent even size for H.264
+        filters.append("scale=trunc(iw/2)*2:trunc(ih/2)*2")
+        run_ffmpeg(["-i", input_file, "-movflags", "faststart",
+                    "-pix_fmt", "yuv420p", "-vf", ",".join(filters),
+                    output_file], cancel_event=cancel_event, progress=progress)
+    return {}
+
+
+def crop_gif(input_file, output_file, x, y, width, height, rotation=0,
+             cancel_event=None, progress=None):
+    """Rotates by a multiple of 90 degrees then crops"""
+    transpose_filters = {
+        90: ["transpose=1"],
+        180: ["transpose=1,transpose=1"],
+        270: ["transpose=2"],
+    }.get(rotation % 360, [])
+    crop_filters = transpose_filters + [f"crop={width}:{height}:{x}:{y}"]
+    encode_gif(input_file, output_file, ",".join(crop_filters),
+               cancel_event=cancel_event, progress=progress)
+    return {}
+
+
+def keyframe_crop_gif(input_file, output_file, keyframes, width, height,
+                      interp=InterpolationType.LINEAR, cancel_event=None,
+                      progress=None):
+    """Animated crop, keyframes maps frame index -> (x, y, w, h)"""
+    if not keyframes:
+        raise ValueError("At least one keyframe is required")
+    encode_gif(input_file, output_file,
+               build_crop_filter(keyframes, width, height, interp),
+               cancel_event=cancel_event, progress=progress)
+    return {}
+
+
+def add_text_to_gif(input_file, output_file, text, x=10, y=10, start=0,
+                    end=None, workers=1, keep_palette=False, cancel_event=None,
+                    **style):
+    """Draws a caption on frames start to end (0-based, inclusive), style keys
+    follow TextOverlay.DEFAULT_STYLE. workers processes encode the frames,
+    keep_palette reuses the source color tables instead of quantizing"""
+    track = make_track(text, (x, y), make_style(**style), start=start, end=end)
+
+    def check_cancelled(done, total):
+        # Leaves output_file untouched, the partial file is dropped
+        if cancel_event is not None and cancel_event.is_set():
+            raise FFmpegCancelled()
+
+    frames = overlay_tracks(input_file, output_file, [track], workers=workers,
+                            keep_palette=keep_palette, progress=check_cancelled)
+    return {"frames": frames}
+
+
+def edit_frames(input_file, output_file, delete=(), reverse=False, fps=None,
+                two_pass=False, cancel_event=None, progress=None):
+    """Drops frames (1-based, like the extracted frame names), optionally
+    reverses the rest and retimes them to a constant fps"""
+    fps = fps or detect_fps(input_file)
+    filters = []
+    if delete:
+        dropped = "+".join(f"eq(n,{n - 1})" for n in sorted(set(delete)))
+        filters.append(f"select='not({dropped})'")
+    if reverse:
+        filters.append("reverse")
+    filters.append(f"setpts=N/({fps}*TB)")
+    encode_gif(input_file, output_file, ",".join(filters), two_pass=two_pass,
+               output_args=["-r", str(fps), "-loop", "0"],
+               cancel_event=cancel_event, progress=progress)
+    return {"fps": fps}
+
+
+def extract_frames(input_file, output_dir, fps=None, cancel_event=None,
+                   progress=None):
+    """Writes the frames as frame_0001.png, ... into output_dir"""
+    os.makedirs(output_dir, exist_ok=True)
+    args = ["-i", input_file]
+    if fps:
+        args += ["-vf", f"fps={fps}"]
+    run_ffmpeg([*args, os.path.join(output_dir, "frame_%04d.png")],
+               cancel_event=cancel_event, progress=progress)
+    return {"frames": len([f for f in os.listdir(output_dir)
+                           if f.startswith("frame_") and f.endswith(".png")])}
@@ -0,0 +1,96 @@
+import mmap
+import struct
+
+
+def _skip_sub_blocks(data, pos):
+    # Data sub-blocks are length prefixed and end with a zero length block
+    while True:
+        size = data[pos]
+        pos += 1
+        if size == 0:
+            return pos
+        pos += size
+
+
+def scan_gif(path):
+    """Walks the GIF block structure without decoding any pixel data.
+
+    Returns the canvas size, background color index, loop count and one
+    entry per frame holding the image descriptor offset, the offset just
+    past its image data (end), delay (ms), disposal, transparency index, the
+    frame rectangle (x, y, w, h) and the RGB color table it uses (local or
+    global, None if there is neither).
+    """
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    info = None
+    try:
+        if data[:3] != b"GIF":
+            raise ValueError(f"Not a GIF file: {path}")
+
+        width, height, packed = struct.unpack_from("<HHB", data, 6)
+        pos = 13
+        global_palette = None
+        background = 0
+        if packed & 0x80:
+            background = data[11]
+            size = 3 * (2 << (packed & 0x07))
+            global_palette = bytes(data[pos:pos + size])
+            pos += size
+
+        info = {"width": width, "height": height, "background": background,
+                "loop": None, "frames": []}
+        gce = None
+        end = len(data)
+
+        while pos < end:
+            block = data[pos]
+            if block == 0x3B:  # Trailer
+                break
+            elif block == 0x21:  # Extension
+                label = data[pos + 1]
+                if label == 0xF9 and data[pos + 2] == 4:
+                    flags, delay, transparency = struct.unpack_from(
+                        "<BHB", data, pos + 3)
+                    gce = {
+                        "gce_offset": pos + 3,
+                        "duration": delay * 10,
+                        "disposal": (flags >> 2) & 0x07,
+                        "transparency": transparency if flags & 1 else None,
+                    }
+                elif label == 0xFF and data[pos + 3:pos + 14] == b"NETSCAPE2.0":
+                    info["loop"] = struct.unpack_from("<H", data, pos + 16)[0]
+                pos = _skip_sub_blocks(data, pos + 2)
+            elif block == 0x2C:  # Image descriptor
+                x, y, w, h, flags = struct.unpack_from("<HHHHB", data, pos + 1)
+                frame = {"offset": pos, "end": None, "gce_offset": None, "duration": 0,
+                         "disposal": 0, "transparency": None,
+                         "bbox": (x, y, w, h), "palette": global_palette}
+                if gce:
+                    frame.update(gce)
+                info["frames"].append(frame)
+                gce = None
+
+                pos += 10
+                if flags & 0x80:
+                    size = 3 * (2 << (flags & 0x07))
+                    frame["palette"] = bytes(data[pos:pos + size])
+                    pos += size
+                pos = _skip_sub_blocks(data, pos + 1)  # LZW code size byte
+                frame["end"] = pos
+            else:
+                # Corrupt or truncated stream, keep what we have so far
+                break
+        return info
+    except (IndexError, struct.error):
+        # Truncated file, keep the frames read so far
+        if info is None:
+            raise ValueError(f"Not a GIF file: {path}")
+        return info
+    finally:
+        data.close()
+
+
+def effective_duration(duration):
+    """Delay browsers and ffmpeg actually use for a frame, in ms"""
+    return duration if duration >= 20 else 100
@@ -1,4 +1,5 @@
 import sys
+import multiprocessing
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QGridLayout,
     QPushButton, QLabel, QFrame
@@ -16,6 +17,7 @@ try:
     from CropGif import GifCropper
     from CropGifWithKeyframes import GifCropper as KeyframeCropper
     from VideoToFrames import VideoToFramesConverter
+    from BatchQueue import BatchQueue
     from About import About 
 except ImportError as e:
     print(f"Error importing modules: {e}")
@@ -150,17 +152,24 @@ class GifToolsLauncher(QMainWindow):
         grid_layout.addWidget(self.btn_compress, 3, 1)
 
         # ROW 4
+        # Batch Queue
+        self.btn_batch = self.create_button(
+            "📦  Batch Queue", "Process many files at once", "#89dceb")
+        self.btn_batch.clicked.connect(self.launch_batch)
+        grid_layout.addWidget(self.btn_batch, 4, 0, 1, 2)
+
+        # ROW 5
         # About Button
         self.btn_about = self.create_button(
             "ℹ️ About", "App info & version", "#bac2de")
         self.btn_about.clicked.connect(self.launch_about)
-        grid_layout.addWidget(self.btn_about, 4, 0)
+        grid_layout.addWidget(self.btn_about, 5, 0)
 
         # Exit Button (Styled as a card now)
         self.btn_exit = self.create_button(
             "🚪 Exit", "Close Application", "#f38ba8")
         self.btn_exit.clicked.connect(self.close)
-        grid_layout.addWidget(self.btn_exit, 4, 1)
+        grid_layout.addWidget(self.btn_exit, 5, 1)
 
         main_layout.addLayout(grid_layout)
         main_layout.addStretch()
@@ -221,12 +230,18 @@ class GifToolsLauncher(QMainWindow):
         self.windows['crop_keys'] = KeyframeCropper()
         self.windows['crop_keys'].show()
 
+    def launch_batch(self):
+        self.windows['batch'] = BatchQueue()
+        self.windows['batch'].show()
+
     def launch_about(self):
         self.windows['about'] = About()
         self.windows['about'].show()
 
 
 if __name__ == "__main__":
+    # Batch workers re-launch the frozen executable
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = GifToolsLauncher()
     window.show()
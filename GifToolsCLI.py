@@ -0,0 +1,285 @@
+import argparse
+import inspect
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import GifOperations
+from FFmpegUtils import describe_progress
+from KeyframeCrop import InterpolationType
+
+# Headless entry point, runs any tool over many inputs without PyQt6
+# Example: python GifToolsCLI.py resize *.gif --scale 0.5 --output-dir small -j 4
+
+# Output names for commands that do not write a GIF
+OUTPUT_EXT = {"extract": ""}
+
+# Arguments consumed by the CLI itself, everything else goes to the operation
+CLI_KEYS = {"command", "operation", "inputs", "output", "output_dir",
+            "suffix", "jobs", "format", "progress"}
+
+# Set in each worker, receives (input, percent, text) progress tuples
+_progress_queue = None
+# Set in each worker, a multiprocessing Event that cancels running jobs
+_cancel_event = None
+
+
+def keyframe(value):
+    """Parses FRAME:X,Y,W,H"""
+    try:
+        frame, rect = value.split(":")
+        x, y, w, h = (float(v) for v in rect.split(","))
+        return int(frame), (x, y, w, h)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Keyframe must look like FRAME:X,Y,W,H, got '{value}'")
+
+
+def interpolation(value):
+    for interp in InterpolationType:
+        if value.lower() in (interp.name.lower(), interp.value.lower()):
+            return interp
+    raise argparse.ArgumentTypeError(f"Unknown interpolation '{value}'")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="giftools", description="Batch GIF processing without the GUI")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name, operation, help_text):
+        sub = commands.add_parser(name, help=help_text)
+        sub.set_defaults(operation=operation)
+        sub.add_argument("inputs", nargs="+", help="Input files")
+        sub.add_argument("-o", "--output",
+                         help="Output path, only with a single input")
+        sub.add_argument("--output-dir",
+                         help="Directory for outputs, defaults to next to each input")
+        sub.add_argument("--suffix", default=f"_{name.replace('-', '_')}",
+                         help="Appended to input names when -o is not given")
+        sub.add_argument("-j", "--jobs", type=int, default=1,
+                         help="Files processed in parallel")
+        sub.add_argument("--progress", action="store_true",
+                         help="Print ffmpeg progress, speed and ETA per file")
+        return sub
+
+    # Resize
+    sub = add_command("resize", "resize_gif", "Resize GIFs")
+    sub.add_argument("--fps", type=float)
+    sub.add_argument("--scale", type=float, help="Scale factor, e.g. 0.5")
+    sub.add_argument("--width", type=int)
+    sub.add_argument("--height", type=int)
+    sub.add_argument("--target-mb", type=float, help="Target file size in MB")
+    sub.add_argument("--exact", action="store_true",
+                     help="Search with full encodes instead of predicting")
+    sub.add_argument("--workers", type=int, default=1,
+                     help="Parallel encodes per file for --exact")
+    sub.add_argument("--two-pass", action="store_true",
+                     help="Low memory palette generation")
+
+    # Compress
+    sub = add_command("compress", "compress_gif", "Optimize GIFs with gifsicle")
+    sub.add_argument("--colors", type=int)
+    sub.add_argument("--lossy", type=int)
+
+    # Convert
+    sub = add_command("convert", "convert_video",
+                      "Convert video to GIF or GIF to video (see --format)")
+    sub.add_argument("--format", default=None, choices=["gif", "mp4"],
+                     help="Output format, defaults to the opposite of the input")
+    sub.add_argument("--fps", type=float)
+    sub.add_argument("--width", type=int)
+    sub.add_argument("--height", type=int)
+    sub.add_argument("--two-pass", action="store_true")
+
+    # Crop
+    sub = add_command("crop", "crop_gif", "Crop and rotate GIFs")
+    sub.add_argument("--x", type=int, default=0)
+    sub.add_argument("--y", type=int, default=0)
+    sub.add_argument("--width", type=int, required=True)
+    sub.add_argument("--height", type=int, required=True)
+    sub.add_argument("--rotation", type=int, default=0, choices=[0, 90, 180, 270])
+
+    # Keyframe Crop
+    sub = add_command("keyframe-crop", "keyframe_crop_gif",
+                      "Animated crop between keyframes")
+    sub.add_argument("--key", dest="keyframes", type=keyframe, action="append",
+                     required=True, help="FRAME:X,Y,W,H, repeat for each keyframe")
+    sub.add_argument("--width", type=int, required=True, help="Output width")
+    sub.add_argument("--height", type=int, required=True, help="Output height")
+    sub.add_argument("--interp", type=interpolation,
+                     default=InterpolationType.LINEAR,
+                     help="linear, ease_in, ease_out or bezier")
+
+    # Text
+    sub = add_command("text", "add_text_to_gif", "Overlay a caption")
+    sub.add_argument("--text", required=True)
+    sub.add_argument("--x", type=int, default=10)
+    sub.add_argument("--y", type=int, default=10)
+    sub.add_argument("--start", type=int,
+                     help="First frame showing the text, starting at 0")
+    sub.add_argument("--end", type=int, help="Last frame showing the text")
+    sub.add_argument("--font")
+    sub.add_argument("--size", type=int)
+    sub.add_argument("--color")
+    sub.add_argument("--max-width", type=int)
+    sub.add_argument("--shadow", type=int, help="Shadow offset in px")
+    sub.add_argument("--shadow-color")
+    sub.add_argument("--stroke", type=int, help="Stroke width in px")
+    sub.add_argument("--stroke-color")
+    sub.add_argument("--workers", type=int, default=1,
+                     help="Processes encoding the frames of each file")
+    sub.add_argument("--keep-palette", action="store_true",
+                     help="Keep the source colors, only the text is mapped to them")
+
+    # Frame Edit
+    sub = add_command("frames", "edit_frames", "Delete, reverse and retime frames")
+    sub.add_argument("--delete", type=int, nargs="+", default=(),
+                     help="Frame numbers to drop, starting at 1")
+    sub.add_argument("--reverse", action="store_true")
+    sub.add_argument("--fps", type=float)
+    sub.add_argument("--two-pass", action="store_true")
+
+    # Extract
+    sub = add_command("extract", "extract_frames", "Export frames as PNG files")
+    sub.add_argument("--fps", type=float)
+
+    return parser
+
+
+def operation_options(args):
+    """Keyword arguments for the operation, unset options keep their defaults"""
+    options = {key: value for key, value in vars(args).items()
+               if key not in CLI_KEYS and value is not None}
+    if args.command == "keyframe-crop":
+        options["keyframes"] = dict(options["keyframes"])
+    return options
+
+
+def output_path(args, input_file):
+    if args.output:
+        return args.output
+
+    stem, ext = os.path.splitext(os.path.basename(input_file))
+    if args.command == "convert":
+        fmt = args.format
+        if fmt is None:
+            fmt = "mp4" if ext.lower() == ".gif" else "gif"
+        ext = "." + fmt
+    else:
+        ext = OUTPUT_EXT.get(args.command, ".gif")
+
+    directory = args.output_dir or os.path.dirname(os.path.abspath(input_file))
+    return os.path.join(directory, stem + args.suffix + ext)
+
+
+def init_worker(progress_queue, cancel_event=None):
+    """Process pool initializer, progress of every job goes to progress_queue,
+    setting cancel_event kills the ffmpeg of every running job"""
+    global _progress_queue, _cancel_event
+    _progress_queue = progress_queue
+    _cancel_event = cancel_event
+
+
+def run_job(operation, input_file, output_file, options):
+    """Runs one operation, returns (result, error message, seconds)"""
+    start = time.perf_counter()
+    try:
+        function = getattr(GifOperations, operation)
+        if _cancel_event is not None and "cancel_event" in inspect.signature(function).parameters:
+            options = dict(options, cancel_event=_cancel_event)
+        if _progress_queue is not None and "progress" in inspect.signature(function).parameters:
+            total_seconds = GifOperations.detect_duration(input_file)
+            options = dict(options, progress=lambda event: _progress_queue.put(
+                (input_file, *describe_progress(event, total_seconds))))
+        result = function(input_file, output_file, **options)
+        return result, None, time.perf_counter() - start
+    except Exception as e:
+        # An empty message would count as success in the report
+        message = str(e) or type(e).__name__
+        stderr = getattr(e, "stderr", None)
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode(errors="replace")
+        if isinstance(stderr, str) and stderr.strip():
+            message = stderr.strip().splitlines()[-1]
+        return None, message, time.perf_counter() - start
+
+
+def build_jobs(args):
+    """Returns [(operation, input, output, options)] for every input"""
+    if args.output and len(args.inputs) > 1:
+        raise SystemExit("-o/--output only works with a single input, use --output-dir")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    options = operation_options(args)
+    return [(args.operation, input_file, output_path(args, input_file), options)
+            for input_file in args.inputs]
+
+
+def print_progress(progress_queue):
+    while True:
+        item = progress_queue.get()
+        if item is None:
+            return
+        input_file, _, text = item
+        print(f"     {input_file}: {text}", file=sys.stderr)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    jobs = build_jobs(args)
+
+    start = time.perf_counter()
+    failures = 0
+
+    def report(job, outcome):
+        nonlocal failures
+        _, input_file, output_file, _ = job
+        result, error, seconds = outcome
+        if error:
+            failures += 1
+            print(f"FAIL {input_file}: {error}", file=sys.stderr)
+        else:
+            details = ", ".join(
+                f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}"
+                for k, v in result.items())
+            print(f"OK   {input_file} -> {output_file} ({seconds:.1f}s"
+                  f"{', ' + details if details else ''})")
+
+    parallel = args.jobs > 1 and len(jobs) > 1
+    progress_queue = None
+    if args.progress:
+        progress_queue = multiprocessing.Queue() if parallel else queue.Queue()
+        printer = threading.Thread(target=print_progress, args=(progress_queue,),
+                                   daemon=True)
+        printer.start()
+
+    if parallel:
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=init_worker,
+                                 initargs=(progress_queue,)) as pool:
+            futures = {pool.submit(run_job, *job): job for job in jobs}
+            for future in as_completed(futures):
+                report(futures[future], future.result())
+    else:
+        init_worker(progress_queue)
+        for job in jobs:
+            report(job, run_job(*job))
+
+    if progress_queue is not None:
+        progress_queue.put(None)
+        printer.join()
+
+    elapsed = time.perf_counter() - start
+    done = len(jobs) - failures
+    rate = done / elapsed * 60 if elapsed else 0
+    print(f"{done}/{len(jobs)} files in {elapsed:.1f}s ({rate:.1f} files/min)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
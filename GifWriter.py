@@ -0,0 +1,431 @@
+import os
+import struct
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from PIL import Image, ImageChops, GifImagePlugin
+
+from GifScanner import scan_gif
+
+# GIF disposal methods, 0 (unspecified) behaves like DISPOSE_NONE
+DISPOSE_NONE = 1
+DISPOSE_BACKGROUND = 2
+DISPOSE_PREVIOUS = 3
+
+NONZERO = [0] + [255] * 255
+ZERO = [255] + [0] * 255
+
+# Frames per process pool task, a few chunks per worker are kept in flight
+CHUNK_SIZE = 8
+
+
+def quantize_frame(frame):
+    """Returns a P mode copy of an RGBA frame and its transparent index.
+
+    The palette is trimmed to the used indexes, small regions then get a
+    small local color table.
+    """
+    image = frame.convert("P", palette=Image.Palette.ADAPTIVE)
+    transparency = None
+    if image.palette.mode == "RGBA":
+        for rgba, index in image.palette.colors.items():
+            if rgba[3] == 0:
+                transparency = index
+                break
+    used = image.getextrema()[1] + 1
+    image.putpalette(image.getpalette("RGB")[:used * 3])
+    return image, transparency
+
+
+def reserve_palette(palette, transparency, colors=()):
+    """Adds a transparent slot and the given RGB colors to a GIF palette.
+
+    Only free slots of the 256 are used, existing entries keep their index.
+    Returns the palette and the transparent index, None if there was no room.
+    """
+    palette = bytearray(palette)
+    if transparency is None and len(palette) < 768:
+        transparency = len(palette) // 3
+        palette += b"\x00\x00\x00"
+    existing = {bytes(palette[i:i + 3]) for i in range(0, len(palette), 3)}
+    for color in colors:
+        rgb = bytes(color[:3])
+        if len(palette) >= 768:
+            break
+        if rgb not in existing:
+            palette += rgb
+            existing.add(rgb)
+    return bytes(palette), transparency
+
+
+def map_to_palette(region, palette, transparency):
+    """P mode copy of an RGBA region using an existing palette.
+
+    Colors already in the palette keep their exact index, others take the
+    nearest entry. Fully transparent pixels get the transparent index,
+    which is left out of the color search.
+    """
+    entries = [i for i in range(len(palette) // 3) if i != transparency]
+    search = Image.new("P", (1, 1))
+    search.putpalette(b"".join(palette[i * 3:i * 3 + 3] for i in entries))
+    rgb = region.convert("RGB")
+    mapped = rgb.quantize(palette=search, dither=Image.Dither.NONE)
+
+    # Pillow matches through a coarse color cache that can move a color off
+    # its exact palette entry, search those pixels again
+    alpha = region.getchannel("A")
+    wrong = ImageChops.difference(mapped.convert("RGB"), rgb)
+    wrong.paste(0, mask=alpha.point(ZERO))
+    box = wrong.getbbox()
+    if box:
+        colors = np.frombuffer(search.palette.tobytes(), dtype=np.uint8)
+        colors = colors.reshape(-1, 3).astype(np.int32)
+        index = np.array(mapped.crop(box))
+        pixels = np.asarray(rgb.crop(box)).astype(np.int32)
+        moved = np.asarray(wrong.crop(box)).any(axis=2)
+        unique, inverse = np.unique(pixels[moved], axis=0, return_inverse=True)
+        distance = ((unique[:, None, :] - colors[None, :, :]) ** 2).sum(axis=2)
+        index[moved] = distance.argmin(axis=1)[inverse.ravel()]
+        mapped.paste(Image.fromarray(index.astype(np.uint8), "P"), box)
+
+    image = mapped.point(entries + [0] * (256 - len(entries)))
+    if transparency is not None:
+        image.paste(transparency, mask=alpha.point(ZERO))
+    image.putpalette(palette)
+    return image
+
+
+def changed_mask(previous, frame):
+    """L image, nonzero where frame differs from previous in any band"""
+    bands = ImageChops.difference(previous, frame).split()
+    changed = bands[0]
+    for band in bands[1:]:
+        changed = ImageChops.lighter(changed, band)
+    return changed
+
+
+def changed_region(frame, changed, box, transparent=True):
+    """Crops box out of frame with unchanged pixels made transparent.
+
+    Transparent pixels let the canvas underneath show through, unchanged
+    areas then compress to long runs of a single index.
+    """
+    crop = frame.crop(box)
+    if not transparent:
+        return crop
+    crop.putalpha(ImageChops.multiply(changed.crop(box).point(NONZERO),
+                                      crop.getchannel("A")))
+    return crop
+
+
+def union_box(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def encode_region(region, box, params, palette=None):
+    """GIF bytes (graphic control extension and image) for an RGBA region.
+
+    palette (bytes, transparent index) maps the region onto that palette
+    instead of quantizing it.
+    """
+    if palette is not None:
+        image, transparency = map_to_palette(region, *palette), palette[1]
+    else:
+        image, transparency = quantize_frame(region)
+    params = dict(params)
+    if transparency is not None:
+        params["transparency"] = transparency
+    return b"".join(GifImagePlugin.getdata(image, box[:2], **params))
+
+
+def attach_shared_memory(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13, registering again is harmless as pool workers
+        # share the resource tracker of the process that created the block
+        return shared_memory.SharedMemory(name=name)
+
+
+def encode_chunk(shm_name, regions):
+    """Process pool task, encodes RGBA regions stored in a shared memory block.
+
+    regions holds (offset, size, box, params, palette), the result is the
+    list of encoded frames in the same order.
+    """
+    shm = attach_shared_memory(shm_name)
+    try:
+        encoded = []
+        for offset, size, box, params, palette in regions:
+            view = shm.buf[offset:offset + size[0] * size[1] * 4]
+            region = Image.frombytes("RGBA", size, view)
+            view.release()
+            encoded.append(encode_region(region, box, params, palette))
+        return encoded
+    finally:
+        shm.close()
+
+
+class GifStreamWriter:
+    """Writes an animated GIF one frame at a time.
+
+    Unlike Image.save(save_all=True) no frame is kept after write(), so
+    memory stays at a few canvases however long the clip is. write() takes
+    fully composited RGBA frames. Only the rectangle that differs from what
+    a decoder shows at that point is encoded, with its own color table and
+    unchanged pixels left transparent. Frames identical to the previous one
+    extend its delay instead.
+
+    Frames passed with a palette keep it: pixels are mapped to the nearest
+    entry instead of being quantized, so colors from that palette come out
+    unchanged.
+
+    With workers > 1 the changed regions are quantized and LZW encoded on a
+    process pool in chunks of chunk_size frames. Regions are passed through
+    shared memory and the encoded frames are written back in order.
+
+    Frames go to a .part file that only replaces output_file on close(), as
+    a context manager an error aborts instead.
+    """
+
+    def __init__(self, output_file, loop=0, workers=1, chunk_size=CHUNK_SIZE):
+        self.output_file = output_file
+        self.loop = loop
+        self.size = None
+        self.frame_count = 0
+        # What a decoder shows before the next frame is drawn
+        self.canvas = None
+        # Last prepared frame: composited image, canvas under it, rectangle,
+        # disposal and its output record. Records hold the encoder params and
+        # the file offset of the graphic control extension once written
+        self.last = None
+
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.pool = None
+        if workers > 1:
+            # spawn, forking a process running Qt threads is not safe
+            self.pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        # Regions waiting for a chunk, then (future, shm, records) in order
+        self.chunk = []
+        self.pending = deque()
+
+        self.temp_file = output_file + ".part"
+        self.fp = open(self.temp_file, "wb")
+
+    def write_header(self, size):
+        self.size = size
+        # Logical screen without a global color table
+        self.fp.write(b"GIF89a" + struct.pack("<HHBBB", size[0], size[1], 0, 0, 0))
+        if self.loop is not None:
+            self.fp.write(b"!\xff\x0bNETSCAPE2.0\x03\x01"
+                          + struct.pack("<H", self.loop) + b"\x00")
+        self.canvas = Image.new("RGBA", size, (0, 0, 0, 0))
+
+    def dispose_last(self):
+        """Applies the disposal of the last prepared frame to the canvas"""
+        frame, under, box, disposal, _ = self.last
+        if disposal == DISPOSE_BACKGROUND:
+            self.canvas = frame.copy()
+            self.canvas.paste((0, 0, 0, 0), box)
+        elif disposal == DISPOSE_PREVIOUS:
+            self.canvas = frame.copy()
+            self.canvas.paste(under.crop(box), box[:2])
+        else:
+            self.canvas = frame
+
+    def extend_last(self, duration):
+        """Adds duration to the delay of the last prepared frame"""
+        record = self.last[4]
+        record["params"]["duration"] += duration
+        if record["offset"] is not None:
+            end = self.fp.tell()
+            self.fp.seek(record["offset"])
+            self.fp.write(self.delay_bytes(record))
+            self.fp.seek(end)
+
+    def delay_bytes(self, record):
+        return encode_delay(record["params"]["duration"])
+
+    def prepare(self, frame, duration, disposal, bbox, palette=None):
+        """Updates the canvas for frame, returns (region, box, record) to
+        encode or None when the frame was merged into the previous one"""
+        if frame.mode != "RGBA":
+            frame = frame.convert("RGBA")
+        if self.size is None:
+            self.write_header(frame.size)
+        elif frame.size != self.size:
+            raise ValueError(f"Frame size {frame.size} does not match {self.size}")
+        if disposal not in (DISPOSE_BACKGROUND, DISPOSE_PREVIOUS):
+            disposal = DISPOSE_NONE
+
+        previous = self.canvas
+        changed = changed_mask(previous, frame)
+        box = changed.getbbox()
+        if disposal != DISPOSE_NONE:
+            left, top, right, bottom = union_box(box, bbox or (0, 0) + self.size)
+            box = (max(left, 0), max(top, 0),
+                   min(right, self.size[0]), min(bottom, self.size[1]))
+            if box[2] <= box[0] or box[3] <= box[1]:
+                box = None
+        if box is None:
+            if self.last and self.last[3] == DISPOSE_NONE:
+                self.extend_last(duration)
+                return None
+            # Nothing to merge into, redraw one pixel
+            box = (0, 0, 1, 1)
+
+        # Without a transparent index unchanged pixels are drawn again, a
+        # palette can't be kept for frames that need transparency then
+        transparent = palette is None or palette[1] is not None
+        region = changed_region(frame, changed, box, transparent)
+        if not transparent and region.getchannel("A").getextrema()[0] == 0:
+            palette = None
+            region = changed_region(frame, changed, box)
+
+        record = {"params": {"duration": duration, "disposal": disposal,
+                             "include_color_table": True},
+                  "palette": palette, "offset": None}
+        self.last = (frame, previous, box, disposal, record)
+        self.dispose_last()
+        return region, box, record
+
+    def write(self, frame, duration=100, disposal=DISPOSE_NONE, bbox=None,
+              palette=None):
+        """Appends frame, the first one sets the canvas size.
+
+        bbox (left, top, right, bottom) is the area disposal applies to, it
+        should cover the source frame rectangle when disposal is 2 or 3.
+        palette is (RGB bytes, transparent index or None) to encode with.
+        """
+        prepared = self.prepare(frame, duration, disposal, bbox, palette)
+        self.frame_count += 1
+        if prepared is None:
+            return
+        if self.pool is None:
+            region, box, record = prepared
+            self.append(encode_region(region, box, record["params"],
+                                      record["palette"]), record)
+            return
+
+        self.chunk.append(prepared)
+        if len(self.chunk) >= self.chunk_size:
+            self.submit_chunk()
+
+    def append(self, data, record):
+        """Writes an encoded frame, its delay may have grown since encoding"""
+        # Delay follows the introducer, label, block size and flag bytes
+        record["offset"] = self.fp.tell() + 4
+        self.fp.write(data[:4] + self.delay_bytes(record) + data[6:])
+
+    def submit_chunk(self):
+        sizes = [region.width * region.height * 4 for region, _, _ in self.chunk]
+        shm = shared_memory.SharedMemory(create=True, size=max(sum(sizes), 1))
+        regions = []
+        offset = 0
+        for (region, box, record), size in zip(self.chunk, sizes):
+            shm.buf[offset:offset + size] = region.tobytes()
+            regions.append((offset, region.size, box, record["params"],
+                            record["palette"]))
+            offset += size
+        records = [record for _, _, record in self.chunk]
+        self.chunk = []
+
+        try:
+            future = self.pool.submit(encode_chunk, shm.name, regions)
+        except Exception:
+            shm.close()
+            shm.unlink()
+            raise
+        self.pending.append((future, shm, records))
+        while len(self.pending) > 2 * self.workers:
+            self.flush_chunk()
+
+    def flush_chunk(self):
+        future, shm, records = self.pending.popleft()
+        try:
+            encoded = future.result()
+        finally:
+            shm.close()
+            shm.unlink()
+        for data, record in zip(encoded, records):
+            self.append(data, record)
+
+    def close(self):
+        """Finishes the file and moves it to output_file"""
+        if self.fp.closed:
+            return
+        if not self.frame_count:
+            self.abort()
+            raise ValueError("No frames were written")
+        try:
+            if self.chunk:
+                self.submit_chunk()
+            while self.pending:
+                self.flush_chunk()
+        except BaseException:
+            self.abort()
+            raise
+        if self.pool:
+            self.pool.shutdown()
+        self.fp.write(b";")
+        self.fp.close()
+        os.replace(self.temp_file, self.output_file)
+
+    def abort(self):
+        """Drops the partial file, output_file is left untouched"""
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+        while self.pending:
+            future, shm, _ = self.pending.popleft()
+            # Let a running task detach before the block goes away
+            try:
+                future.exception()
+            except Exception:
+                pass
+            shm.close()
+            shm.unlink()
+        self.chunk = []
+        self.fp.close()
+        try:
+            os.remove(self.temp_file)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def encode_delay(duration):
+    """Graphic control extension delay for duration in ms, rounded to the
+    nearest centisecond, shared by every writer so timings agree"""
+    return struct.pack("<H", min(int(duration / 10 + 0.5), 0xFFFF))
+
+
+def retime_gif(path, durations):
+    """Rewrites the delay of every frame in place, durations in ms.
+
+    Returns False and leaves the file alone when the frame count differs.
+    """
+    frames = scan_gif(path)["frames"]
+    if len(frames) != len(durations) or any(f["gce_offset"] is None for f in frames):
+        return False
+    with open(path, "r+b") as f:
+        for frame, duration in zip(frames, durations):
+            f.seek(frame["gce_offset"] + 1)
+            f.write(encode_delay(duration))
+    return True
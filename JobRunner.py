@@ -0,0 +1,97 @@
+import os
+import threading
+import subprocess
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from FFmpegUtils import FFmpegCancelled, describe_progress
+
+# Jobs mostly wait on ffmpeg, allow a few per core so several tools opened
+# from the launcher don't queue behind each other
+MAX_THREADS = max(4, 2 * (os.cpu_count() or 1))
+
+_pool = None
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once cancel() was called"""
+
+
+class JobSignals(QObject):
+    # percent is -1 when the total is unknown
+    progress = pyqtSignal(int, str)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+
+class Job(QRunnable):
+    """Runs fn(job, *args, **kwargs) on the shared thread pool.
+
+    fn must not touch widgets, it reports back through job.progress() and
+    the result or error arrives on the UI thread through job.signals. Long
+    loops call job.check_cancelled(), ffmpeg calls take job.cancel_event.
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = JobSignals()
+        self.cancel_event = threading.Event()
+
+    def start(self, pool=None):
+        """Queues the job on pool, the shared pool by default. Connect the
+        signals first and keep a reference."""
+        (pool or job_pool()).start(self)
+        return self
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def progress(self, percent, message=""):
+        self.signals.progress.emit(int(percent), message)
+
+    def ffmpeg_progress(self, total_seconds=None, prefix=""):
+        """progress callback for run_ffmpeg, reports percent, speed and ETA"""
+        def report(event):
+            percent, text = describe_progress(event, total_seconds)
+            self.progress(percent, prefix + text)
+        return report
+
+    def run(self):
+        try:
+            result = self.fn(self, *self.args, **self.kwargs)
+        except (JobCancelled, FFmpegCancelled):
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(format_error(e))
+        else:
+            if self.cancel_event.is_set():
+                self.signals.cancelled.emit()
+            else:
+                self.signals.finished.emit(result)
+
+
+def format_error(e):
+    """Readable message for an exception, ffmpeg errors keep their last stderr lines"""
+    if isinstance(e, subprocess.CalledProcessError) and e.stderr:
+        stderr = e.stderr.decode(errors="replace") if isinstance(e.stderr, bytes) else e.stderr
+        return "\n".join(stderr.strip().splitlines()[-5:])
+    return str(e)
+
+
+def job_pool():
+    global _pool
+    if _pool is None:
+        _pool = QThreadPool()
+        _pool.setMaxThreadCount(MAX_THREADS)
+    return _pool
+
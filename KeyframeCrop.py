@@ -0,0 +1,125 @@
+from bisect import bisect_right
+from enum import Enum
+
+import numpy as np
+
+
+class InterpolationType(Enum):
+    LINEAR = "Linear"
+    EASE_IN = "Ease In (Quad)"
+    EASE_OUT = "Ease Out (Quad)"
+    BEZIER = "Smoothstep (Bezier)"
+
+
+def ease(t, interp):
+    """Eased progress for t in [0, 1], same curves as the ffmpeg expressions.
+    t may also be a NumPy array."""
+    if interp == InterpolationType.EASE_IN:
+        return t * t
+    if interp == InterpolationType.EASE_OUT:
+        return t * (2 - t)
+    if interp == InterpolationType.BEZIER:
+        return t * t * (3 - 2 * t)
+    return t
+
+
+def interpolate_keyframes(keyframes, frame, interp):
+    """Value tuple at frame, held before the first and after the last keyframe.
+
+    keyframes maps frame index -> tuple of numbers.
+    """
+    keys = sorted(keyframes)
+    if frame <= keys[0]:
+        return tuple(keyframes[keys[0]])
+    if frame >= keys[-1]:
+        return tuple(keyframes[keys[-1]])
+    i = bisect_right(keys, frame)
+    start_f, end_f = keys[i - 1], keys[i]
+    t = ease((frame - start_f) / (end_f - start_f), interp)
+    return tuple(a + (b - a) * t
+                 for a, b in zip(keyframes[start_f], keyframes[end_f]))
+
+
+def compile_keyframes(keyframes, frame_count, interp):
+    """interpolate_keyframes for every frame in range(frame_count) at once, as
+    a (frame_count, values) float array, row lookups replace the search"""
+    keys = np.array(sorted(keyframes))
+    values = np.array([keyframes[key] for key in keys], dtype=np.float64)
+    frames = np.arange(frame_count)
+    if len(keys) == 1:
+        return np.repeat(values, frame_count, axis=0)
+    # Segment ending at or after each frame, the first and last for holds
+    end = np.clip(np.searchsorted(keys, frames, side="right"), 1, len(keys) - 1)
+    start_f, end_f = keys[end - 1], keys[end]
+    t = ease(np.clip((frames - start_f) / (end_f - start_f), 0, 1), interp)
+    table = values[end - 1] + (values[end] - values[end - 1]) * t[:, None]
+    table[frames >= keys[-1]] = values[-1]
+    return table
+
+
+def build_crop_filter(keyframes, tgt_w, tgt_h, interp):
+    """Builds the ffmpeg scale + crop chain animating between keyframes.
+
+    keyframes maps frame index -> (x, y, w, h) in source pixels. The crop is
+    scaled so every frame comes out at tgt_w x tgt_h.
+    """
+    # Prepare Filter Strings
+    sorted_keys = sorted(keyframes.keys())
+
+    def f(val): return f"{val:.2f}"
+    t_expr = "((n-START_F)/((END_F-START_F)*1.0))"
+
+    if interp == InterpolationType.LINEAR: anim_t = t_expr
+    elif interp == InterpolationType.EASE_IN: anim_t = f"pow({t_expr},2)"
+    elif interp == InterpolationType.EASE_OUT: anim_t = f"({t_expr} * (2 - {t_expr}))"
+    elif interp == InterpolationType.BEZIER: anim_t = f"({t_expr}*{t_expr}*(3-2*{t_expr}))"
+
+    final_x, final_y, final_w, final_h = [], [], [], []
+
+    k0 = sorted_keys[0]
+    x0, y0, w0, h0 = keyframes[k0]
+    final_x.append(f"if(lt(n,{k0}),{f(x0)},")
+    final_y.append(f"if(lt(n,{k0}),{f(y0)},")
+    final_w.append(f"if(lt(n,{k0}),{f(w0)},")
+    final_h.append(f"if(lt(n,{k0}),{f(h0)},")
+
+    for i in range(len(sorted_keys) - 1):
+        start_f = sorted_keys[i]
+        end_f = sorted_keys[i+1]
+        sx, sy, sw, sh = keyframes[start_f]
+        ex, ey, ew, eh = keyframes[end_f]
+        seg_t = anim_t.replace("START_F", str(start_f)).replace("END_F", str(end_f))
+
+        lx = f"({f(sx)}+({f(ex-sx)})*{seg_t})"
+        ly = f"({f(sy)}+({f(ey-sy)})*{seg_t})"
+        lw = f"({f(sw)}+({f(ew-sw)})*{seg_t})"
+        lh = f"({f(sh)}+({f(eh-sh)})*{seg_t})"
+
+        final_x.append(f"if(lt(n,{end_f}),{lx},")
+        final_y.append(f"if(lt(n,{end_f}),{ly},")
+        final_w.append(f"if(lt(n,{end_f}),{lw},")
+        final_h.append(f"if(lt(n,{end_f}),{lh},")
+
+    lx, ly, lw, lh = keyframes[sorted_keys[-1]]
+    final_x.append(f"{f(lx)}")
+    final_y.append(f"{f(ly)}")
+    final_w.append(f"{f(lw)}")
+    final_h.append(f"{f(lh)}")
+
+    parens = ")" * (len(sorted_keys))
+    str_x = "".join(final_x) + parens
+    str_y = "".join(final_y) + parens
+    str_w = "".join(final_w) + parens
+    str_h = "".join(final_h) + parens
+
+    scale_x_expr = f"({tgt_w}*1.0/({str_w}))"
+    scale_y_expr = f"({tgt_h}*1.0/({str_h}))"
+    new_w_expr = f"iw*{scale_x_expr}"
+    new_h_expr = f"ih*{scale_y_expr}"
+    new_crop_x = f"({str_x})*{scale_x_expr}"
+    new_crop_y = f"({str_y})*{scale_y_expr}"
+
+    return (
+        f"scale=w='{new_w_expr}':h='{new_h_expr}':eval=frame:flags=lanczos,"
+        f"crop=w={tgt_w}:h={tgt_h}:x='{new_crop_x}':y='{new_crop_y}':exact=1"
+    )
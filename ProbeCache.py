@@ -0,0 +1,140 @@
+import os
+import json
+import threading
+import subprocess
+from collections import OrderedDict
+
+from FFmpegUtils import get_startupinfo
+
+# Set to a file path to keep probe results between runs
+PROBE_CACHE_FILE = os.environ.get("GIFTOOLS_PROBE_CACHE")
+MAX_ENTRIES = 256
+
+
+class ProbeCache:
+    """One ffprobe per file, shared by every tool.
+
+    Results hold the full -show_streams -show_format JSON and are keyed by
+    path, mtime and size so edited files are probed again. The least recently
+    used entries are dropped past max_entries. With cache_file set, results
+    are loaded from and written back to that JSON file.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, cache_file=None):
+        self.max_entries = max_entries
+        self.cache_file = cache_file
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        if cache_file:
+            self.load()
+
+    def key(self, path):
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    def probe(self, path):
+        """Returns the ffprobe JSON for path, None if it can't be probed"""
+        try:
+            key = self.key(path)
+        except OSError:
+            return None
+
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+
+        cmd = [
+            "ffprobe", "-v", "error", "-show_streams", "-show_format",
+            "-of", "json", path
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, check=True,
+                                    startupinfo=get_startupinfo())
+            data = json.loads(result.stdout)
+        except (OSError, ValueError, subprocess.CalledProcessError) as e:
+            print(f"Probe Error: {e}")
+            data = None
+
+        if data is None:
+            # Not cached, the file may be probed fine once ffprobe is found
+            # or the file is fully written
+            return None
+        with self.lock:
+            self.entries[key] = data
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        if self.cache_file:
+            self.save()
+        return data
+
+    def video_stream(self, path):
+        """First video stream of path, None if there is none"""
+        data = self.probe(path)
+        if not data:
+            return None
+        for stream in data.get("streams", []):
+            if stream.get("codec_type") == "video":
+                return stream
+        return None
+
+    def fps(self, path):
+        stream = self.video_stream(path)
+        if not stream:
+            return None
+        try:
+            num, _, den = stream.get("r_frame_rate", "").partition("/")
+            fps = float(num) / float(den or 1)
+        except (ValueError, ZeroDivisionError):
+            return None
+        return fps or None
+
+    def duration(self, path):
+        data = self.probe(path)
+        try:
+            return float(data["format"]["duration"])
+        except (TypeError, KeyError, ValueError):
+            return None
+
+    def resolution(self, path):
+        stream = self.video_stream(path)
+        if not stream or not stream.get("width"):
+            return None
+        return int(stream["width"]), int(stream["height"])
+
+    # Persistence
+    def load(self):
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(entries, list):
+            return
+        for entry in entries[-self.max_entries:]:
+            # Skip entries some other version or a broken write left behind
+            try:
+                path, mtime_ns, size, data = entry
+                key = (str(path), int(mtime_ns), int(size))
+            except (TypeError, ValueError):
+                continue
+            if isinstance(data, dict):
+                self.entries[key] = data
+
+    def save(self):
+        with self.lock:
+            entries = [[*key, data] for key, data in self.entries.items()]
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.cache_file)),
+                            exist_ok=True)
+                # One per process, batch workers and other tools save too
+                temp_file = self.cache_file + f".{os.getpid()}.tmp"
+                with open(temp_file, "w", encoding="utf-8") as f:
+                    json.dump(entries, f)
+                os.replace(temp_file, self.cache_file)
+            except OSError as e:
+                print(f"Probe cache not saved: {e}")
+
+
+probe_cache = ProbeCache(cache_file=PROBE_CACHE_FILE)
@@ -1,21 +1,27 @@
 import sys
 import os
-import tempfile
-import subprocess
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QLabel, QLineEdit, QPushButton,
     QGridLayout, QFileDialog, QComboBox, QMessageBox,
     QSlider, QStackedWidget, QVBoxLayout, QHBoxLayout,
-    QDoubleSpinBox, QFrame, QMainWindow
+    QDoubleSpinBox, QSpinBox, QCheckBox, QFrame, QMainWindow
 )
 from PyQt6.QtCore import Qt
 
+from FFmpegUtils import encode_gif
+from TargetSizeSolver import TargetSizeSolver
+from GifOperations import detect_duration
+from JobRunner import Job
+from ProbeCache import probe_cache
+
 
 class GifConverterApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("GIF Resizer & Scaler")
         self.resize(600, 550)
+        self.two_pass = False
+        self.job = None
         self.init_ui()
 
     def init_ui(self):
@@ -217,9 +223,33 @@ class GifConverterApp(QMainWindow):
 
         target_layout.addWidget(self.target_slider)
         target_layout.addWidget(self.target_spinbox)
+
+        self.search_combo = QComboBox()
+        self.search_combo.addItems(["Predictive (Fast)", "Exact (Slow)"])
+        self.search_combo.setToolTip(
+            "Predictive estimates the size from short samples and encodes once.\n"
+            "Exact searches with repeated full encodes")
+        target_layout.addWidget(self.search_combo)
+
+        # Parallel candidates for the exact search
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, os.cpu_count() or 1)
+        self.workers_spin.setValue(min(4, os.cpu_count() or 1))
+        self.workers_spin.setPrefix("Workers: ")
+        self.workers_spin.setToolTip(
+            "Candidate sizes encoded at the same time during the exact search")
+        self.workers_spin.setEnabled(False)
+        self.search_combo.currentIndexChanged.connect(
+            lambda index: self.workers_spin.setEnabled(index == 1))
+        target_layout.addWidget(self.workers_spin)
         self.options_stack.addWidget(self.page_target)
 
         settings_layout.addWidget(self.options_stack)
+
+        self.chk_low_memory = QCheckBox("Low memory mode (two-pass encode)")
+        self.chk_low_memory.setToolTip(
+            "Decodes the GIF twice instead of buffering every frame, for very long clips")
+        settings_layout.addWidget(self.chk_low_memory)
         self.main_layout.addWidget(settings_frame)
 
         # Action
@@ -241,28 +271,10 @@ class GifConverterApp(QMainWindow):
     def get_fps_probe(self, file_path):
         if not os.path.exists(file_path):
             return None
-        try:
-            cmd = [
-                "ffprobe", "-v", "error", "-select_streams", "v:0",
-                "-show_entries", "stream=r_frame_rate",
-                "-of", "default=noprint_wrappers=1:nokey=1", file_path
-            ]
-            startupinfo = None
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-
-            result = subprocess.check_output(
-                cmd, startupinfo=startupinfo).decode().strip()
-
-            if '/' in result:
-                num, den = result.split('/')
-                if int(den) > 0:
-                    return str(int(round(int(num) / int(den))))
-            return str(int(float(result)))
-        except Exception as e:
-            print(f"FPS Detection Error: {e}")
+        fps = probe_cache.fps(file_path)
+        if fps is None:
             return "30"
+        return str(int(round(fps)))
 
     def detect_fps_ui(self):
         path = self.entry_input.text()
@@ -322,6 +334,12 @@ class GifConverterApp(QMainWindow):
 
     # Conversion Logic
     def convert_gif(self):
+        if self.job:
+            self.job.cancel()
+            self.btn_convert.setEnabled(False)
+            self.lbl_status.setText("Cancelling...")
+            return
+
         input_file = self.entry_input.text()
         output_file = self.entry_output.text()
         fps = self.entry_fps.text()
@@ -338,134 +356,111 @@ class GifConverterApp(QMainWindow):
                 self, "Error", "FPS missing, click 'Detect' or enter manually")
             return
 
-        self.btn_convert.setEnabled(False)
-        self.btn_convert.setText("Processing...")
+        self.two_pass = self.chk_low_memory.isChecked()
+
+        # Logic selection based on index, widgets are read here since the
+        # task runs on a worker thread
+        mode_index = self.mode_combo.currentIndex()
+
+        if mode_index == 0:  # Resolution
+            width = self.entry_width.text()
+            height = self.entry_height.text()
+            if not width or not height:
+                QMessageBox.critical(
+                    self, "Error", "Please enter both width and height")
+                return
+            filter_scale = f"scale={width}:{height}:flags=lanczos"
+            task = lambda job: self.run_single_conversion(
+                job, input_file, output_file, fps, filter_scale)
+
+        elif mode_index == 1:  # Percentage
+            percentage = self.scale_spinbox.value()
+            factor = percentage / 100.0
+            filter_scale = f"scale=iw*{factor}:ih*{factor}:flags=lanczos"
+            task = lambda job: self.run_single_conversion(
+                job, input_file, output_file, fps, filter_scale)
+
+        elif mode_index == 2:  # Target Size
+            target_mb = self.target_spinbox.value()
+            if self.search_combo.currentIndex() == 0:
+                task = lambda job: self.run_predictive_size_logic(
+                    job, input_file, output_file, fps, target_mb)
+            else:
+                workers = self.workers_spin.value()
+                task = lambda job: self.run_target_size_logic(
+                    job, input_file, output_file, fps, target_mb, workers)
+
+        self.btn_convert.setText("Cancel")
         self.lbl_status.setText("Starting conversion...")
-        QApplication.processEvents()
-
-        try:
-            QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
-
-            # Logic selection based on index
-            mode_index = self.mode_combo.currentIndex()
-
-            if mode_index == 0:  # Resolution
-                width = self.entry_width.text()
-                height = self.entry_height.text()
-                if not width or not height:
-                    raise ValueError("Please enter both width and height")
-                filter_scale = f"scale={width}:{height}:flags=lanczos"
-                self.run_ffmpeg_conversion(
-                    input_file, output_file, fps, filter_scale)
-
-            elif mode_index == 1:  # Percentage
-                percentage = self.scale_spinbox.value()
-                factor = percentage / 100.0
-                filter_scale = f"scale=iw*{factor}:ih*{factor}:flags=lanczos"
-                self.run_ffmpeg_conversion(
-                    input_file, output_file, fps, filter_scale)
-
-            elif mode_index == 2:  # Target Size
-                self.lbl_status.setText(
-                    "Calculating optimal size (this may take time)...")
-                QApplication.processEvents()
-                target_mb = self.target_spinbox.value()
-                self.run_target_size_logic(
-                    input_file, output_file, fps, target_mb)
-
-            QMessageBox.information(
-                self, "Success", "GIF processed successfully!")
-            self.lbl_status.setText("Done")
-
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"An error occurred:\n{e}")
-            self.lbl_status.setText("Error occurred")
-        finally:
-            QApplication.restoreOverrideCursor()
-            self.btn_convert.setEnabled(True)
-            self.btn_convert.setText("Process GIF")
-
-    def run_ffmpeg_conversion(self, input_file, output_file, fps, scale_filter):
-        palette_filter = f"fps={fps},{scale_filter},palettegen"
-        filter_complex = f"fps={fps},{scale_filter}[x];[x][1:v]paletteuse"
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp:
-            palette_file = tmp.name
-
-        startupinfo = None
-        if os.name == 'nt':
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-
-        try:
-            # Pass 1: Palette
-            cmd_palette = ["ffmpeg", "-y", "-i", input_file,
-                           "-vf", palette_filter, palette_file]
-            subprocess.run(cmd_palette, check=True, startupinfo=startupinfo,
-                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-            # Pass 2: GIF
-            cmd_gif = ["ffmpeg", "-y", "-i", input_file, "-i",
-                       palette_file, "-filter_complex", filter_complex, output_file]
-            subprocess.run(cmd_gif, check=True, startupinfo=startupinfo,
-                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        finally:
-            if os.path.exists(palette_file):
-                os.remove(palette_file)
-
-    def run_target_size_logic(self, input_file, output_file, fps, target_mb):
-        low = 0.1
-        high = 1.0
-        best_scale = 0.1
-        tolerance = max(0.05 * target_mb, 0.1)
-        iterations = 6
-
-        startupinfo = None
-        if os.name == 'nt':
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-
-        for i in range(iterations):
-            mid = (low + high) / 2
-            self.lbl_status.setText(f"Optimizing... Pass {i+1}/{iterations}")
-            QApplication.processEvents()
-
-            temp_gif = tempfile.NamedTemporaryFile(
-                delete=False, suffix=".gif").name
-            temp_palette = tempfile.NamedTemporaryFile(
-                delete=False, suffix=".png").name
-
-            try:
-                scale_filter = f"scale=iw*{mid}:ih*{mid}:flags=lanczos"
-                palette_filter_iter = f"fps={fps},{scale_filter},palettegen"
-                filter_complex_iter = f"fps={fps},{scale_filter}[x];[x][1:v]paletteuse"
-
-                subprocess.run(["ffmpeg", "-y", "-i", input_file, "-vf", palette_filter_iter, temp_palette],
-                               check=True, startupinfo=startupinfo, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-                subprocess.run(["ffmpeg", "-y", "-i", input_file, "-i", temp_palette, "-filter_complex", filter_complex_iter, temp_gif],
-                               check=True, startupinfo=startupinfo, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-                size_mb = os.path.getsize(temp_gif) / (1024 * 1024)
-
-                if abs(size_mb - target_mb) <= tolerance:
-                    best_scale = mid
-                    break
-                elif size_mb > target_mb:
-                    high = mid
-                else:
-                    low = mid
-                best_scale = mid
-            finally:
-                if os.path.exists(temp_palette):
-                    os.remove(temp_palette)
-                if os.path.exists(temp_gif):
-                    os.remove(temp_gif)
-
-        final_scale_filter = f"scale=iw*{best_scale}:ih*{best_scale}:flags=lanczos"
-        self.run_ffmpeg_conversion(
-            input_file, output_file, fps, final_scale_filter)
 
+        self.job = Job(task)
+        self.job.signals.progress.connect(
+            lambda _, message: self.lbl_status.setText(message))
+        self.job.signals.finished.connect(self.on_convert_finished)
+        self.job.signals.failed.connect(self.on_convert_failed)
+        self.job.signals.cancelled.connect(self.on_convert_cancelled)
+        self.job.start()
+
+    def on_convert_finished(self, result):
+        self.reset_convert_button()
+        success_msg = "GIF processed successfully!"
+        if result and "predicted_mb" in result:
+            success_msg += (
+                f"\n\nScale: {result['scale']:.0%}"
+                f"\nPredicted: {result['predicted_mb']:.2f} MB"
+                f"\nAchieved: {result['achieved_mb']:.2f} MB")
+        elif result:
+            success_msg += (
+                f"\n\nScale: {result['scale']:.0%}"
+                f"\nAchieved: {result['achieved_mb']:.2f} MB")
+        QMessageBox.information(self, "Success", success_msg)
+        self.lbl_status.setText("Done")
+
+    def on_convert_failed(self, error):
+        self.reset_convert_button()
+        QMessageBox.critical(self, "Error", f"An error occurred:\n{error}")
+        self.lbl_status.setText("Error occurred")
+
+    def on_convert_cancelled(self):
+        self.reset_convert_button()
+        self.lbl_status.setText("Cancelled")
+
+    def reset_convert_button(self):
+        self.job = None
+        self.btn_convert.setEnabled(True)
+        self.btn_convert.setText("Process GIF")
+
+    def run_ffmpeg_conversion(self, input_file, output_file, fps, scale_filter,
+                              cancel_event=None, progress=None):
+        encode_gif(input_file, output_file, f"fps={fps},{scale_filter}",
+                   two_pass=self.two_pass, cancel_event=cancel_event,
+                   progress=progress)
+
+    def run_single_conversion(self, job, input_file, output_file, fps, scale_filter):
+        progress = job.ffmpeg_progress(detect_duration(input_file), "Encoding... ")
+        self.run_ffmpeg_conversion(input_file, output_file, fps, scale_filter,
+                                   job.cancel_event, progress)
+
+    def run_predictive_size_logic(self, job, input_file, output_file, fps, target_mb):
+        solver = TargetSizeSolver(
+            input_file, fps, target_mb,
+            status=lambda message: job.progress(-1, message),
+            cancel_event=job.cancel_event)
+        return solver.solve(output_file, self.run_ffmpeg_conversion)
+
+    def run_target_size_logic(self, job, input_file, output_file, fps, target_mb,
+                              workers):
+        solver = TargetSizeSolver(
+            input_file, fps, target_mb,
+            status=lambda message: job.progress(-1, message),
+            cancel_event=job.cancel_event)
+        return solver.search(output_file, self.run_ffmpeg_conversion,
+                             workers=workers)
+
+    def closeEvent(self, event):
+        if self.job:
+            self.job.cancel()
+        event.accept()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,315 @@
+import math
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from FFmpegUtils import run_ffmpeg, FFmpegCancelled
+from GifScanner import scan_gif, effective_duration
+
+# Probe clip layout, short runs of consecutive frames spread over the clip so
+# the encoder still sees realistic frame to frame deltas
+SEGMENT_FRAMES = 4
+PROBE_SEGMENTS = 8
+PROBE_SCALES = (0.3, 0.6)
+MIN_SCALE = 0.05
+
+# Largest decoded clip kept as a raw intermediate, bigger clips are read from
+# the GIF directly since lossless codecs decode slower than GIF itself
+RAW_CACHE_LIMIT = 1024 * 1024 * 1024
+
+# Resolution of the exact search, in halvings of the scale range
+BISECTION_STEPS = 6
+
+
+class CandidateSet:
+    """Keeps the best encode seen during a size search.
+
+    Candidates are written next to the output so the winner can be renamed
+    into place atomically instead of being encoded again. Best is the
+    candidate within tolerance closest to the target, otherwise the largest
+    one under the target, otherwise the smallest one over it.
+    """
+
+    def __init__(self, output_file, target_mb, tolerance):
+        self.output_file = output_file
+        self.directory = os.path.dirname(os.path.abspath(output_file))
+        self.target_mb = target_mb
+        self.tolerance = tolerance
+        self.paths = []
+        self.best = None  # (rank, path, scale, size_mb)
+
+    def rank(self, size_mb):
+        distance = abs(size_mb - self.target_mb)
+        if distance <= self.tolerance:
+            return (0, distance)
+        if size_mb < self.target_mb:
+            return (1, distance)
+        return (2, distance)
+
+    def new_path(self):
+        fd, path = tempfile.mkstemp(
+            suffix=".gif", prefix=".candidate_", dir=self.directory)
+        os.close(fd)
+        self.paths.append(path)
+        return path
+
+    def add(self, path, scale):
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        rank = self.rank(size_mb)
+        if self.best is None or rank < self.best[0]:
+            if self.best:
+                os.remove(self.best[1])
+            self.best = (rank, path, scale, size_mb)
+        else:
+            os.remove(path)
+        return size_mb
+
+    def promote(self):
+        """Moves the best candidate to the output file, returns (scale, size_mb)"""
+        if self.best is None:
+            raise RuntimeError("No candidate was encoded")
+        _, path, scale, size_mb = self.best
+        os.replace(path, self.output_file)
+        self.best = None
+        return scale, size_mb
+
+    def discard(self):
+        for path in self.paths:
+            if os.path.exists(path):
+                os.remove(path)
+        self.paths = []
+        self.best = None
+
+
+class TargetSizeSolver:
+    """Predicts the scale hitting a target GIF size from cheap probe encodes.
+
+    Each probe encodes a sampled subset of the clip and is extrapolated to the
+    full length. Two probes fit a size = a * scale^b model which picks the
+    scale for the single full encode.
+    """
+
+    def __init__(self, input_file, fps, target_mb, status=None,
+                 cancel_event=None):
+        self.input_file = input_file
+        self.source = input_file
+        self.fps = fps
+        self.target_mb = target_mb
+        self.tolerance = max(0.05 * target_mb, 0.1)
+        self.status = status
+        self.cancel_event = cancel_event
+        self.probes = []  # (scale, estimated full clip MB)
+
+    def report(self, message):
+        if self.status:
+            self.status(message)
+
+    def count_output_frames(self, info=None):
+        if info is None:
+            info = scan_gif(self.input_file)
+        total_ms = sum(effective_duration(f["duration"]) for f in info["frames"])
+        return max(1, int(math.ceil(total_ms / 1000.0 * float(self.fps))))
+
+    @contextmanager
+    def decoded_source(self):
+        """Decodes the GIF once, at the output frame rate, for all search encodes.
+
+        The frames go to a rawvideo NUT file so every probe and candidate
+        skips LZW decoding and the fps filter. Encodes read self.source.
+        """
+        info = scan_gif(self.input_file)
+        frames = self.count_output_frames(info)
+        if frames * info["width"] * info["height"] * 4 > RAW_CACHE_LIMIT:
+            yield self.source
+            return
+
+        fd, cache_file = tempfile.mkstemp(suffix=".nut")
+        os.close(fd)
+        try:
+            self.report("Decoding source...")
+            run_ffmpeg(["-i", self.input_file, "-vf", f"fps={self.fps}",
+                        "-pix_fmt", "bgra", "-c:v", "rawvideo", cache_file],
+                       cancel_event=self.cancel_event)
+            self.source = cache_file
+            yield cache_file
+        finally:
+            self.source = self.input_file
+            if os.path.exists(cache_file):
+                os.remove(cache_file)
+
+    def probe(self, scale, output_frames):
+        window = max(SEGMENT_FRAMES, output_frames // PROBE_SEGMENTS)
+        full_windows, remainder = divmod(output_frames, window)
+        sampled = full_windows * SEGMENT_FRAMES + min(remainder, SEGMENT_FRAMES)
+
+        filter_complex = (
+            f"fps={self.fps},select='lt(mod(n,{window}),{SEGMENT_FRAMES})',"
+            f"scale=iw*{scale}:ih*{scale}:flags=lanczos,"
+            f"split[s0][s1];[s0]palettegen[p];[s1][p]paletteuse"
+        )
+        fd, temp_gif = tempfile.mkstemp(suffix=".gif")
+        os.close(fd)
+        try:
+            run_ffmpeg(["-i", self.source, "-filter_complex",
+                        filter_complex, temp_gif], cancel_event=self.cancel_event)
+            size_mb = os.path.getsize(temp_gif) / (1024 * 1024)
+        finally:
+            if os.path.exists(temp_gif):
+                os.remove(temp_gif)
+
+        estimate = size_mb * output_frames / sampled
+        self.probes.append((scale, estimate))
+        return estimate
+
+    def fit(self):
+        (s1, m1), (s2, m2) = self.probes[-2:]
+        if m1 > 0 and m2 > 0 and m1 != m2:
+            exponent = math.log(m2 / m1) / math.log(s2 / s1)
+        else:
+            exponent = 2.0
+        # Size grows roughly with pixel area, clamp noisy fits
+        exponent = min(max(exponent, 0.5), 2.5)
+        coefficient = m2 / (s2 ** exponent)
+        return coefficient, exponent
+
+    def predict_scale(self, coefficient, exponent):
+        if coefficient <= 0:
+            return 1.0
+        scale = (self.target_mb / coefficient) ** (1.0 / exponent)
+        return min(max(scale, MIN_SCALE), 1.0)
+
+    def solve(self, output_file, encode, max_corrections=1):
+        """Encodes output_file at the predicted scale.
+
+        encode(source, output_file, fps, scale_filter, cancel_event) does
+        the full encode. If the result misses the tolerance the model is recalibrated
+        against the real size and the encode is repeated, at most
+        max_corrections times.
+        """
+        with self.decoded_source():
+            return self._solve(output_file, encode, max_corrections)
+
+    def _solve(self, output_file, encode, max_corrections):
+        self.report("Sampling clip...")
+        output_frames = self.count_output_frames()
+
+        for i, scale in enumerate(PROBE_SCALES):
+            self.report(f"Probing... {i + 1}/{len(PROBE_SCALES)}")
+            self.probe(scale, output_frames)
+
+        coefficient, exponent = self.fit()
+        scale = self.predict_scale(coefficient, exponent)
+        predicted_mb = coefficient * scale ** exponent
+
+        candidates = CandidateSet(output_file, self.target_mb, self.tolerance)
+        predictions = {}
+        attempt = 0
+        try:
+            while True:
+                self.report(f"Encoding at {scale:.0%} (predicted {predicted_mb:.2f} MB)...")
+                scale_filter = f"scale=iw*{scale}:ih*{scale}:flags=lanczos"
+                predictions[scale] = predicted_mb
+                temp_gif = candidates.new_path()
+                encode(self.source, temp_gif, self.fps, scale_filter,
+                       self.cancel_event)
+                achieved_mb = candidates.add(temp_gif, scale)
+
+                within = abs(achieved_mb - self.target_mb) <= self.tolerance
+                at_limit = scale >= 1.0 and achieved_mb < self.target_mb
+                if within or at_limit or attempt >= max_corrections:
+                    break
+
+                # Keep the fitted slope, anchor the model on the real encode
+                attempt += 1
+                coefficient = achieved_mb / (scale ** exponent)
+                scale = self.predict_scale(coefficient, exponent)
+                predicted_mb = coefficient * scale ** exponent
+
+            # A correction can land further off than the first encode
+            scale, achieved_mb = candidates.promote()
+            predicted_mb = predictions[scale]
+        finally:
+            candidates.discard()
+
+        return {
+            "scale": scale,
+            "predicted_mb": predicted_mb,
+            "achieved_mb": achieved_mb,
+            "full_encodes": attempt + 1,
+        }
+
+    def search(self, output_file, encode, workers=1, low=0.1, high=1.0):
+        """Exact search over scale using full encodes.
+
+        Each round encodes `workers` scales spread evenly inside [low, high]
+        at the same time, a k-ary search that reduces to plain bisection for
+        one worker. The round count is picked so the final resolution matches
+        BISECTION_STEPS halvings. encode(source, output_file, fps,
+        scale_filter, cancel_event) is run on worker threads, in-flight
+        encodes are cancelled as soon as one lands within tolerance.
+        """
+        with self.decoded_source():
+            return self._search(output_file, encode, workers, low, high)
+
+    def _search(self, output_file, encode, workers, low, high):
+        workers = max(1, workers)
+        rounds = max(1, math.ceil(
+            BISECTION_STEPS * math.log(2) / math.log(workers + 1)))
+
+        candidates = CandidateSet(output_file, self.target_mb, self.tolerance)
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for i in range(rounds):
+                    self.report(f"Optimizing... Pass {i + 1}/{rounds}")
+                    step = (high - low) / (workers + 1)
+                    cancel_event = threading.Event()
+                    futures = {}
+                    for k in range(workers):
+                        scale = low + step * (k + 1)
+                        scale_filter = f"scale=iw*{scale}:ih*{scale}:flags=lanczos"
+                        path = candidates.new_path()
+                        future = pool.submit(encode, self.source, path,
+                                             self.fps, scale_filter, cancel_event)
+                        futures[future] = (scale, path)
+
+                    sizes = {}
+                    pending = set(futures)
+                    try:
+                        while pending:
+                            done, pending = wait(
+                                pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                            if self.cancel_event is not None and self.cancel_event.is_set():
+                                cancel_event.set()
+                            for future in done:
+                                scale, path = futures[future]
+                                try:
+                                    future.result()
+                                except FFmpegCancelled:
+                                    continue
+                                sizes[scale] = candidates.add(path, scale)
+                                if abs(sizes[scale] - self.target_mb) <= self.tolerance:
+                                    cancel_event.set()
+                    finally:
+                        # Stop the rest of the round if anything failed
+                        cancel_event.set()
+
+                    if self.cancel_event is not None and self.cancel_event.is_set():
+                        raise FFmpegCancelled()
+                    if any(abs(size - self.target_mb) <= self.tolerance
+                           for size in sizes.values()):
+                        break
+
+                    under = [s for s, size in sizes.items() if size < self.target_mb]
+                    over = [s for s, size in sizes.items() if size > self.target_mb]
+                    if under:
+                        low = max(under)
+                    if over:
+                        high = min(over)
+
+            scale, achieved_mb = candidates.promote()
+        finally:
+            candidates.discard()
+
+        return {"scale": scale, "achieved_mb": achieved_mb}
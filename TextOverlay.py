@@ -0,0 +1,298 @@
+from functools import lru_cache
+
+from PIL import Image, ImageColor, ImageDraw, ImageFont, ImageSequence
+
+from GifScanner import scan_gif
+from GifWriter import GifStreamWriter, reserve_palette
+from KeyframeCrop import InterpolationType, interpolate_keyframes
+
+# Mapping common names to file names
+# TODO: Use QFontDatabase or smth
+FONT_MAP = {
+    "Arial": "arial.ttf",
+    "Times New Roman": "times.ttf",
+    "Courier New": "cour.ttf",
+    "Verdana": "verdana.ttf",
+    "Impact": "impact.ttf"
+}
+
+# shadow / stroke hold the offset / thickness in px, None when disabled
+DEFAULT_STYLE = {
+    "font": "Arial",
+    "size": 40,
+    "color": "#FFFFFF",
+    "max_width": 400,
+    "shadow": None,
+    "shadow_color": "#000000",
+    "stroke": None,
+    "stroke_color": "#000000",
+}
+
+
+# Cached text sprites, one per text, style, size and opacity
+SPRITE_CACHE_SIZE = 256
+
+# Shorter clips are encoded in process, starting workers costs more
+PARALLEL_MIN_FRAMES = 60
+
+
+def make_style(**overrides):
+    style = dict(DEFAULT_STYLE)
+    style.update(overrides)
+    return style
+
+
+@lru_cache(maxsize=32)
+def get_font(font_name, size):
+    """Loads a font once per (name, size), the preview asks on every change"""
+    filename = FONT_MAP.get(font_name, "arial.ttf")
+    try:
+        return ImageFont.truetype(filename, size)
+    except OSError:
+        # Fallback to default if TTF not found
+        try:
+            return ImageFont.load_default()
+        except:
+            return None
+
+
+@lru_cache(maxsize=4096)
+def text_width(font, text):
+    """Advance width of a single line, cached per font and word"""
+    return font.getlength(text)
+
+
+def wrap_text(text, font, max_width):
+    """Greedy word wrap in one pass over the cached word widths"""
+    if not font:
+        return text
+    space = text_width(font, " ")
+    lines = []
+    for paragraph in text.split('\n'):
+        line = []
+        line_width = 0
+        for word in paragraph.split():
+            width = text_width(font, word)
+            # Width of current line + word
+            test_width = line_width + space + width if line else width
+            if test_width <= max_width or not line:
+                line.append(word)
+                line_width = test_width
+            else:
+                lines.append(' '.join(line))
+                line = [word]
+                line_width = width
+        if line:
+            lines.append(' '.join(line))
+    return '\n'.join(lines)
+
+
+def get_multiline_text_size(text, font):
+    draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    try:
+        bbox = draw.multiline_textbbox((0, 0), text, font=font)
+        return (bbox[2] - bbox[0], bbox[3] - bbox[1])
+    except AttributeError:
+        return (0, 0)
+
+
+def draw_text(draw, position, text, font, style):
+    """Draws already wrapped text with the shadow and stroke from style"""
+    x, y = position
+
+    # Shadow
+    if style["shadow"]:
+        offset = style["shadow"]
+        draw.multiline_text((x + offset, y + offset), text, font=font,
+                            fill=style["shadow_color"])
+
+    # Main
+    if style["stroke"]:
+        draw.multiline_text((x, y), text, font=font, fill=style["color"],
+                            stroke_width=style["stroke"],
+                            stroke_fill=style["stroke_color"])
+    else:
+        draw.multiline_text((x, y), text, font=font, fill=style["color"])
+
+
+def render_text_layer(text, font, style):
+    """Rasterizes already wrapped text once.
+
+    Returns an RGBA layer cropped to the drawn pixels and its offset from
+    the text position, None when nothing would be drawn.
+    """
+    draw = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    stroke = style["stroke"] or 0
+    left, top, right, bottom = draw.multiline_textbbox(
+        (0, 0), text, font=font, stroke_width=stroke)
+    shadow = style["shadow"] or 0
+    left, top = min(left, left + shadow), min(top, top + shadow)
+    right, bottom = max(right, right + shadow), max(bottom, bottom + shadow)
+    if right <= left or bottom <= top:
+        return None
+
+    layer = Image.new("RGBA", (right - left, bottom - top), (0, 0, 0, 0))
+    draw_text(ImageDraw.Draw(layer), (-left, -top), text, font, style)
+    bbox = layer.getchannel("A").getbbox()
+    if not bbox:
+        return None
+    return layer.crop(bbox), (left + bbox[0], top + bbox[1])
+
+
+def composite_layer(frame, layer, position):
+    """Alpha blends layer onto frame in place at position, clipped to the frame"""
+    x, y = position
+    left, top = max(x, 0), max(y, 0)
+    right = min(x + layer.width, frame.width)
+    bottom = min(y + layer.height, frame.height)
+    if right <= left or bottom <= top:
+        return
+    frame.alpha_composite(layer, (left, top),
+                          (left - x, top - y, right - x, bottom - y))
+
+
+def iter_frames(path):
+    """Yields (frame, info) for each GIF frame, decoding one at a time.
+
+    frame is the composited canvas as RGBA, info the GifScanner entry with
+    the frame duration, disposal, transparency and bbox.
+    """
+    frames = scan_gif(path)["frames"]
+    with Image.open(path) as gif_image:
+        for frame, info in zip(ImageSequence.Iterator(gif_image), frames):
+            yield frame.convert("RGBA"), info
+
+
+def read_gif_info(path):
+    """Returns the first frame as RGBA and the GifScanner info of path"""
+    info = scan_gif(path)
+    with Image.open(path) as gif_image:
+        return gif_image.convert("RGBA"), info
+
+
+def make_track(text, position, style, start=0, end=None,
+               interp=InterpolationType.LINEAR):
+    """A caption shown from frame start to end (inclusive, None for the last).
+
+    keyframes maps frame index -> (x, y, scale, opacity), scale multiplies
+    the style sizes and opacity goes from 0 to 1.
+    """
+    return {
+        "text": text,
+        "style": style,
+        "start": start,
+        "end": end,
+        "keyframes": {start: (position[0], position[1], 1.0, 1.0)},
+        "interp": interp,
+    }
+
+
+def track_state(track, frame):
+    """(x, y, scale, opacity) of track at frame, None when it is hidden"""
+    if frame < track["start"] or (track["end"] is not None and frame > track["end"]):
+        return None
+    return interpolate_keyframes(track["keyframes"], frame, track["interp"])
+
+
+@lru_cache(maxsize=SPRITE_CACHE_SIZE)
+def _render_sprite(text, style_items, size, alpha):
+    style = dict(style_items)
+    scale = size / style["size"]
+    style["size"] = size
+    style["max_width"] = style["max_width"] * scale
+    for key in ("shadow", "stroke"):
+        if style[key]:
+            style[key] = max(1, round(style[key] * scale))
+
+    font = get_font(style["font"], size)
+    rendered = render_text_layer(wrap_text(text, font, style["max_width"]), font, style)
+    if rendered and alpha < 255:
+        layer, offset = rendered
+        layer.putalpha(layer.getchannel("A").point(lambda a: a * alpha // 255))
+    return rendered
+
+
+def text_sprite(text, style, scale=1.0, opacity=1.0):
+    """Rendered layer and offset like render_text_layer, scaled and faded.
+
+    Sprites are cached, a caption animating between a few states is only
+    rasterized once per distinct font size and opacity step. The returned
+    layer is shared and must not be modified.
+    """
+    size = max(1, round(style["size"] * scale))
+    alpha = max(0, min(255, round(opacity * 255)))
+    if not alpha:
+        return None
+    return _render_sprite(text, tuple(sorted(style.items())), size, alpha)
+
+
+def draw_tracks(frame, tracks, index):
+    """Composites every track visible at frame index onto frame in place"""
+    for track in tracks:
+        state = track_state(track, index)
+        if state is None:
+            continue
+        x, y, scale, opacity = state
+        rendered = text_sprite(track["text"], track["style"], scale, opacity)
+        if rendered:
+            layer, (dx, dy) = rendered
+            composite_layer(frame, layer, (round(x) + dx, round(y) + dy))
+
+
+def overlay_gif(input_file, output_file, text, position, style, progress=None):
+    """Draws one static caption on every frame, see overlay_tracks"""
+    return overlay_tracks(input_file, output_file,
+                          [make_track(text, position, style)], progress)
+
+
+def text_colors(tracks):
+    """RGB colors the tracks draw with, fill first then stroke and shadow"""
+    colors = []
+    for track in tracks:
+        style = track["style"]
+        colors.append(style["color"])
+        if style["stroke"]:
+            colors.append(style["stroke_color"])
+        if style["shadow"]:
+            colors.append(style["shadow_color"])
+    return [ImageColor.getrgb(c)[:3] for c in dict.fromkeys(colors)]
+
+
+def overlay_tracks(input_file, output_file, tracks, progress=None, workers=1,
+                   keep_palette=False):
+    """Draws the text tracks on the frames of input_file and saves the result.
+
+    Frames are decoded, overlaid and encoded one at a time, so memory does
+    not grow with the clip length. Each distinct sprite is rendered once
+    and only its bounding box is blended into a frame. Frame timing and
+    disposal are kept and only changed areas are encoded, on workers
+    processes for clips of PARALLEL_MIN_FRAMES or more. progress(done,
+    total) is called after each frame, it may raise to abort. Returns the
+    frame count.
+
+    keep_palette encodes every frame with its source color table instead of
+    quantizing, the text colors are added to free slots and antialiased
+    edges use the nearest existing color. Untouched pixels stay identical.
+    """
+    total = len(scan_gif(input_file)["frames"])
+    if total < PARALLEL_MIN_FRAMES:
+        workers = 1
+    colors = text_colors(tracks) if keep_palette else ()
+    palettes = {}
+
+    with GifStreamWriter(output_file, workers=workers) as writer:
+        for index, (frame, info) in enumerate(iter_frames(input_file)):
+            draw_tracks(frame, tracks, index)
+            palette = None
+            if keep_palette and info["palette"]:
+                key = (info["palette"], info["transparency"])
+                if key not in palettes:
+                    palettes[key] = reserve_palette(*key, colors)
+                palette = palettes[key]
+            x, y, w, h = info["bbox"]
+            writer.write(frame, duration=info["duration"],
+                         disposal=info["disposal"], bbox=(x, y, x + w, y + h),
+                         palette=palette)
+            if progress:
+                progress(writer.frame_count, total)
+    return writer.frame_count
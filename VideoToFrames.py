@@ -1,7 +1,5 @@
 import sys
 import os
-import subprocess
-import json
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QGridLayout, QLabel, QLineEdit,
     QPushButton, QFileDialog, QMessageBox, QHBoxLayout, QFrame, QVBoxLayout,
@@ -9,11 +7,16 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt
 
+from GifOperations import extract_frames, detect_duration
+from JobRunner import Job
+from ProbeCache import probe_cache
+
 class VideoToFramesConverter(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Video to Frames Extractor")
         self.resize(650, 450)
+        self.job = None
         self.init_ui()
 
     def init_ui(self):
@@ -184,21 +187,7 @@ class VideoToFramesConverter(QMainWindow):
         input_file = self.entry_input.text()
         if not input_file or not os.path.exists(input_file):
             return None
-        try:
-            cmd = [
-                "ffprobe", "-v", "error", "-select_streams", "v:0",
-                "-show_entries", "stream=r_frame_rate",
-                "-of", "json", input_file
-            ]
-            startupinfo = None
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True, startupinfo=startupinfo)
-            data = json.loads(result.stdout)
-            return data["streams"][0]
-        except Exception:
-            return None
+        return probe_cache.video_stream(input_file)
 
     def auto_detect_fps(self):
         self.lbl_status.setText("Analyzing video...")
@@ -218,6 +207,12 @@ class VideoToFramesConverter(QMainWindow):
             self.lbl_status.setText("Could not detect FPS")
 
     def extract_frames(self):
+        if self.job:
+            self.job.cancel()
+            self.btn_convert.setEnabled(False)
+            self.lbl_status.setText("Cancelling...")
+            return
+
         input_file = self.entry_input.text()
         output_dir = self.entry_output.text()
         fps = self.spin_fps.value()
@@ -231,38 +226,45 @@ class VideoToFramesConverter(QMainWindow):
 
         os.makedirs(output_dir, exist_ok=True)
 
-        self.btn_convert.setEnabled(False)
-        self.btn_convert.setText("Extracting...")
-        QApplication.processEvents()
+        self.btn_convert.setText("Cancel")
+        self.lbl_status.setText("Extracting frames...")
+
+        self.job = Job(lambda job: extract_frames(
+            input_file, output_dir, fps, cancel_event=job.cancel_event,
+            progress=job.ffmpeg_progress(detect_duration(input_file),
+                                         "Extracting frames... ")))
+        self.job.signals.progress.connect(
+            lambda _, message: self.lbl_status.setText(message))
+        self.job.signals.finished.connect(
+            lambda _: self.on_extract_finished(output_dir))
+        self.job.signals.failed.connect(self.on_extract_failed)
+        self.job.signals.cancelled.connect(self.on_extract_cancelled)
+        self.job.start()
+
+    def on_extract_finished(self, output_dir):
+        self.reset_extract_button()
+        self.lbl_status.setText("Done!")
+        QMessageBox.information(self, "Success", f"Sequence extracted to:\n{output_dir}")
+
+    def on_extract_failed(self, error):
+        self.reset_extract_button()
+        self.lbl_status.setText("Error during extraction")
+        QMessageBox.critical(self, "Error", f"FFmpeg failed.\n\n{error}")
+
+    def on_extract_cancelled(self):
+        self.reset_extract_button()
+        self.lbl_status.setText("Cancelled")
+
+    def reset_extract_button(self):
+        self.job = None
+        self.btn_convert.setEnabled(True)
+        self.btn_convert.setText("Extract Frames")
+
+    def closeEvent(self, event):
+        if self.job:
+            self.job.cancel()
+        event.accept()
 
-        try:
-            startupinfo = None
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-
-            self.lbl_status.setText("Extracting frames...")
-            QApplication.processEvents()
-
-            cmd = [
-                "ffmpeg", "-y", "-i", input_file,
-                "-vf", f"fps={fps}",
-                os.path.join(output_dir, "frame_%04d.png")
-            ]
-            subprocess.run(cmd, check=True, startupinfo=startupinfo)
-
-            self.lbl_status.setText("Done!")
-            QMessageBox.information(self, "Success", f"Sequence extracted to:\n{output_dir}")
-
-        except subprocess.CalledProcessError:
-            self.lbl_status.setText("Error during extraction")
-            QMessageBox.critical(self, "Error", "FFmpeg failed.")
-        except Exception as e:
-            self.lbl_status.setText("Error")
-            QMessageBox.critical(self, "Error", f"An error occurred:\n{e}")
-        finally:
-            self.btn_convert.setEnabled(True)
-            self.btn_convert.setText("Extract Frames")
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)